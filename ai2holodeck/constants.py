@@ -24,6 +24,43 @@ HOLODECK_THOR_ANNOTATIONS_PATH = os.path.join(
     HOLODECK_BASE_DATA_DIR, "thor_object_data", "annotations.json.gz"
 )
 
+# compiled (memory-mappable) retrieval features, see generation/feature_store.py
+HOLODECK_FEATURE_STORE_DIR = os.environ.get(
+    "HOLODECK_FEATURE_STORE_DIR",
+    os.path.join(HOLODECK_BASE_DATA_DIR, "feature_store", ASSETS_VERSION),
+)
+# "exact" or "ivf" (needs `python -m ai2holodeck.generation.retrieval_index build`)
+HOLODECK_RETRIEVAL_INDEX = os.environ.get("HOLODECK_RETRIEVAL_INDEX", "exact")
+# number of ivf lists probed per query, trades recall for latency
+HOLODECK_RETRIEVAL_NPROBE = int(os.environ.get("HOLODECK_RETRIEVAL_NPROBE", "16"))
+
+# local caches (query embeddings, ...)
+HOLODECK_CACHE_DIR = os.environ.get(
+    "HOLODECK_CACHE_DIR", os.path.expanduser("~/.cache/holodeck")
+)
+# set to "0" to keep the query embedding cache in memory only
+HOLODECK_PERSIST_EMBEDDING_CACHE = os.environ.get(
+    "HOLODECK_PERSIST_EMBEDDING_CACHE", "1"
+).lower() in ["1", "true", "t"]
+
+# size of the on-disk cache of solved floor / wall layouts, 0 disables it
+HOLODECK_LAYOUT_CACHE_MB = int(os.environ.get("HOLODECK_LAYOUT_CACHE_MB", 256))
+
+# MILP solver for the floor layout (e.g. "HIGHS"), by default the first usable one
+HOLODECK_MILP_SOLVER = os.environ.get("HOLODECK_MILP_SOLVER", None)
+
+# maximum number of concurrent LLM requests of the async pipeline
+HOLODECK_LLM_CONCURRENCY = int(os.environ.get("HOLODECK_LLM_CONCURRENCY", 8))
+
+# cache of LLM responses: "off", "on" (reuse and record) or "replay" (cached
+# responses only, a prompt that isn't cached is an error)
+HOLODECK_LLM_CACHE = os.environ.get("HOLODECK_LLM_CACHE", "off").lower()
+# in days, 0 keeps the responses forever
+HOLODECK_LLM_CACHE_TTL_DAYS = float(os.environ.get("HOLODECK_LLM_CACHE_TTL_DAYS", 30))
+HOLODECK_LLM_CACHE_MAX_ENTRIES = int(
+    os.environ.get("HOLODECK_LLM_CACHE_MAX_ENTRIES", 100000)
+)
+
 if ASSETS_VERSION > "2023_09_23":
     THOR_COMMIT_ID = "8524eadda94df0ab2dbb2ef5a577e4d37c712897"
 else:
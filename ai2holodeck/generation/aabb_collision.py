@@ -0,0 +1,100 @@
+import numpy as np
+
+
+class AABBIndex:
+    # axis aligned 3D boxes with incremental insert / remove. Each query prunes the
+    # boxes to a window of the intervals sorted along x (broadphase), the boxes in
+    # the windows of all queries are compared with numpy in one batch (narrowphase).
+    # Boxes that touch count as colliding
+    def __init__(self, boxes=None):
+        self.boxes = {}  # name -> (min, max)
+        self.names = []
+        self.box_min = np.zeros((0, 3), dtype=np.float64)
+        self.box_max = np.zeros((0, 3), dtype=np.float64)
+        self.reach_x = np.zeros(0, dtype=np.float64)  # running max of the max x
+        self.dirty = False
+
+        for name, (box_min, box_max) in (boxes or {}).items():
+            self.insert(name, box_min, box_max)
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def __contains__(self, name):
+        return name in self.boxes
+
+    def insert(self, name, box_min, box_max):
+        self.boxes[name] = (tuple(box_min), tuple(box_max))
+        self.dirty = True
+
+    def remove(self, name):
+        del self.boxes[name]
+        self.dirty = True
+
+    def build(self):
+        # arrays sorted by min x, rebuilt lazily after inserts and removes
+        if not self.dirty:
+            return
+        names = list(self.boxes.keys())
+        box_min = np.array(
+            [self.boxes[name][0] for name in names], dtype=np.float64
+        ).reshape(-1, 3)
+        box_max = np.array(
+            [self.boxes[name][1] for name in names], dtype=np.float64
+        ).reshape(-1, 3)
+        order = np.argsort(box_min[:, 0], kind="stable")
+        self.names = [names[i] for i in order]
+        self.box_min, self.box_max = box_min[order], box_max[order]
+        self.reach_x = np.maximum.accumulate(self.box_max[:, 0])
+        self.dirty = False
+
+    def get_collision_mask(self, query_min, query_max):
+        # (queries, boxes) mask of the boxes that each query box collides with
+        self.build()
+        query_min = np.asarray(query_min, dtype=np.float64).reshape(-1, 3)
+        query_max = np.asarray(query_max, dtype=np.float64).reshape(-1, 3)
+        mask = np.zeros((len(query_min), len(self.names)), dtype=bool)
+        if len(query_min) == 0 or len(self.names) == 0:
+            return mask
+
+        # broadphase, the boxes a query can collide with start before the query ends
+        # and come after the last box that ends before the query starts
+        starts = np.searchsorted(self.reach_x, query_min[:, 0], side="left")
+        ends = np.searchsorted(self.box_min[:, 0], query_max[:, 0], side="right")
+        counts = np.maximum(ends - starts, 0)
+        if counts.sum() == 0:
+            return mask
+
+        # (query, box) pairs of all the windows
+        query_indices = np.repeat(np.arange(len(query_min)), counts)
+        offsets = np.cumsum(counts) - counts
+        box_indices = (
+            np.arange(len(query_indices))
+            - np.repeat(offsets, counts)
+            + np.repeat(starts, counts)
+        )
+
+        separated = (self.box_max[box_indices] < query_min[query_indices]) | (
+            self.box_min[box_indices] > query_max[query_indices]
+        )
+        mask[query_indices, box_indices] = ~separated.any(axis=1)
+        return mask
+
+    def query(self, query_min, query_max):
+        # True for the query boxes that collide with any box in the index
+        return self.get_collision_mask(query_min, query_max).any(axis=1)
+
+    def query_pairs(self):
+        # all colliding pairs of boxes in the index, by a sweep along x
+        self.build()
+        pairs = []
+        for i, name in enumerate(self.names):
+            end = np.searchsorted(self.box_min[:, 0], self.box_max[i, 0], side="right")
+            if end <= i + 1:
+                continue
+            separated = (self.box_max[i + 1 : end] < self.box_min[i]) | (
+                self.box_min[i + 1 : end] > self.box_max[i]
+            )
+            for j in np.flatnonzero(~separated.any(axis=1)).tolist():
+                pairs.append((name, self.names[i + 1 + j]))
+        return pairs
@@ -0,0 +1,146 @@
+import numpy as np
+import torch
+
+from ai2holodeck.generation.utils import (
+    get_annotations,
+    get_bbox_dims,
+    get_secondary_properties,
+)
+
+
+class AssetTable:
+    # columnar copy of the asset annotations, row i describes asset_ids[i],
+    # so that filters become vectorized masks instead of nested dict lookups
+    COLUMNS = [
+        "bbox",
+        "on_floor",
+        "on_wall",
+        "on_ceiling",
+        "on_object",
+        "can_break",
+        "valid",
+        "category_codes",
+    ]
+
+    def __init__(self, database, asset_ids):
+        self.asset_ids = asset_ids
+        self.uid2row = {uid: row for row, uid in enumerate(asset_ids)}
+
+        num_assets = len(asset_ids)
+        self.bbox = np.zeros((num_assets, 3), dtype=np.float64)  # x, y, z in meters
+        self.on_floor = np.zeros(num_assets, dtype=bool)
+        self.on_wall = np.zeros(num_assets, dtype=bool)
+        self.on_ceiling = np.zeros(num_assets, dtype=bool)
+        self.on_object = np.zeros(num_assets, dtype=bool)
+        self.can_break = np.zeros(num_assets, dtype=bool)
+        self.valid = np.zeros(num_assets, dtype=bool)
+
+        category2code = {}
+        self.category_codes = np.zeros(num_assets, dtype=np.int32)
+
+        for row, uid in enumerate(asset_ids):
+            try:
+                obj_data = database[uid]
+                annotation = get_annotations(obj_data)
+                dimension = get_bbox_dims(obj_data)
+            except (KeyError, TypeError, ValueError, AssertionError):
+                print(f"Warning: could not read the annotations of {uid}.")
+                continue
+
+            self.bbox[row] = [dimension["x"], dimension["y"], dimension["z"]]
+            self.on_floor[row] = bool(annotation["onFloor"])
+            self.on_wall[row] = annotation["onWall"] == True
+            self.on_ceiling[row] = bool(annotation["onCeiling"])
+            self.on_object[row] = annotation["onObject"] == True
+
+            category = annotation["category"]
+            if category not in category2code:
+                category2code[category] = len(category2code)
+            self.category_codes[row] = category2code[category]
+
+            try:
+                self.can_break[row] = "CanBreak" in get_secondary_properties(obj_data)
+            except (KeyError, TypeError, ValueError):
+                pass  # no secondary properties, the asset can't break
+
+            self.valid[row] = True
+
+        self.categories = list(category2code.keys())
+
+    @classmethod
+    def from_columns(cls, asset_ids, columns, categories):
+        # a table compiled into the feature store, the annotations are not read again
+        table = cls.__new__(cls)
+        table.asset_ids = asset_ids
+        table.uid2row = {uid: row for row, uid in enumerate(asset_ids)}
+        for name in cls.COLUMNS:
+            setattr(table, name, columns[name])
+        table.categories = list(categories)
+        return table
+
+    def get_columns(self):
+        return {name: getattr(self, name) for name in self.COLUMNS}
+
+    def __len__(self):
+        return len(self.asset_ids)
+
+    def get_rows(self, uids):
+        return np.array([self.uid2row[uid] for uid in uids], dtype=np.int64)
+
+    def category_mask(self, predicate):
+        # evaluate the predicate once per distinct category
+        category_values = np.array(
+            [bool(predicate(category)) for category in self.categories] + [False]
+        )
+        return category_values[self.category_codes] & self.valid
+
+    def get_bbox_dims(self, uid):
+        x, y, z = self.bbox[self.uid2row[uid]].tolist()
+        return {"x": x, "y": y, "z": z}
+
+    def get_candidates(self, rows, scores):
+        # (uid, score) tuples, the format used by the selectors
+        return list(zip([self.asset_ids[row] for row in rows], scores.tolist()))
+
+    def used_mask(self, used_assets):
+        # bitset of the assets that are already used
+        mask = np.zeros(len(self.asset_ids), dtype=bool)
+        rows = [self.uid2row[uid] for uid in used_assets if uid in self.uid2row]
+        mask[rows] = True
+        return mask
+
+    def size_mask(self, room_size, tolerance):
+        # objects that fit in the room, with the longer horizontal side along x
+        length = np.maximum(self.bbox[:, 0], self.bbox[:, 2])
+        width = np.where(
+            self.bbox[:, 2] > self.bbox[:, 0], self.bbox[:, 0], self.bbox[:, 2]
+        )
+        height = self.bbox[:, 1]
+        return (
+            (length <= room_size[0] * tolerance)
+            & (height <= room_size[1] * tolerance)
+            & (width <= room_size[2] * tolerance)
+            # the footprint takes at most half of the room's bounding box
+            & (length * width <= room_size[0] * room_size[2] * 0.5)
+        )
+
+    def thin_mask(self, thin_threshold):
+        # objects that are thin enough to hang on a wall
+        return self.bbox[:, 2] <= (
+            np.minimum(self.bbox[:, 0], self.bbox[:, 1]) * thin_threshold
+        )
+
+    def footprint_mask(self, max_x, max_z):
+        return (self.bbox[:, 0] < max_x) & (self.bbox[:, 2] < max_z)
+
+    def size_difference(self, rows, target_size):
+        # mean absolute difference of the sorted dimensions, in meters
+        candidate_sizes = np.sort(self.bbox[rows] * 100, axis=1)
+        candidate_sizes = torch.tensor(candidate_sizes, dtype=torch.float32)
+
+        target_size_list = list(target_size)
+        target_size_list.sort()
+        target_size = torch.tensor(target_size_list)
+
+        size_difference = abs(candidate_sizes - target_size).mean(axis=1) / 100
+        return size_difference.numpy().astype(np.float64)
@@ -0,0 +1,71 @@
+import asyncio
+import threading
+import weakref
+
+from langchain_core.messages import HumanMessage
+
+from ai2holodeck.constants import HOLODECK_LLM_CONCURRENCY
+from ai2holodeck.generation.llm_cache import CachedLLM
+
+# asyncio primitives belong to one event loop, so there is a semaphore per loop
+llm_semaphores = weakref.WeakKeyDictionary()
+
+# the layout solvers search until a wall-clock budget runs out. Solves on threads
+# at the same time would share the GIL and each get a fraction of its budget, so
+# the solves of concurrent rooms take turns and each gets its full budget
+solver_lock = threading.Lock()
+
+
+def get_llm_semaphore():
+    loop = asyncio.get_running_loop()
+    if loop not in llm_semaphores:
+        llm_semaphores[loop] = asyncio.Semaphore(HOLODECK_LLM_CONCURRENCY)
+    return llm_semaphores[loop]
+
+
+def get_request(llm, value):
+    # steps yield a prompt, or (prompt, True) for a prompt that is sent again because
+    # the response couldn't be used, which must not come from the response cache
+    prompt, refresh = value if isinstance(value, tuple) else (value, False)
+    kwargs = {"refresh": True} if refresh and isinstance(llm, CachedLLM) else {}
+    return [HumanMessage(content=prompt)], kwargs
+
+
+def invoke(llm, value):
+    messages, kwargs = get_request(llm, value)
+    return llm.invoke(messages, **kwargs).content
+
+
+async def ainvoke(llm, value):
+    # at most HOLODECK_LLM_CONCURRENCY requests are in flight at the same time
+    messages, kwargs = get_request(llm, value)
+    async with get_llm_semaphore():
+        response = await llm.ainvoke(messages, **kwargs)
+    return response.content
+
+
+def send_response(steps, response):
+    # StopIteration can't be raised through a future, return (done, value) instead
+    try:
+        return False, steps.send(response)
+    except StopIteration as e:
+        return True, e.value
+
+
+def run_llm_steps(llm, steps):
+    # the generators are written as steps that yield a prompt and receive the
+    # response, so that the same code runs with blocking and with async llm calls
+    done, value = send_response(steps, None)
+    while not done:
+        done, value = send_response(steps, invoke(llm, value))
+    return value
+
+
+async def arun_llm_steps(llm, steps):
+    # same as run_llm_steps, the work between the prompts runs on a thread so that
+    # other coroutines keep sending their prompts meanwhile
+    done, value = await asyncio.to_thread(send_response, steps, None)
+    while not done:
+        response = await ainvoke(llm, value)
+        done, value = await asyncio.to_thread(send_response, steps, response)
+    return value
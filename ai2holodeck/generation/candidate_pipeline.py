@@ -0,0 +1,70 @@
+import numpy as np
+
+
+class CandidatePipeline:
+    # composable filters over retrieved candidates, the candidates are kept as
+    # arrays of asset table rows and scores sorted by descending score
+    def __init__(self, asset_table):
+        self.asset_table = asset_table
+        self.steps = []
+
+    def where(self, asset_mask):
+        # keep the candidates whose row is set in a mask over the whole table
+        self.steps.append(
+            lambda rows, scores: self.keep(rows, scores, asset_mask[rows])
+        )
+        return self
+
+    def apply(self, candidates_fn):
+        # non-vectorized step on (uid, score) tuples, e.g. the placement check
+        def step(rows, scores):
+            candidates = self.asset_table.get_candidates(rows, scores)
+            kept = set(uid for uid, _ in candidates_fn(candidates))
+            mask = np.array([self.asset_table.asset_ids[row] in kept for row in rows])
+            return self.keep(rows, scores, mask.astype(bool))
+
+        self.steps.append(step)
+        return self
+
+    def prefer_unused(self, used_mask):
+        # remove used assets, but never remove the only candidate
+        def step(rows, scores):
+            if len(rows) <= 1:
+                return rows, scores
+            unused = ~used_mask[rows]
+            if not unused.any():
+                return rows[:1], scores[:1]
+            return self.keep(rows, scores, unused)
+
+        self.steps.append(step)
+        return self
+
+    def penalize_size(self, target_size, weight=10):
+        # penalize the size difference to the requested size and re-sort
+        def step(rows, scores):
+            if len(rows) == 0:
+                return rows, scores
+            scores = (
+                scores - self.asset_table.size_difference(rows, target_size) * weight
+            )
+            order = np.argsort(-scores, kind="stable")
+            return rows[order], scores[order]
+
+        self.steps.append(step)
+        return self
+
+    def head(self, k):
+        self.steps.append(lambda rows, scores: (rows[:k], scores[:k]))
+        return self
+
+    def run(self, rows, scores):
+        for step in self.steps:
+            rows, scores = step(rows, scores)
+        return rows, scores
+
+    def run_candidates(self, rows, scores):
+        return self.asset_table.get_candidates(*self.run(rows, scores))
+
+    @staticmethod
+    def keep(rows, scores, mask):
+        return rows[mask], scores[mask]
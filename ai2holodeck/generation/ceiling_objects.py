@@ -5,11 +5,11 @@ import torch
 import torch.nn.functional as F
 from colorama import Fore
 from langchain_core.prompts import PromptTemplate
-from langchain_core.messages import HumanMessage
 from langchain_openai import OpenAI
 from shapely.geometry import Polygon
 
 import ai2holodeck.generation.prompts as prompts
+from ai2holodeck.generation.async_llm import arun_llm_steps, run_llm_steps
 from ai2holodeck.generation.objaverse_retriever import ObjathorRetriever
 from ai2holodeck.generation.utils import get_bbox_dims, get_annotations
 
@@ -28,12 +28,33 @@ class CeilingObjectGenerator:
         self.llm = llm
         self.object_retriever = object_retriever
         self.database = object_retriever.database
+        self.asset_table = object_retriever.asset_table
+        # ceiling objects that are at most 1 meter tall
+        self.ceiling_asset_mask = self.asset_table.on_ceiling & (
+            self.asset_table.bbox[:, 1] <= 1.0
+        )
         self.ceiling_template = PromptTemplate(
             input_variables=["input", "rooms", "additional_requirements"],
             template=prompts.ceiling_selection_prompt,
         )
 
     def generate_ceiling_objects(self, scene, additional_requirements_ceiling="N/A"):
+        return run_llm_steps(
+            self.llm,
+            self.generate_ceiling_objects_steps(scene, additional_requirements_ceiling),
+        )
+
+    async def generate_ceiling_objects_async(
+        self, scene, additional_requirements_ceiling="N/A"
+    ):
+        return await arun_llm_steps(
+            self.llm,
+            self.generate_ceiling_objects_steps(scene, additional_requirements_ceiling),
+        )
+
+    def generate_ceiling_objects_steps(
+        self, scene, additional_requirements_ceiling="N/A"
+    ):
         room_types = [room["roomType"] for room in scene["rooms"]]
         room_types_str = str(room_types).replace("'", "")[1:-1]
         ceiling_prompt = self.ceiling_template.format(
@@ -43,7 +64,7 @@ class CeilingObjectGenerator:
         )
 
         if "raw_ceiling_plan" not in scene:
-            raw_ceiling_plan = self.llm.invoke([HumanMessage(content=ceiling_prompt)]).content
+            raw_ceiling_plan = yield ceiling_prompt
         else:
             raw_ceiling_plan = scene["raw_ceiling_plan"]
 
@@ -54,14 +75,27 @@ class CeilingObjectGenerator:
 
         ceiling_objects = []
         parsed_ceiling_plan = self.parse_ceiling_plan(raw_ceiling_plan)
-        for room_type, ceiling_object_description in parsed_ceiling_plan.items():
+
+        # retrieve candidates for all rooms at once
+        descriptions = list(parsed_ceiling_plan.values())
+        retrieved_candidates = self.object_retriever.retrieve_batch(
+            [f"a 3D model of {description}" for description in descriptions],
+            29,
+            [self.ceiling_asset_mask] * len(descriptions),
+        )
+
+        for (room_type, ceiling_object_description), candidates in zip(
+            parsed_ceiling_plan.items(), retrieved_candidates
+        ):
             room = self.get_room_by_type(scene["rooms"], room_type)
 
             if room is None:
                 print(f"Room type {room_type} not found in scene.")
                 continue
 
-            ceiling_object_id = self.select_ceiling_object(ceiling_object_description)
+            ceiling_object_id = self.select_ceiling_object(
+                ceiling_object_description, candidates
+            )
             if ceiling_object_id is None:
                 continue
 
@@ -111,27 +145,17 @@ class CeilingObjectGenerator:
                 return room
         return None
 
-    def select_ceiling_object(self, description):
-        candidates = self.object_retriever.retrieve(
-            [f"a 3D model of {description}"], threshold=29
-        )
-        ceiling_candiates = [
-            candidate
-            for candidate in candidates
-            if get_annotations(self.database[candidate[0]])["onCeiling"] == True
-        ]
-
-        valid_ceiling_candiates = []
-        for candidate in ceiling_candiates:
-            dimension = get_bbox_dims(self.database[candidate[0]])
-            if dimension["y"] <= 1.0:
-                valid_ceiling_candiates.append(candidate)
-
-        if len(valid_ceiling_candiates) == 0:
+    def select_ceiling_object(self, description, candidates=None):
+        if candidates is None:
+            candidates = self.object_retriever.retrieve_batch(
+                [f"a 3D model of {description}"], 29, [self.ceiling_asset_mask]
+            )[0]
+
+        if len(candidates) == 0:
             print("No ceiling object found for description: {}".format(description))
             return None
 
-        selected_ceiling_object_id = self.random_select(valid_ceiling_candiates)[0]
+        selected_ceiling_object_id = self.random_select(candidates)[0]
         return selected_ceiling_object_id
 
     def random_select(self, candidates):
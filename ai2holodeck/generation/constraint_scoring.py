@@ -0,0 +1,243 @@
+import numpy as np
+import shapely
+from scipy.interpolate import interp1d
+from shapely.geometry import Polygon
+
+from ai2holodeck.generation.wall_distance_field import point_segment_distance
+
+# direction an object faces at each rotation
+FACING_VECTORS = {0: (0.0, 1.0), 90: (1.0, 0.0), 180: (0.0, -1.0), 270: (-1.0, 0.0)}
+
+
+def get_ring(coords):
+    # vertices of a polygon in ring order, without the closing vertex
+    ring = np.array(coords, dtype=np.float64).reshape(-1, 2)
+    if len(ring) > 1 and (ring[0] == ring[-1]).all():
+        ring = ring[:-1]
+    return ring
+
+
+def is_box(ring):
+    # four vertices, every edge axis aligned and the ring not degenerate
+    if len(ring) != 4:
+        return False
+    edges = np.roll(ring, -1, axis=0) - ring
+    axis_aligned = (edges == 0).sum(axis=1) == 1
+    return bool(axis_aligned.all()) and len(np.unique(ring, axis=0)) == 4
+
+
+def envelope_distance2(min0, max0, min1, max1):
+    # squared distance between axis aligned envelopes, as GEOS computes it
+    gaps = np.maximum(
+        0.0,
+        np.maximum(max0, max1) - np.minimum(min0, min1) - (max0 - min0) - (max1 - min1),
+    )
+    return gaps[..., 0] * gaps[..., 0] + gaps[..., 1] * gaps[..., 1]
+
+
+class ConstraintScorer:
+    # scores the candidate solutions of DFS_Solver_Floor for the constraints on a
+    # placed target object, all candidates at once. The results are the same as the
+    # place_relative / place_distance / place_face / place_alignment_center methods
+    # of the solver. Targets that are boxes use closed form tests, others shapely
+    def __init__(self, solutions, grid_size, constraint_bouns):
+        self.grid_size = grid_size
+        self.constraint_bouns = constraint_bouns
+
+        self.centers = np.array(
+            [solution[0] for solution in solutions], dtype=np.float64
+        ).reshape(-1, 2)
+        self.rotations = np.array(
+            [solution[1] for solution in solutions], dtype=np.int64
+        )
+        # the solutions are boxes, the first four vertices in their ring order
+        self.rings = np.array(
+            [solution[2][:4] for solution in solutions], dtype=np.float64
+        ).reshape(-1, 4, 2)
+        self.box_min = self.rings.min(axis=1)
+        self.box_max = self.rings.max(axis=1)
+
+        self.check_funcs = {
+            "relative": self.check_relative,
+            "direction": self.check_face,
+            "alignment": self.check_alignment_center,
+        }
+
+    def get_scores(self, constraint_type, constraint, target_object):
+        # (valid, scores) of every candidate, the score is what the place_* method adds
+        if constraint_type == "distance":
+            scores = self.score_distance(constraint, target_object)
+            return np.ones(len(scores), dtype=bool), scores
+
+        valid = self.check_funcs[constraint_type](constraint, target_object)
+        return valid, np.where(valid, self.constraint_bouns, 0.0)
+
+    def check_relative(self, place_type, target_object):
+        _, target_rotation, target_coords, _ = target_object
+        target_ring = get_ring(target_coords)
+        min_x, min_y = target_ring.min(axis=0).tolist()
+        max_x, max_y = target_ring.max(axis=0).tolist()
+        mean_x = (min_x + max_x) / 2
+        mean_y = (min_y + max_y) / 2
+
+        center_x, center_y = self.centers[:, 0], self.centers[:, 1]
+        within_x = (min_x <= center_x) & (center_x <= max_x)
+        within_y = (min_y <= center_y) & (center_y <= max_y)
+        centered_x = (mean_x - self.grid_size < center_x) & (
+            center_x < mean_x + self.grid_size
+        )
+        centered_y = (mean_y - self.grid_size < center_y) & (
+            center_y < mean_y + self.grid_size
+        )
+
+        if place_type == "left of":
+            checks = {
+                0: (center_x < min_x) & within_y,
+                90: (center_y > max_y) & within_x,
+                180: (center_x > max_x) & within_y,
+                270: (center_y < min_y) & within_x,
+            }
+        elif place_type == "right of":
+            checks = {
+                0: (center_x > max_x) & within_y,
+                90: (center_y < min_y) & within_x,
+                180: (center_x < min_x) & within_y,
+                270: (center_y > max_y) & within_x,
+            }
+        elif place_type == "in front of":
+            checks = {
+                0: (center_y > max_y) & centered_x,
+                90: (center_x > max_x) & centered_y,
+                180: (center_y < min_y) & centered_x,
+                270: (center_x < min_x) & centered_y,
+            }
+        elif place_type == "behind":
+            checks = {
+                0: (center_y < min_y) & within_x,
+                90: (center_x < min_x) & within_y,
+                180: (center_y > max_y) & within_x,
+                270: (center_x > max_x) & within_y,
+            }
+        elif place_type == "side of":
+            checks = {0: within_y, 90: within_x, 180: within_y, 270: within_x}
+        else:
+            raise KeyError(place_type)
+
+        return checks[target_rotation]
+
+    def get_distances(self, target_coords):
+        # same as Polygon(target_coords).distance(Polygon(solution[2])) per solution
+        target_ring = get_ring(target_coords)
+        if not is_box(target_ring):
+            return shapely.distance(
+                Polygon(target_coords), shapely.polygons(self.rings)
+            )
+
+        # the boxes don't overlap, so every pair of edges is apart and its distance
+        # is the smallest vertex to edge distance. GEOS walks the edge pairs in ring
+        # order and skips a pair whose envelopes are further apart than the best
+        # distance so far, the same walk is done here for all solutions at once so
+        # the results match shapely exactly (a skipped pair can be closer by an ulp)
+        target_next = np.roll(target_ring, -1, axis=0)
+        rings_next = np.roll(self.rings, -1, axis=1)
+        distances = np.full(len(self.rings), np.inf)
+        for start, end in zip(target_ring, target_next):
+            edge_min, edge_max = np.minimum(start, end), np.maximum(start, end)
+            near_solution = envelope_distance2(
+                edge_min, edge_max, self.box_min, self.box_max
+            ) <= (distances * distances)
+            for index in range(4):
+                ring_start, ring_end = self.rings[:, index], rings_next[:, index]
+                near = near_solution & (
+                    envelope_distance2(
+                        edge_min,
+                        edge_max,
+                        np.minimum(ring_start, ring_end),
+                        np.maximum(ring_start, ring_end),
+                    )
+                    <= (distances * distances)
+                )
+                edge_distances = np.minimum(
+                    np.minimum(
+                        point_segment_distance(start, ring_start, ring_end),
+                        point_segment_distance(end, ring_start, ring_end),
+                    ),
+                    np.minimum(
+                        point_segment_distance(ring_start, start, end),
+                        point_segment_distance(ring_end, start, end),
+                    ),
+                )
+                distances = np.where(
+                    near & (edge_distances < distances), edge_distances, distances
+                )
+
+        target_min, target_max = target_ring.min(axis=0), target_ring.max(axis=0)
+        overlap = ((self.box_min <= target_max) & (self.box_max >= target_min)).all(
+            axis=1
+        )
+        distances[overlap] = 0.0
+        return distances
+
+    def score_distance(self, distance_type, target_object):
+        distances = self.get_distances(target_object[2])
+        if len(distances) == 0:
+            return distances
+
+        min_distance = float(distances.min())
+        max_distance = float(distances.max())
+
+        if distance_type == "near":
+            if min_distance < 80:
+                points = [(min_distance, 1), (80, 0), (max_distance, 0)]
+            else:
+                points = [(min_distance, 0), (max_distance, 0)]
+
+        elif distance_type == "far":
+            points = [(min_distance, 0), (max_distance, 1)]
+
+        x = [point[0] for point in points]
+        y = [point[1] for point in points]
+
+        f = interp1d(x, y, kind="linear", fill_value="extrapolate")
+        return np.asarray(f(distances), dtype=np.float64)
+
+    def check_face(self, face_type, target_object):
+        if face_type == "face to":
+            return self.check_face_to(target_object)
+
+        elif face_type == "face same as":
+            return self.rotations == target_object[1]
+
+        elif face_type == "face opposite to":
+            return self.rotations == (target_object[1] + 180) % 360
+
+        raise KeyError(face_type)
+
+    def check_face_to(self, target_object):
+        # the half line from the center in the facing direction hits the target
+        target_coords = target_object[2]
+        directions = np.array(
+            [FACING_VECTORS[rotation] for rotation in self.rotations.tolist()],
+            dtype=np.float64,
+        ).reshape(-1, 2)
+        far_points = self.centers + 1e6 * directions
+
+        target_ring = get_ring(target_coords)
+        if not is_box(target_ring):
+            half_lines = shapely.linestrings(
+                np.stack([self.centers, far_points], axis=1)
+            )
+            return shapely.intersects(half_lines, Polygon(target_coords))
+
+        # the half lines are axis aligned, they hit the box if both intervals overlap
+        target_min, target_max = target_ring.min(axis=0), target_ring.max(axis=0)
+        line_min = np.minimum(self.centers, far_points)
+        line_max = np.maximum(self.centers, far_points)
+        return ((line_min <= target_max) & (line_max >= target_min)).all(axis=1)
+
+    def check_alignment_center(self, alignment_type, target_object):
+        target_center = target_object[0]
+        eps = 5
+        return (np.abs(self.centers[:, 0] - target_center[0]) < eps) | (
+            np.abs(self.centers[:, 1] - target_center[1]) < eps
+        )
@@ -11,9 +11,9 @@ from colorama import Fore
 from langchain_core.prompts import PromptTemplate
 from langchain_openai import OpenAI
 from tqdm import tqdm
-from langchain_core.messages import HumanMessage
 import ai2holodeck.generation.prompts as prompts
 from ai2holodeck.constants import HOLODECK_BASE_DATA_DIR
+from ai2holodeck.generation.async_llm import arun_llm_steps, run_llm_steps
 
 
 class DoorGenerator:
@@ -81,6 +81,16 @@ class DoorGenerator:
             )
 
     def generate_doors(self, scene, additional_requirements_door):
+        return run_llm_steps(
+            self.llm, self.generate_doors_steps(scene, additional_requirements_door)
+        )
+
+    async def generate_doors_async(self, scene, additional_requirements_door):
+        return await arun_llm_steps(
+            self.llm, self.generate_doors_steps(scene, additional_requirements_door)
+        )
+
+    def generate_doors_steps(self, scene, additional_requirements_door):
         # get room pairs
         room_types = [room["roomType"] for room in scene["rooms"]]
         room_types_str = str(room_types).replace("'", "")[1:-1]
@@ -99,7 +109,7 @@ class DoorGenerator:
         # generate raw doorway plan if not exist
         if "raw_doorway_plan" not in scene:
             # raw_doorway_plan = self.llm(doorway_prompt)
-            raw_doorway_plan = self.llm.invoke([HumanMessage(content=doorway_prompt)]).content
+            raw_doorway_plan = yield doorway_prompt
 
         else:
             raw_doorway_plan = scene["raw_doorway_plan"]
@@ -0,0 +1,147 @@
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import torch
+
+
+class EmbeddingCache:
+    # bounded LRU cache of text embeddings keyed on (model, normalized text),
+    # optionally backed by a sqlite file that survives restarts
+    def __init__(self, max_size=10000, cache_path=None):
+        self.max_size = max_size
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self.cache_path = cache_path
+        self.connection = None
+        self.connect()
+
+    def connect(self):
+        cache_path = self.cache_path
+        if cache_path is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+            self.connection = sqlite3.connect(
+                cache_path, timeout=30, check_same_thread=False
+            )
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings "
+                "(model TEXT, text TEXT, vector BLOB, PRIMARY KEY (model, text))"
+            )
+            self.connection.commit()
+
+    @staticmethod
+    def normalize_text(text):
+        # the tokenizers ignore surrounding and repeated whitespace
+        return " ".join(text.split())
+
+    def encode(self, model_name, texts, encode_fn):
+        # look up every text, encode the misses in one batch and return a stacked tensor
+        keys = [(model_name, self.normalize_text(text)) for text in texts]
+
+        vectors = {}
+        with self.lock:
+            for key in keys:
+                if key in self.memory:
+                    self.memory.move_to_end(key)
+                    vectors[key] = self.memory[key]
+
+        missing = [key for key in dict.fromkeys(keys) if key not in vectors]
+        if missing and self.connection is not None:
+            disk_vectors = self.load_from_disk(model_name, missing)
+            for key, vector in disk_vectors.items():
+                vectors[key] = vector
+                self.insert(key, vector)
+            with self.lock:
+                self.disk_hits += len(disk_vectors)
+            missing = [key for key in missing if key not in vectors]
+
+        if missing:
+            encoded = encode_fn([text for _, text in missing])
+            encoded = encoded.detach().cpu().float()
+            for key, vector in zip(missing, encoded):
+                vectors[key] = vector
+                self.insert(key, vector)
+            self.save_to_disk(missing, encoded)
+
+        # the counters are shared by the selector threads
+        with self.lock:
+            self.misses += len(missing)
+            self.hits += len(keys) - len(missing)
+
+        return torch.stack([vectors[key] for key in keys])
+
+    def insert(self, key, vector):
+        with self.lock:
+            self.memory[key] = vector
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.max_size:
+                self.memory.popitem(last=False)
+
+    def load_from_disk(self, model_name, keys):
+        texts = [text for _, text in keys]
+        vectors = {}
+        with self.lock:
+            for start in range(0, len(texts), 500):
+                batch = texts[start : start + 500]
+                rows = self.connection.execute(
+                    "SELECT text, vector FROM embeddings WHERE model = ? AND text IN ({})".format(
+                        ", ".join("?" * len(batch))
+                    ),
+                    [model_name] + batch,
+                ).fetchall()
+                for text, blob in rows:
+                    vectors[(model_name, text)] = torch.from_numpy(
+                        np.frombuffer(blob, dtype=np.float32).copy()
+                    )
+        return vectors
+
+    def save_to_disk(self, keys, vectors):
+        if self.connection is None:
+            return
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text, vector) VALUES (?, ?, ?)",
+                [
+                    (model_name, text, vector.numpy().astype(np.float32).tobytes())
+                    for (model_name, text), vector in zip(keys, vectors)
+                ],
+            )
+            self.connection.commit()
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self.memory),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total > 0 else 0.0,
+            }
+
+    def __getstate__(self):
+        # locks and sqlite connections can't be pickled (e.g. by multiprocessing)
+        state = self.__dict__.copy()
+        state["lock"] = None
+        state["connection"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+        self.connect()
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+            self.hits = 0
+            self.disk_hits = 0
+            self.misses = 0
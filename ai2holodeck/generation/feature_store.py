@@ -0,0 +1,229 @@
+import hashlib
+import json
+import os
+import pickle
+import warnings
+from argparse import ArgumentParser
+
+import compress_json
+import compress_pickle
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+from ai2holodeck.constants import (
+    OBJATHOR_ANNOTATIONS_PATH,
+    HOLODECK_THOR_ANNOTATIONS_PATH,
+    OBJATHOR_FEATURES_DIR,
+    HOLODECK_THOR_FEATURES_DIR,
+    HOLODECK_FEATURE_STORE_DIR,
+)
+from ai2holodeck.generation.asset_table import AssetTable
+
+FEATURE_STORE_VERSION = 3
+
+SOURCE_FILES = [
+    OBJATHOR_ANNOTATIONS_PATH,
+    HOLODECK_THOR_ANNOTATIONS_PATH,
+    os.path.join(OBJATHOR_FEATURES_DIR, "clip_features.pkl"),
+    os.path.join(OBJATHOR_FEATURES_DIR, "sbert_features.pkl"),
+    os.path.join(HOLODECK_THOR_FEATURES_DIR, "clip_features.pkl"),
+    os.path.join(HOLODECK_THOR_FEATURES_DIR, "sbert_features.pkl"),
+]
+
+
+def load_source_features():
+    # load the original compressed annotations and features, as shipped with the assets
+    objathor_annotations = compress_json.load(OBJATHOR_ANNOTATIONS_PATH)
+    thor_annotations = compress_json.load(HOLODECK_THOR_ANNOTATIONS_PATH)
+    database = {**objathor_annotations, **thor_annotations}
+
+    uids = []
+    clip_features = []
+    sbert_features = []
+    for features_dir in [OBJATHOR_FEATURES_DIR, HOLODECK_THOR_FEATURES_DIR]:
+        clip_features_dict = compress_pickle.load(
+            os.path.join(features_dir, "clip_features.pkl")
+        )  # clip features
+        sbert_features_dict = compress_pickle.load(
+            os.path.join(features_dir, "sbert_features.pkl")
+        )  # sbert features
+        assert clip_features_dict["uids"] == sbert_features_dict["uids"]
+
+        uids += clip_features_dict["uids"]
+        clip_features.append(clip_features_dict["img_features"].astype(np.float32))
+        sbert_features.append(sbert_features_dict["text_features"].astype(np.float32))
+
+    clip_features = np.concatenate(clip_features, axis=0)
+    sbert_features = np.concatenate(sbert_features, axis=0)
+
+    # with torch, so the stored features equal what the retriever used to compute
+    # (numpy's norm differs in the last bit)
+    clip_features = F.normalize(torch.from_numpy(clip_features), p=2, dim=-1).numpy()
+
+    return {
+        "database": database,
+        "uids": uids,
+        "clip_features": clip_features,
+        "sbert_features": sbert_features,
+    }
+
+
+def get_source_stamp():
+    stamp = {}
+    for path in SOURCE_FILES:
+        stat = os.stat(path)
+        stamp[path] = [stat.st_size, int(stat.st_mtime)]
+    return stamp
+
+
+def get_store_fingerprint(uids, clip_features, sbert_features):
+    # identifies the asset rows and feature shapes, indexes built offline keep it
+    # so they can tell when they no longer match the store
+    digest = hashlib.sha256()
+    digest.update(
+        json.dumps(
+            [list(clip_features.shape), list(sbert_features.shape), list(uids)]
+        ).encode()
+    )
+    return digest.hexdigest()
+
+
+def is_feature_store_fresh(store_dir=HOLODECK_FEATURE_STORE_DIR):
+    try:
+        with open(os.path.join(store_dir, "manifest.json"), "r") as f:
+            manifest = json.load(f)
+        return (
+            manifest["version"] == FEATURE_STORE_VERSION
+            and manifest["sources"] == get_source_stamp()
+        )
+    except (OSError, ValueError, KeyError, TypeError):
+        # no store, an unreadable manifest or missing source files
+        return False
+
+
+def _atomic_write(path, write_fn, mode="wb"):
+    # write to a temporary file first so concurrent readers never see partial files
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, mode) as f:
+        write_fn(f)
+    os.replace(tmp_path, path)
+
+
+def compile_feature_store(store_dir=HOLODECK_FEATURE_STORE_DIR, features=None):
+    if features is None:
+        features = load_source_features()
+
+    os.makedirs(store_dir, exist_ok=True)
+
+    _atomic_write(
+        os.path.join(store_dir, "clip_features.npy"),
+        lambda f: np.save(f, np.ascontiguousarray(features["clip_features"])),
+    )
+    _atomic_write(
+        os.path.join(store_dir, "sbert_features.npy"),
+        lambda f: np.save(f, np.ascontiguousarray(features["sbert_features"])),
+    )
+    _atomic_write(
+        os.path.join(store_dir, "uids.json"),
+        lambda f: json.dump(features["uids"], f),
+        mode="w",
+    )
+    _atomic_write(
+        os.path.join(store_dir, "annotations.pkl"),
+        lambda f: pickle.dump(
+            features["database"], f, protocol=pickle.HIGHEST_PROTOCOL
+        ),
+    )
+
+    # the columns of the asset table, so it isn't rebuilt from the annotations
+    asset_table = AssetTable(features["database"], features["uids"])
+    for name, column in asset_table.get_columns().items():
+        _atomic_write(
+            os.path.join(store_dir, f"asset_{name}.npy"),
+            lambda f, column=column: np.save(f, column),
+        )
+    _atomic_write(
+        os.path.join(store_dir, "asset_categories.json"),
+        lambda f: json.dump(asset_table.categories, f),
+        mode="w",
+    )
+
+    # the manifest is written last, it marks the store as complete
+    manifest = {
+        "version": FEATURE_STORE_VERSION,
+        "num_assets": len(features["uids"]),
+        "clip_shape": list(features["clip_features"].shape),
+        "sbert_shape": list(features["sbert_features"].shape),
+        "sources": get_source_stamp(),
+        "fingerprint": get_store_fingerprint(
+            features["uids"], features["clip_features"], features["sbert_features"]
+        ),
+    }
+    _atomic_write(
+        os.path.join(store_dir, "manifest.json"),
+        lambda f: json.dump(manifest, f, indent=4),
+        mode="w",
+    )
+
+    return store_dir
+
+
+def load_feature_store(store_dir=HOLODECK_FEATURE_STORE_DIR):
+    # the feature matrices and asset table columns are memory-mapped read-only, so
+    # forked workers share pages
+    clip_features = np.load(os.path.join(store_dir, "clip_features.npy"), mmap_mode="r")
+    sbert_features = np.load(
+        os.path.join(store_dir, "sbert_features.npy"), mmap_mode="r"
+    )
+
+    with open(os.path.join(store_dir, "uids.json"), "r") as f:
+        uids = json.load(f)
+
+    with open(os.path.join(store_dir, "annotations.pkl"), "rb") as f:
+        database = pickle.load(f)
+
+    columns = {
+        name: np.load(os.path.join(store_dir, f"asset_{name}.npy"), mmap_mode="r")
+        for name in AssetTable.COLUMNS
+    }
+    with open(os.path.join(store_dir, "asset_categories.json"), "r") as f:
+        categories = json.load(f)
+
+    assert len(uids) == clip_features.shape[0] == sbert_features.shape[0]
+    assert all(len(column) == len(uids) for column in columns.values())
+
+    with warnings.catch_warnings():
+        # torch warns about non-writable arrays, the features are never modified
+        warnings.simplefilter("ignore", UserWarning)
+        clip_features = torch.from_numpy(clip_features)
+        sbert_features = torch.from_numpy(sbert_features)
+
+    return {
+        "database": database,
+        "uids": uids,
+        "clip_features": clip_features,
+        "sbert_features": sbert_features,
+        "asset_table": AssetTable.from_columns(uids, columns, categories),
+    }
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument(
+        "--store_dir",
+        help="Directory to write the compiled feature store to.",
+        default=HOLODECK_FEATURE_STORE_DIR,
+    )
+    parser.add_argument(
+        "--force",
+        help="Recompile even if the store is up to date.",
+        action="store_true",
+    )
+    args = parser.parse_args()
+
+    if not args.force and is_feature_store_fresh(args.store_dir):
+        print(f"Feature store at {args.store_dir} is up to date.")
+    else:
+        compile_feature_store(args.store_dir)
+        print(f"Compiled feature store to {args.store_dir}.")
@@ -1,3 +1,5 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import asyncio
 import copy
 import datetime
 import json
@@ -14,13 +16,18 @@ from langchain_core.prompts import PromptTemplate
 from langchain_openai import OpenAI
 from rtree import index
 from scipy.interpolate import interp1d
+import shapely
+from shapely import STRtree
 from shapely.geometry import Polygon, Point, box, LineString
-from langchain_core.messages import HumanMessage
 
 import ai2holodeck.generation.prompts as prompts
+from ai2holodeck.generation.async_llm import arun_llm_steps, run_llm_steps, solver_lock
+from ai2holodeck.generation.constraint_scoring import ConstraintScorer
 from ai2holodeck.generation.milp_utils import *
 from ai2holodeck.generation.objaverse_retriever import ObjathorRetriever
+from ai2holodeck.generation.occupancy_grid import OccupancyGrid
 from ai2holodeck.generation.utils import get_bbox_dims
+from ai2holodeck.generation.wall_distance_field import WallDistanceField
 
 
 class FloorObjectGenerator:
@@ -51,7 +58,13 @@ class FloorObjectGenerator:
 
         self.constraint_type = "llm"
         self.use_milp = False
-        self.multiprocessing = False
+        self.search = "dfs"  # "dfs" or "beam"
+        self.beam_width = 8
+        self.max_duration = 30  # time budget of the floor solver per room in seconds
+        self.num_starts = 1  # seeded searches per room, run in parallel
+        self.baseline_attempts = 3  # prompts for a parsable baseline layout
+        self.multiprocessing = False  # lay out the rooms in parallel
+        self.layout_cache = None  # LayoutCache of solved rooms
 
     def generate_objects(self, scene, use_constraint=True):
         rooms = scene["rooms"]
@@ -66,10 +79,14 @@ class FloorObjectGenerator:
             for room in rooms
         ]
         if self.multiprocessing:
-            pool = multiprocessing.Pool(processes=4)
-            all_placements = pool.map(self.generate_objects_per_room, packed_args)
-            pool.close()
-            pool.join()
+            all_placements = self.generate_objects_parallel(packed_args)
+        elif self.num_starts > 1:
+            # the seeded searches of each room share one pool
+            with self.get_process_pool(1) as process_pool:
+                all_placements = [
+                    self.generate_objects_per_room(args, process_pool)
+                    for args in packed_args
+                ]
         else:
             all_placements = [
                 self.generate_objects_per_room(args) for args in packed_args
@@ -80,7 +97,75 @@ class FloorObjectGenerator:
 
         return results
 
-    def generate_objects_per_room(self, args):
+    def generate_objects_parallel(self, packed_args):
+        # the llm calls of the rooms run on threads, the solvers only get a picklable
+        # layout job (polygon, object sizes, constraints, initial state) and run on a
+        # process pool, so the house takes about as long as its slowest room
+        process_pool = self.get_process_pool(len(packed_args))
+        with process_pool, ThreadPoolExecutor(
+            max_workers=max(len(packed_args), 1)
+        ) as thread_pool:
+            return list(
+                thread_pool.map(
+                    lambda args: self.generate_objects_per_room(args, process_pool),
+                    packed_args,
+                )
+            )
+
+    async def generate_objects_async(self, scene, use_constraint=True):
+        # the constraint prompts of all rooms are sent concurrently, with
+        # self.multiprocessing the layouts are solved on a process pool
+        packed_args = [
+            (
+                room,
+                scene["doors"],
+                scene["windows"],
+                scene["open_walls"],
+                scene["selected_objects"],
+                use_constraint,
+            )
+            for room in scene["rooms"]
+        ]
+        if self.multiprocessing or self.num_starts > 1:
+            num_rooms = len(packed_args) if self.multiprocessing else 1
+            with self.get_process_pool(num_rooms) as process_pool:
+                all_placements = await asyncio.gather(
+                    *[
+                        self.generate_objects_per_room_async(args, process_pool)
+                        for args in packed_args
+                    ]
+                )
+        else:
+            all_placements = await asyncio.gather(
+                *[self.generate_objects_per_room_async(args) for args in packed_args]
+            )
+
+        results = []
+        for placements in all_placements:
+            results += placements
+        return results
+
+    def get_process_pool(self, num_rooms):
+        # created once per house, outside of the threads and the event loop that
+        # submit to it. Spawn instead of fork, forking a process that runs threads
+        # can deadlock the children on locks held by other threads
+        num_processes = min(num_rooms * self.num_starts, multiprocessing.cpu_count())
+        return ProcessPoolExecutor(
+            max_workers=max(num_processes, 1),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    def generate_objects_per_room(self, args, process_pool=None):
+        return run_llm_steps(
+            self.llm, self.generate_objects_per_room_steps(args, process_pool)
+        )
+
+    async def generate_objects_per_room_async(self, args, process_pool=None):
+        return await arun_llm_steps(
+            self.llm, self.generate_objects_per_room_steps(args, process_pool)
+        )
+
+    def generate_objects_per_room_steps(self, args, process_pool=None):
         room, doors, windows, open_walls, selected_objects, use_constraint = args
 
         selected_floor_objects = selected_objects[room["roomType"]]["floor"]
@@ -107,7 +192,7 @@ class FloorObjectGenerator:
 
             if self.constraint_type == "llm":
                 # constraint_plan = self.llm(constraint_prompt)
-                constraint_plan = self.llm.invoke([HumanMessage(content=constraint_prompt)]).content
+                constraint_plan = yield constraint_prompt
             elif self.constraint_type in ["middle", "edge"]:
                 constraint_plan = ""
                 for object_name in object_names:
@@ -143,17 +228,38 @@ class FloorObjectGenerator:
             )
 
             # solve
-            solver = DFS_Solver_Floor(
-                grid_size=grid_size, max_duration=30, constraint_bouns=1
-            )
-            solution = solver.get_solution(
+            solver_args = (
+                grid_size,
                 room_poly,
                 objects_list,
                 constraints,
                 initial_state,
-                use_milp=self.use_milp,
+                self.use_milp,
+                self.search,
+                self.beam_width,
+                self.max_duration,
             )
+            # the same room, objects and constraints give the same layout
+            if self.layout_cache is not None:
+                cache_key = self.layout_cache.get_key(
+                    "floor", solver_args, self.num_starts, object_name2id, room_id
+                )
+                placements = self.layout_cache.get(cache_key)
+                if placements is not None:
+                    print(f"Reusing the cached floor layout of {room_id}.")
+                    return placements
+
+            # pool workers are daemonic and can't start a pool of their own
+            if process_pool is not None or (
+                self.num_starts > 1 and not multiprocessing.current_process().daemon
+            ):
+                solution = self.get_multi_start_solution(solver_args, process_pool)
+            else:
+                with solver_lock:
+                    solution = solve_floor_layout((0,) + solver_args)
             placements = self.solution2placement(solution, object_name2id, room_id)
+            if self.layout_cache is not None:
+                self.layout_cache.put(cache_key, placements)
         else:
             object_information = ""
             for object_name in object_names:
@@ -173,9 +279,11 @@ class FloorObjectGenerator:
                 min(v[1] for v in room["vertices"]),
             ]
             all_is_placed = False
-            while not all_is_placed:
+            placements = []
+            for attempt in range(self.baseline_attempts):
                 # completion_text = self.llm(baseline_prompt)
-                completion_text = self.llm.invoke([HumanMessage(content=baseline_prompt)]).content
+                # a retry asks the model again instead of the cached unusable answer
+                completion_text = yield (baseline_prompt, attempt > 0)
                 try:
                     completion_text = re.findall(
                         r"```(.*?)```", completion_text, re.DOTALL
@@ -184,7 +292,11 @@ class FloorObjectGenerator:
                         r"^json", "", completion_text, flags=re.MULTILINE
                     )
                     all_data = json.loads(completion_text)
-                except json.JSONDecodeError:
+                except (IndexError, json.JSONDecodeError):
+                    print(
+                        f"Could not parse the layout for {room_type} "
+                        f"(attempt {attempt + 1} of {self.baseline_attempts})."
+                    )
                     continue
                 print(f"completion text for {room_type}: {completion_text}")
                 placements = list()
@@ -216,6 +328,26 @@ class FloorObjectGenerator:
 
         return placements
 
+    def get_multi_start_solution(self, solver_args, process_pool=None):
+        # independent searches with different seeds, the best layout wins
+        packed_args = [(seed,) + solver_args for seed in range(self.num_starts)]
+        if process_pool is not None:
+            futures = [
+                process_pool.submit(solve_floor_layout, args) for args in packed_args
+            ]
+            solutions = [future.result() for future in futures]
+        else:
+            with self.get_process_pool(1) as process_pool:
+                solutions = list(process_pool.map(solve_floor_layout, packed_args))
+
+        path_weights = [
+            sum([obj[-1] for obj in solution.values()]) for solution in solutions
+        ]
+        best_seed = int(np.argmax(path_weights))
+        if self.num_starts > 1:
+            print(f"Best layout from seed {best_seed} of {self.num_starts}.")
+        return solutions[best_seed]
+
     def get_door_window_placements(
         self, doors, windows, room_vertices, open_walls, add_window=True
     ):
@@ -457,20 +589,60 @@ class FloorObjectGenerator:
         return ordered_floor_objects_no_size
 
 
+def solve_floor_layout(args):
+    (
+        random_seed,
+        grid_size,
+        room_poly,
+        objects_list,
+        constraints,
+        initial_state,
+        use_milp,
+        search,
+        beam_width,
+        max_duration,
+    ) = args
+    solver = DFS_Solver_Floor(
+        grid_size=grid_size,
+        random_seed=random_seed,
+        max_duration=max_duration,
+        constraint_bouns=1,
+        search=search,
+        beam_width=beam_width,
+    )
+    return solver.get_solution(
+        room_poly, objects_list, constraints, initial_state, use_milp=use_milp
+    )
+
+
 class SolutionFound(Exception):
     def __init__(self, solution):
         self.solution = solution
 
 
 class DFS_Solver_Floor:
-    def __init__(self, grid_size, random_seed=0, max_duration=5, constraint_bouns=0.2):
+    def __init__(
+        self,
+        grid_size,
+        random_seed=0,
+        max_duration=5,
+        constraint_bouns=0.2,
+        search="dfs",
+        beam_width=8,
+    ):
         self.grid_size = grid_size
         self.random_seed = random_seed
         self.max_duration = max_duration  # maximum allowed time in seconds
         self.constraint_bouns = constraint_bouns
+        self.search = search  # "dfs" or "beam"
+        self.beam_width = beam_width  # initial width of the beam search
+        self.random = random.Random(random_seed)
         self.start_time = None
         self.solutions = []
         self.vistualize = False
+        self.occupancy = None  # OccupancyGrid of the current dfs
+        self.distance_field = None  # WallDistanceField of the current room
+        self.milp_templates = {}  # compiled milp problems, see get_milp_problem
 
         # Define the functions in a dictionary to avoid if-else conditions
         self.func_dict = {
@@ -529,12 +701,26 @@ class DFS_Solver_Floor:
         else:
             grid_points = self.create_grids(bounds)
             grid_points = self.remove_points(grid_points, initial_state)
-            try:
-                self.dfs(
-                    bounds, objects_list, constraints, grid_points, initial_state, 30
+            self.occupancy = OccupancyGrid(bounds, self.grid_size, grid_points)
+            for object_name, (_, _, obj_coords, _) in initial_state.items():
+                self.occupancy.place(object_name, obj_coords)
+            if self.search == "beam":
+                self.beam_search(
+                    bounds, objects_list, constraints, grid_points, initial_state
                 )
-            except SolutionFound as e:
                 print(f"Time taken: {time.time() - self.start_time}")
+            else:
+                try:
+                    self.dfs(
+                        bounds,
+                        objects_list,
+                        constraints,
+                        grid_points,
+                        dict(initial_state),
+                        30,
+                    )
+                except SolutionFound as e:
+                    print(f"Time taken: {time.time() - self.start_time}")
 
         print(f"Number of solutions found: {len(self.solutions)}")
         max_solution = self.get_max_solution(self.solutions)
@@ -560,9 +746,11 @@ class DFS_Solver_Floor:
         placed_objects,
         branch_factor,
     ):
+        # placed_objects is shared by the whole search, snapshot it for the solutions
         if len(objects_list) == 0:
-            self.solutions.append(placed_objects)
-            return placed_objects
+            solution = dict(placed_objects)
+            self.solutions.append(solution)
+            return solution
 
         if time.time() - self.start_time > self.max_duration:
             print(f"Time limit reached.")
@@ -574,40 +762,124 @@ class DFS_Solver_Floor:
         )
 
         if len(placements) == 0 and len(placed_objects) != 0:
-            self.solutions.append(placed_objects)
+            self.solutions.append(dict(placed_objects))
 
         paths = []
         if branch_factor > 1:
-            random.shuffle(placements)  # shuffle the placements of the first object
+            # shuffle the placements of the first object
+            self.random.shuffle(placements)
 
         for placement in placements[:branch_factor]:
-            placed_objects_updated = copy.deepcopy(placed_objects)
-            placed_objects_updated[object_name] = placement
-            grid_points_updated = self.remove_points(
-                grid_points, placed_objects_updated
-            )
+            # push the placement, search the rest and pop it again
+            placed_objects[object_name] = placement
+            if self.occupancy is not None:
+                self.occupancy.place(object_name, placement[2])
+                grid_points_updated = self.occupancy.get_free_points()
+            else:
+                grid_points_updated = self.remove_points(grid_points, placed_objects)
 
             sub_paths = self.dfs(
                 room_poly,
                 objects_list[1:],
                 constraints,
                 grid_points_updated,
-                placed_objects_updated,
+                placed_objects,
                 1,
             )
             paths.extend(sub_paths)
 
+            del placed_objects[object_name]
+            if self.occupancy is not None:
+                self.occupancy.remove(object_name)
+
         return paths
 
+    def beam_search(
+        self, room_poly, objects_list, constraints, grid_points, initial_state
+    ):
+        # anytime search: every pass keeps the beam_width best partial layouts by
+        # accumulated score and only the best layout seen so far is kept. The width
+        # is doubled while there is time left, until the beam holds every candidate
+        # or a wider beam doesn't find a better layout
+        self.incumbent = (0, dict(initial_state))
+        beam_width = self.beam_width
+        previous_best = None
+        while True:
+            exhaustive, best = self.beam_pass(
+                room_poly, objects_list, constraints, initial_state, beam_width
+            )
+            if exhaustive or time.time() - self.start_time > self.max_duration:
+                break
+            if previous_best is not None and best <= previous_best:
+                break
+            previous_best = best
+            beam_width *= 2
+
+        self.solutions = [self.incumbent[1]]
+        return self.incumbent[1]
+
+    def beam_pass(
+        self, room_poly, objects_list, constraints, initial_state, beam_width
+    ):
+        # returns whether the beam held every candidate at every depth and the
+        # (number of objects placed, score) of the best layout of the pass
+        beam = [(0, dict(initial_state))]
+        best = (0, 0)
+        exhaustive = True
+        for depth, (object_name, object_dim) in enumerate(objects_list):
+            children = []
+            for score, placed_objects in beam:
+                if time.time() - self.start_time > self.max_duration:
+                    print(f"Time limit reached.")
+                    return False, best
+
+                # the occupancy grid holds one layout at a time
+                new_objects = [
+                    name for name in placed_objects if name not in initial_state
+                ]
+                for name in new_objects:
+                    self.occupancy.place(name, placed_objects[name][2])
+                placements = self.get_possible_placements(
+                    room_poly,
+                    object_dim,
+                    constraints[object_name],
+                    self.occupancy.get_free_points(),
+                    placed_objects,
+                )
+                for name in new_objects:
+                    self.occupancy.remove(name)
+
+                if len(placements) > beam_width:
+                    exhaustive = False
+                for placement in placements[:beam_width]:
+                    child = dict(placed_objects)
+                    child[object_name] = placement
+                    children.append((score + placement[-1], child))
+
+            if len(children) > beam_width:
+                exhaustive = False
+            children.sort(key=lambda child: child[0], reverse=True)
+            beam = children[:beam_width]
+            if len(beam) == 0:
+                break
+            best = (depth + 1, beam[0][0])
+            if beam[0][0] >= self.incumbent[0]:  # prefer the more complete layout
+                self.incumbent = beam[0]
+
+        return exhaustive, best
+
     def get_possible_placements(
         self, room_poly, object_dim, constraints, grid_points, placed_objects
     ):
         solutions = self.filter_collision(
-            placed_objects, self.get_all_solutions(room_poly, grid_points, object_dim)
+            placed_objects,
+            self.get_all_solutions(room_poly, grid_points, object_dim),
+            self.occupancy,
         )
         solutions = self.filter_facing_wall(room_poly, solutions, object_dim)
+        # place_edge moves the solutions it returns, a shallow copy of each is enough
         edge_solutions = self.place_edge(
-            room_poly, copy.deepcopy(solutions), object_dim
+            room_poly, [solution.copy() for solution in solutions], object_dim
         )
 
         if len(edge_solutions) == 0:
@@ -626,58 +898,64 @@ class DFS_Solver_Floor:
             global_constraint = {"type": "global", "constraint": "edge"}
 
         if global_constraint["constraint"] == "edge":
-            candidate_solutions = copy.deepcopy(
-                edge_solutions
-            )  # edge is hard constraint
+            candidate_solutions = edge_solutions  # edge is hard constraint
         else:
             if len(constraints) > 1:
                 candidate_solutions = (
                     solutions + edge_solutions
                 )  # edge is soft constraint
             else:
-                candidate_solutions = copy.deepcopy(solutions)  # the first object
+                candidate_solutions = solutions  # the first object
 
         candidate_solutions = self.filter_collision(
-            placed_objects, candidate_solutions
+            placed_objects, candidate_solutions, self.occupancy
         )  # filter again after global constraint
 
         if candidate_solutions == []:
             return candidate_solutions
-        random.shuffle(candidate_solutions)
+        self.random.shuffle(candidate_solutions)
         placement2score = {
             tuple(solution[:3]): solution[-1] for solution in candidate_solutions
         }
 
-        # add a bias to edge solutions
-        for solution in candidate_solutions:
-            if solution in edge_solutions and len(constraints) >= 1:
-                placement2score[tuple(solution[:3])] += self.edge_bouns
+        # add a bias to edge solutions, nothing to add with the default edge_bouns of 0
+        if self.edge_bouns != 0:
+            for solution in candidate_solutions:
+                if solution in edge_solutions and len(constraints) >= 1:
+                    placement2score[tuple(solution[:3])] += self.edge_bouns
+
+        # score all candidates per constraint at once, same as the place_* methods
+        # of func_dict. The bonuses are added in candidate order, like the loops did
+        scorer = ConstraintScorer(
+            candidate_solutions, self.grid_size, self.constraint_bouns
+        )
+        placement_indices = {
+            placement: index for index, placement in enumerate(placement2score)
+        }
+        solution_indices = np.array(
+            [
+                placement_indices[tuple(solution[:3])]
+                for solution in candidate_solutions
+            ],
+            dtype=np.int64,
+        )
+        scores = np.array(list(placement2score.values()), dtype=np.float64)
 
         for constraint in constraints:
             if "target" not in constraint:
                 continue
 
-            func = self.func_dict.get(constraint["type"])
-            valid_solutions = func(
+            valid, bonuses = scorer.get_scores(
+                constraint["type"],
                 constraint["constraint"],
                 placed_objects[constraint["target"]],
-                candidate_solutions,
             )
-
             weight = self.constraint_type2weight[constraint["type"]]
-            if constraint["type"] == "distance":
-                for solution in valid_solutions:
-                    bouns = solution[-1]
-                    placement2score[tuple(solution[:3])] += bouns * weight
-            else:
-                for solution in valid_solutions:
-                    placement2score[tuple(solution[:3])] += (
-                        self.constraint_bouns * weight
-                    )
+            np.add.at(scores, solution_indices[valid], bonuses[valid] * weight)
 
         # normalize the scores
-        for placement in placement2score:
-            placement2score[placement] /= max(len(constraints), 1)
+        scores /= max(len(constraints), 1)
+        placement2score = dict(zip(placement2score, scores.tolist()))
 
         sorted_placements = sorted(
             placement2score, key=placement2score.get, reverse=True
@@ -747,40 +1025,92 @@ class DFS_Solver_Floor:
         }
 
         solutions = []
+        if len(grid_points) == 0:
+            return solutions
+
+        # test the boxes of all grid points at once against the prepared room polygon
+        shapely.prepare(room_poly)
+        centers = np.array(grid_points, dtype=np.float64)
         for rotation in [0, 90, 180, 270]:
-            for point in grid_points:
-                center_x, center_y = point
-                lower_left_adjustment, upper_right_adjustment = rotation_adjustments[
-                    rotation
-                ]
-                lower_left = (
-                    center_x + lower_left_adjustment[0],
-                    center_y + lower_left_adjustment[1],
-                )
-                upper_right = (
-                    center_x + upper_right_adjustment[0],
-                    center_y + upper_right_adjustment[1],
-                )
-                obj_box = box(*lower_left, *upper_right)
+            lower_left_adjustment, upper_right_adjustment = rotation_adjustments[
+                rotation
+            ]
+            lower_left = centers + lower_left_adjustment
+            upper_right = centers + upper_right_adjustment
+            obj_boxes = shapely.box(
+                lower_left[:, 0], lower_left[:, 1], upper_right[:, 0], upper_right[:, 1]
+            )
+            inside = np.flatnonzero(shapely.contains(room_poly, obj_boxes))
 
-                if room_poly.contains(obj_box):
-                    solutions.append(
-                        [point, rotation, tuple(obj_box.exterior.coords[:]), 1]
-                    )
+            for index, (x_0, y_0), (x_1, y_1) in zip(
+                inside.tolist(),
+                lower_left[inside].tolist(),
+                upper_right[inside].tolist(),
+            ):
+                # same vertex order as shapely's box
+                obj_coords = (
+                    (x_1, y_0),
+                    (x_1, y_1),
+                    (x_0, y_1),
+                    (x_0, y_0),
+                    (x_1, y_0),
+                )
+                solutions.append([grid_points[index], rotation, obj_coords, 1])
 
         return solutions
 
-    def filter_collision(self, objects_dict, solutions):
-        valid_solutions = []
-        object_polygons = [
-            Polygon(obj_coords) for _, _, obj_coords, _ in list(objects_dict.values())
+    def filter_collision(self, objects_dict, solutions, occupancy=None):
+        if len(solutions) == 0 or len(objects_dict) == 0:
+            return list(solutions)
+
+        # the solutions are boxes, the first four vertices are enough
+        sol_coords = np.array(
+            [solution[2][:4] for solution in solutions], dtype=np.float64
+        )
+        if occupancy is None:
+            may_collide = np.ones(len(solutions), dtype=bool)
+        else:
+            # only the boxes over occupied cells need the exact test
+            may_collide = occupancy.may_collide(
+                sol_coords.min(axis=1), sol_coords.max(axis=1)
+            )
+
+        collided = np.zeros(len(solutions), dtype=bool)
+        if may_collide.any():
+            object_tree = STRtree(
+                [
+                    Polygon(obj_coords)
+                    for _, _, obj_coords, _ in list(objects_dict.values())
+                ]
+            )
+            sol_indices = np.flatnonzero(may_collide)
+            sol_objs = shapely.polygons(sol_coords[sol_indices])
+            collided[
+                sol_indices[object_tree.query(sol_objs, predicate="intersects")[0]]
+            ] = True
+
+        return [
+            solution
+            for solution, collision in zip(solutions, collided.tolist())
+            if not collision
         ]
-        for solution in solutions:
-            sol_obj_coords = solution[2]
-            sol_obj = Polygon(sol_obj_coords)
-            if not any(sol_obj.intersects(obj) for obj in object_polygons):
-                valid_solutions.append(solution)
-        return valid_solutions
+
+    def get_distance_field(self, room_poly):
+        # distances to the walls of the room, built once and reused by every dfs step
+        if (
+            self.distance_field is None
+            or self.distance_field.room_poly is not room_poly
+        ):
+            self.distance_field = WallDistanceField(room_poly)
+        return self.distance_field
+
+    def get_solution_arrays(self, solutions, adjustments):
+        # centers of the solutions, and the centers moved by the per rotation adjustment
+        centers = np.array([solution[0] for solution in solutions], dtype=np.float64)
+        offsets = np.array(
+            [adjustments[solution[1]] for solution in solutions], dtype=np.float64
+        )
+        return centers.reshape(-1, 2), (centers + offsets).reshape(-1, 2)
 
     def filter_facing_wall(self, room_poly, solutions, obj_dim):
         valid_solutions = []
@@ -794,21 +1124,17 @@ class DFS_Solver_Floor:
             270: (-obj_half_width, 0),
         }
 
-        valid_solutions = []
-        for solution in solutions:
-            center_x, center_y = solution[0]
-            rotation = solution[1]
-
-            front_center_adjustment = front_center_adjustments[rotation]
-            front_center_x, front_center_y = (
-                center_x + front_center_adjustment[0],
-                center_y + front_center_adjustment[1],
-            )
+        if len(solutions) == 0:
+            return valid_solutions
 
-            front_center_distance = room_poly.boundary.distance(
-                Point(front_center_x, front_center_y)
-            )
+        _, front_centers = self.get_solution_arrays(solutions, front_center_adjustments)
+        front_center_distances = self.get_distance_field(room_poly).distance(
+            front_centers
+        )
 
+        for solution, front_center_distance in zip(
+            solutions, front_center_distances.tolist()
+        ):
             if front_center_distance >= 30:  # TODO: make this a parameter
                 valid_solutions.append(solution)
 
@@ -826,44 +1152,40 @@ class DFS_Solver_Floor:
             270: (obj_half_width, 0),
         }
 
-        for solution in solutions:
-            center_x, center_y = solution[0]
-            rotation = solution[1]
+        if len(solutions) == 0:
+            return valid_solutions
 
-            back_center_adjustment = back_center_adjustments[rotation]
-            back_center_x, back_center_y = (
-                center_x + back_center_adjustment[0],
-                center_y + back_center_adjustment[1],
-            )
+        distance_field = self.get_distance_field(room_poly)
+        centers, back_centers = self.get_solution_arrays(
+            solutions, back_center_adjustments
+        )
+        back_center_distances = distance_field.distance(back_centers)
+        center_distances = distance_field.distance(centers)
 
-            back_center_distance = room_poly.boundary.distance(
-                Point(back_center_x, back_center_y)
-            )
-            center_distance = room_poly.boundary.distance(Point(center_x, center_y))
+        on_edge = np.flatnonzero(
+            (back_center_distances <= self.grid_size)
+            & (back_center_distances < center_distances)
+        )
 
-            if (
-                back_center_distance <= self.grid_size
-                and back_center_distance < center_distance
-            ):
-                solution[-1] += self.constraint_bouns
-                # valid_solutions.append(solution) # those are still valid solutions, but we need to move the object to the edge
+        # move the objects to the edge, add a small distance to avoid the object cross the wall
+        center2back_vectors = back_centers[on_edge] - centers[on_edge]
+        center2back_vectors /= np.linalg.norm(center2back_vectors, axis=1)[:, None]
+        offsets = center2back_vectors * (back_center_distances[on_edge] + 4.5)[:, None]
 
-                # move the object to the edge
-                center2back_vector = np.array(
-                    [back_center_x - center_x, back_center_y - center_y]
-                )
-                center2back_vector /= np.linalg.norm(center2back_vector)
-                offset = center2back_vector * (
-                    back_center_distance + 4.5
-                )  # add a small distance to avoid the object cross the wall
-                solution[0] = (center_x + offset[0], center_y + offset[1])
-                solution[2] = (
-                    (solution[2][0][0] + offset[0], solution[2][0][1] + offset[1]),
-                    (solution[2][1][0] + offset[0], solution[2][1][1] + offset[1]),
-                    (solution[2][2][0] + offset[0], solution[2][2][1] + offset[1]),
-                    (solution[2][3][0] + offset[0], solution[2][3][1] + offset[1]),
-                )
-                valid_solutions.append(solution)
+        for index, offset in zip(on_edge.tolist(), offsets):
+            solution = solutions[index]
+            center_x, center_y = solution[0]
+            solution[-1] += self.constraint_bouns
+            # valid_solutions.append(solution) # those are still valid solutions, but we need to move the object to the edge
+
+            solution[0] = (center_x + offset[0], center_y + offset[1])
+            solution[2] = (
+                (solution[2][0][0] + offset[0], solution[2][0][1] + offset[1]),
+                (solution[2][1][0] + offset[0], solution[2][1][1] + offset[1]),
+                (solution[2][2][0] + offset[0], solution[2][2][1] + offset[1]),
+                (solution[2][3][0] + offset[0], solution[2][3][1] + offset[1]),
+            )
+            valid_solutions.append(solution)
 
         return valid_solutions
 
@@ -881,24 +1203,31 @@ class DFS_Solver_Floor:
         edge_solutions = self.place_edge(room_poly, solutions, obj_dim)
 
         valid_solutions = []
+        if len(edge_solutions) == 0:
+            return valid_solutions
+
+        distance_field = self.get_distance_field(room_poly)
+        _, left_centers = self.get_solution_arrays(
+            edge_solutions,
+            {
+                rotation: left
+                for rotation, (left, _) in rotation_center_adjustments.items()
+            },
+        )
+        _, right_centers = self.get_solution_arrays(
+            edge_solutions,
+            {
+                rotation: right
+                for rotation, (_, right) in rotation_center_adjustments.items()
+            },
+        )
+        side_distances = np.minimum(
+            distance_field.distance(left_centers),
+            distance_field.distance(right_centers),
+        )
 
-        for solution in edge_solutions:
-            (center_x, center_y), rotation = solution[:2]
-            (dx_left, dy_left), (dx_right, dy_right) = rotation_center_adjustments[
-                rotation
-            ]
-
-            left_center_x, left_center_y = center_x + dx_left, center_y + dy_left
-            right_center_x, right_center_y = center_x + dx_right, center_y + dy_right
-
-            left_center_distance = room_poly.boundary.distance(
-                Point(left_center_x, left_center_y)
-            )
-            right_center_distance = room_poly.boundary.distance(
-                Point(right_center_x, right_center_y)
-            )
-
-            if min(left_center_distance, right_center_distance) < self.grid_size:
+        for solution, side_distance in zip(edge_solutions, side_distances.tolist()):
+            if side_distance < self.grid_size:
                 solution[-1] += self.constraint_bouns
                 valid_solutions.append(solution)
 
@@ -1140,44 +1469,83 @@ class DFS_Solver_Floor:
         plt.savefig(f"{create_time}.pdf", bbox_inches="tight", dpi=300)
         plt.show()
 
-    def milp_dfs(
-        self, room_poly, all_objects_list, constraints, placed_objects, branch_factor=1
-    ):
-        if len(all_objects_list) == 0:
-            self.solutions.append(placed_objects)
-            return placed_objects
-
-        if time.time() - self.start_time > self.max_duration:
-            print(f"Time limit reached.")
-            raise SolutionFound(self.solutions)
-
-        def milp_solve(soft_constraints_list, hard_constraints_list, verbose=False):
-            problem = cp.Problem(
-                cp.Maximize(sum(soft_constraints_list)), hard_constraints_list
+    def get_milp_key(self, room_poly, objects_list, constraints, placed_objects):
+        # the structure of the problem: the room, the number of objects and which
+        # constraints link which objects by their position in the lists. Names, sizes
+        # and the poses of the placed objects are parameters of the problem
+        positions = {
+            object_name: i
+            for i, object_name in enumerate(
+                [object_name for object_name, _ in objects_list] + list(placed_objects)
             )
-            if verbose:
-                print("solving milp using GUROBI ...")
-            problem.solve(solver=cp.GUROBI, reoptimize=True, verbose=False)
-            return problem.value
-
-        def parse_object_properties(object_properties):
-            x, y = object_properties[0]
-            rotation = int(object_properties[1] or 0)
-            # set rotation to the closest 90 degree
-            rotation = int(round(rotation / 90) * 90)
-            assert rotation in [0, 90, 180, 270]
-            object_bbox = object_properties[2]
-            min_x = min([point[0] for point in object_bbox])
-            max_x = max([point[0] for point in object_bbox])
-            min_y = min([point[1] for point in object_bbox])
-            max_y = max([point[1] for point in object_bbox])
-            object_dim = (
-                (max_x - min_x, max_y - min_y)
-                if rotation == 0 or rotation == 180
-                else (max_y - min_y, max_x - min_x)
+        }
+        object_constraints = tuple(
+            tuple(
+                (
+                    constraint["type"],
+                    constraint.get("constraint"),
+                    (
+                        positions.get(constraint["target"], -1)
+                        if "target" in constraint
+                        else None
+                    ),
+                )
+                for constraint in constraints[object_name]
+            )
+            for object_name, _ in objects_list
+        )
+        identical_pairs = tuple(
+            (positions[object_name_1], positions[object_name_2])
+            for object_name_1, object_name_2 in get_identical_object_pairs(
+                objects_list, constraints
             )
-            return x, y, rotation, object_dim
+        )
+        return (
+            room_poly.bounds,
+            len(objects_list),
+            len(placed_objects),
+            object_constraints,
+            identical_pairs,
+        )
+
+    def get_milp_problem(self, room_poly, objects_list, constraints, placed_objects):
+        # the problem is built (and compiled by cvxpy) once per structure and reused
+        # for other objects of the same shape with new parameter values
+        key = self.get_milp_key(room_poly, objects_list, constraints, placed_objects)
+        if key not in self.milp_templates:
+            self.milp_templates[key] = self.build_milp_problem(
+                room_poly, objects_list, constraints, placed_objects
+            )
+        problem, object_variables, parameters = self.milp_templates[key]
+        dim_parameters, placed_parameters, big_m = parameters
+
+        for (_, object_dim), (x_size, y_size) in zip(objects_list, dim_parameters):
+            x_size.value = float(object_dim[0])
+            y_size.value = float(object_dim[1])
+
+        for object_properties, object_parameters in zip(
+            placed_objects.values(), placed_parameters
+        ):
+            values = get_placed_values(object_properties)
+            for parameter, value in zip(object_parameters, values):
+                parameter.value = value
+
+        big_m.value = get_big_m(
+            room_poly.bounds,
+            [object_dim for _, object_dim in objects_list]
+            + [
+                parse_object_properties(object_properties)[3]
+                for object_properties in placed_objects.values()
+            ],
+        )
+
+        variables_dict = {
+            object_name: variables
+            for (object_name, _), variables in zip(objects_list, object_variables)
+        }
+        return problem, variables_dict
 
+    def build_milp_problem(self, room_poly, objects_list, constraints, placed_objects):
         def find_object_dim(target_object_name, objects_list, placed_objects):
             target_object_dim = None
             for object_name_1, object_dim_1 in objects_list:
@@ -1194,215 +1562,262 @@ class DFS_Solver_Floor:
                         return target_object_dim
             return None
 
-        found_a_solution = False
-        # randomly select a set of objects from all_objects_list
-        # start with the largest object + more objects --> gradually reduce the number of objects
-        for branch_idx in range(branch_factor):
-            # sample a set of objects from a list that contains the first object
-
-            k = random.randint(0, min(5, len(all_objects_list) - 1))
-            objects_list = [all_objects_list[0]] + random.sample(
-                all_objects_list[1:], k
+        hard_constraints_list = []
+        soft_constraints_list = [0]
+
+        # formulate the milp problem
+        # object_name, object_dim = objects_list[0]
+        # x, y, rotate_180, rotate_90
+        variables_dict = {
+            object[0]: [
+                cp.Variable(),
+                cp.Variable(),
+                cp.Variable(boolean=True),
+                cp.Variable(boolean=True),
+            ]
+            for object in objects_list
+        }
+        # the object sizes are parameters so the problem can be reused for others
+        dim_parameters = [
+            (cp.Parameter(nonneg=True), cp.Parameter(nonneg=True)) for _ in objects_list
+        ]
+        object_variables = [variables_dict[object[0]] for object in objects_list]
+        identical_pairs = get_identical_object_pairs(objects_list, constraints)
+        objects_list = [
+            (object_name, object_dim)
+            for (object_name, _), object_dim in zip(objects_list, dim_parameters)
+        ]
+        # add placed objects into variables dict even though they are not variables,
+        # their position, rotation and half sizes are parameters (see get_placed_values)
+        placed_parameters = {}
+        for object in placed_objects:
+            placed_parameters[object] = [cp.Parameter() for _ in range(10)]
+            variables_dict[object] = placed_parameters[object][:6]
+
+        # Initialize a list of variables, each variable represents the coordinate for each object
+        room_min_x, room_min_y, room_max_x, room_max_y = room_poly.bounds
+        # big-M of the disjunctive constraints, derived from the room and object sizes
+        big_m = cp.Parameter(nonneg=True)
+        # Add boundary constraints to all objects
+        for object_name, object_dim in objects_list:
+            hard_constraints_list.extend(
+                create_boundary_constraints(
+                    variables_dict[object_name],
+                    object_dim,
+                    (room_min_x, room_min_y, room_max_x, room_max_y),
+                )
             )
+        # Add pariwise collision constraints
+        for object_name_1, object_dim_1 in objects_list:
+            for object_name_2, object_dim_2 in objects_list:
+                if object_name_1 == object_name_2:
+                    continue
+                # collision constraints should be hard constraints
+                hard_constraints_list.extend(
+                    create_nooverlap_constraints(
+                        variables_dict[object_name_1],
+                        variables_dict[object_name_2],
+                        object_dim_1,
+                        object_dim_2,
+                        M=big_m,
+                    )
+                )
 
-            hard_constraints_list = []
-            soft_constraints_list = [0]
-
-            # formulate the milp problem
-            # object_name, object_dim = objects_list[0]
-            # x, y, rotate_180, rotate_90
-            variables_dict = {
-                object[0]: [
-                    cp.Variable(),
-                    cp.Variable(),
-                    cp.Variable(boolean=True),
-                    cp.Variable(boolean=True),
-                ]
-                for object in objects_list
-            }
-            # add placed objects into variables dict even though they are not variables
-            for object, object_properties in placed_objects.items():
-                x, y = object_properties[0]
-                rotation = int(object_properties[1])
-                variables_dict[object] = [
-                    x,
-                    y,
-                    rotation == 180,
-                    rotation == 90 or rotation == 270,
-                ]
+        # Add pariwise collision constraints with placed objects
+        for object_name_1, object_dim_1 in objects_list:
+            for object_name_2, object_properties_2 in placed_objects.items():
+                # bbox is a list of four points
+                x, y, rotation, object_dim_2 = parse_object_properties(
+                    object_properties_2
+                )
+                # the rotation snapped to 90 degrees
+                x, y = placed_parameters[object_name_2][:2]
+                snapped = placed_parameters[object_name_2][6:]
 
-            # Initialize a list of variables, each variable represents the coordinate for each object
-            room_min_x, room_min_y, room_max_x, room_max_y = room_poly.bounds
-            # Add boundary constraints to all objects
-            for object_name, object_dim in objects_list:
                 hard_constraints_list.extend(
-                    create_boundary_constraints(
-                        variables_dict[object_name],
-                        object_dim,
-                        (room_min_x, room_min_y, room_max_x, room_max_y),
+                    create_nooverlap_constraints(
+                        variables_dict[object_name_1],
+                        [x, y] + snapped,
+                        object_dim_1,
+                        object_dim_2,
+                        M=big_m,
                     )
                 )
-            # Add pariwise collision constraints
-            for object_name_1, object_dim_1 in objects_list:
-                for object_name_2, object_dim_2 in objects_list:
-                    if object_name_1 == object_name_2:
-                        continue
-                    # collision constraints should be hard constraints
-                    hard_constraints_list.extend(
-                        create_nooverlap_constraints(
-                            variables_dict[object_name_1],
-                            variables_dict[object_name_2],
-                            object_dim_1,
-                            object_dim_2,
-                        )
-                    )
 
-            # Add pariwise collision constraints with placed objects
-            for object_name_1, object_dim_1 in objects_list:
-                for object_name_2, object_properties_2 in placed_objects.items():
-                    # bbox is a list of four points
-                    x, y, rotation, object_dim_2 = parse_object_properties(
-                        object_properties_2
-                    )
+        # break the symmetry between interchangeable copies of the same object
+        for object_name_1, object_name_2 in identical_pairs:
+            hard_constraints_list.extend(
+                create_symmetry_breaking_constraints(
+                    variables_dict[object_name_1], variables_dict[object_name_2]
+                )
+            )
 
-                    hard_constraints_list.extend(
-                        create_nooverlap_constraints(
-                            variables_dict[object_name_1],
-                            [x, y, rotation == 180, rotation == 90 or rotation == 270],
-                            object_dim_1,
-                            object_dim_2,
+        # default constraints / heuristics?
+        for object_name, object_dim in objects_list:
+            # encourage dispersement of assets
+            all_other_objects_list = [
+                x[0] for x in objects_list if x[0] != object_name
+            ] + list(placed_objects.keys())
+            for target_object_name in all_other_objects_list:
+                hard_constraints, soft_constraints = create_distance_constraints(
+                    variables_dict[object_name],
+                    variables_dict[target_object_name],
+                    upper_bound=[room_max_x - room_min_x, room_max_y - room_min_y],
+                    type="far",
+                    M=big_m,
+                )
+                assert len(soft_constraints) == 1
+                # soft_constraints[0] *= 0.001
+                hard_constraints_list.extend(hard_constraints)
+                soft_constraints_list.extend(soft_constraints)
+
+        # use cvxpy to solve for the hard constraints
+        for object_name, object_dim in objects_list:
+
+            # by default - add soft edge constraints although this might make the solver take a longer time
+            if not any(
+                constraint["type"] == "global"
+                for constraint in constraints[object_name]
+            ):
+                hard_constraints, soft_constraints = create_edge_constraints(
+                    variables_dict[object_name],
+                    object_dim,
+                    room_dim=(room_min_x, room_min_y, room_max_x, room_max_y),
+                    hard=False,
+                    M=big_m,
+                )
+                soft_constraints[0] *= 100
+                hard_constraints_list.extend(hard_constraints)
+                soft_constraints_list.extend(soft_constraints)
+
+            for constraint in constraints[object_name]:
+                if constraint["type"] == "global":
+                    if constraint["constraint"] == "edge":  # hard constraints
+                        hard_constraints, soft_constraints = create_edge_constraints(
+                            variables_dict[object_name],
+                            object_dim,
+                            room_dim=(
+                                room_min_x,
+                                room_min_y,
+                                room_max_x,
+                                room_max_y,
+                            ),
+                            hard=True,
+                            M=big_m,
                         )
+                        hard_constraints_list.extend(hard_constraints)
+                        soft_constraints_list.extend(soft_constraints)
+
+                if constraint["type"] == "direction":
+                    assert constraint["constraint"] == "face to"
+                    target_object_name = constraint["target"]
+                    target_object_dim = find_object_dim(
+                        target_object_name, objects_list, placed_objects
                     )
+                    if target_object_dim:
+                        hard_constraints_list.extend(
+                            create_directional_constraints(
+                                variables_dict[object_name],
+                                variables_dict[target_object_name],
+                                object_dim,
+                                target_object_dim,
+                                M=big_m,
+                            )
+                        )
 
-            # default constraints / heuristics?
-            for object_name, object_dim in objects_list:
-                # encourage dispersement of assets
-                all_other_objects_list = [
-                    x[0] for x in objects_list if x[0] != object_name
-                ] + list(placed_objects.keys())
-                for target_object_name in all_other_objects_list:
-                    hard_constraints, soft_constraints = create_distance_constraints(
-                        variables_dict[object_name],
-                        variables_dict[target_object_name],
-                        upper_bound=[room_max_x - room_min_x, room_max_y - room_min_y],
-                        type="far",
+                if constraint["type"] == "alignment":
+                    assert constraint["constraint"] == "center aligned"
+                    target_object_name = constraint["target"]
+                    target_object_dim = find_object_dim(
+                        target_object_name, objects_list, placed_objects
                     )
-                    assert len(soft_constraints) == 1
-                    # soft_constraints[0] *= 0.001
-                    hard_constraints_list.extend(hard_constraints)
-                    soft_constraints_list.extend(soft_constraints)
-
-            # use cvxpy to solve for the hard constraints
-            for object_name, object_dim in objects_list:
+                    if target_object_dim:
+                        hard_constraints_list.extend(
+                            create_alignment_constraints(
+                                variables_dict[object_name],
+                                variables_dict[target_object_name],
+                                object_dim,
+                                target_object_dim,
+                                M=big_m,
+                            )
+                        )
 
-                # by default - add soft edge constraints although this might make the solver take a longer time
-                if not any(
-                    constraint["type"] == "global"
-                    for constraint in constraints[object_name]
-                ):
-                    hard_constraints, soft_constraints = create_edge_constraints(
-                        variables_dict[object_name],
-                        object_dim,
-                        room_dim=(room_min_x, room_min_y, room_max_x, room_max_y),
-                        hard=False,
+                if constraint["type"] == "distance":
+                    target_object_name = constraint["target"]
+                    target_object_dim = find_object_dim(
+                        target_object_name, objects_list, placed_objects
                     )
-                    soft_constraints[0] *= 100
-                    hard_constraints_list.extend(hard_constraints)
-                    soft_constraints_list.extend(soft_constraints)
-
-                for constraint in constraints[object_name]:
-                    if constraint["type"] == "global":
-                        if constraint["constraint"] == "edge":  # hard constraints
-                            hard_constraints, soft_constraints = (
-                                create_edge_constraints(
-                                    variables_dict[object_name],
-                                    object_dim,
-                                    room_dim=(
-                                        room_min_x,
-                                        room_min_y,
-                                        room_max_x,
-                                        room_max_y,
-                                    ),
-                                    hard=True,
-                                )
+                    if target_object_dim:
+                        hard_constraints, soft_constraints = (
+                            create_distance_constraints(
+                                variables_dict[object_name],
+                                variables_dict[target_object_name],
+                                upper_bound=[
+                                    room_max_x - room_min_x,
+                                    room_max_y - room_min_y,
+                                ],
+                                type=constraint["constraint"],
+                                M=big_m,
                             )
-                            hard_constraints_list.extend(hard_constraints)
-                            soft_constraints_list.extend(soft_constraints)
-
-                    if constraint["type"] == "direction":
-                        assert constraint["constraint"] == "face to"
-                        target_object_name = constraint["target"]
-                        target_object_dim = find_object_dim(
-                            target_object_name, objects_list, placed_objects
                         )
-                        if target_object_dim:
-                            hard_constraints_list.extend(
-                                create_directional_constraints(
-                                    variables_dict[object_name],
-                                    variables_dict[target_object_name],
-                                    object_dim,
-                                    target_object_dim,
-                                )
+                        hard_constraints_list.extend(hard_constraints)
+                        soft_constraints_list.extend(soft_constraints)
+                        assert len(soft_constraints) == 1
+                        # higher weighting
+                        soft_constraints[0] *= 0.01
+
+                if constraint["type"] == "relative":
+                    target_object_name = constraint["target"]
+                    target_object_dim = find_object_dim(
+                        target_object_name, objects_list, placed_objects
+                    )
+                    if target_object_dim:
+                        hard_constraints_list.extend(
+                            create_relative_constraints(
+                                variables_dict[object_name],
+                                variables_dict[target_object_name],
+                                object_dim,
+                                target_object_dim,
+                                constraint["constraint"],
+                                M=big_m,
                             )
-
-                    if constraint["type"] == "alignment":
-                        assert constraint["constraint"] == "center aligned"
-                        target_object_name = constraint["target"]
-                        target_object_dim = find_object_dim(
-                            target_object_name, objects_list, placed_objects
                         )
-                        if target_object_dim:
-                            hard_constraints_list.extend(
-                                create_alignment_constraints(
-                                    variables_dict[object_name],
-                                    variables_dict[target_object_name],
-                                    object_dim,
-                                    target_object_dim,
-                                )
-                            )
 
-                    if constraint["type"] == "distance":
-                        target_object_name = constraint["target"]
-                        target_object_dim = find_object_dim(
-                            target_object_name, objects_list, placed_objects
-                        )
-                        if target_object_dim:
-                            hard_constraints, soft_constraints = (
-                                create_distance_constraints(
-                                    variables_dict[object_name],
-                                    variables_dict[target_object_name],
-                                    upper_bound=[
-                                        room_max_x - room_min_x,
-                                        room_max_y - room_min_y,
-                                    ],
-                                    type=constraint["constraint"],
-                                )
-                            )
-                            hard_constraints_list.extend(hard_constraints)
-                            soft_constraints_list.extend(soft_constraints)
-                            assert len(soft_constraints) == 1
-                            # higher weighting
-                            soft_constraints[0] *= 0.01
+        problem = cp.Problem(
+            cp.Maximize(sum(soft_constraints_list)), hard_constraints_list
+        )
+        return (
+            problem,
+            object_variables,
+            (dim_parameters, list(placed_parameters.values()), big_m),
+        )
 
-                    if constraint["type"] == "relative":
-                        target_object_name = constraint["target"]
-                        target_object_dim = find_object_dim(
-                            target_object_name, objects_list, placed_objects
-                        )
-                        if target_object_dim:
-                            hard_constraints_list.extend(
-                                create_relative_constraints(
-                                    variables_dict[object_name],
-                                    variables_dict[target_object_name],
-                                    object_dim,
-                                    target_object_dim,
-                                    constraint["constraint"],
-                                )
-                            )
+    def milp_dfs(
+        self, room_poly, all_objects_list, constraints, placed_objects, branch_factor=1
+    ):
+        if len(all_objects_list) == 0:
+            self.solutions.append(placed_objects)
+            return placed_objects
+
+        if time.time() - self.start_time > self.max_duration:
+            print(f"Time limit reached.")
+            raise SolutionFound(self.solutions)
+
+        found_a_solution = False
+        # randomly select a set of objects from all_objects_list
+        # start with the largest object + more objects --> gradually reduce the number of objects
+        for branch_idx in range(branch_factor):
+            # sample a set of objects from a list that contains the first object
+
+            k = self.random.randint(0, min(5, len(all_objects_list) - 1))
+            objects_list = [all_objects_list[0]] + self.random.sample(
+                all_objects_list[1:], k
+            )
 
-            result = milp_solve(
-                soft_constraints_list, hard_constraints_list, verbose=False
+            problem, variables_dict = self.get_milp_problem(
+                room_poly, objects_list, constraints, placed_objects
             )
+            result = solve_milp(problem)
             if result is None or math.isnan(result) or math.isinf(result):
                 continue
 
@@ -1416,12 +1831,15 @@ class DFS_Solver_Floor:
                 # (x, y), rotation, bbox, score
                 x = variables_dict[object_name][0].value.item()
                 y = variables_dict[object_name][1].value.item()
-                rotate_180 = variables_dict[object_name][2].value
-                rotate_90 = variables_dict[object_name][3].value
-                if not rotate_180:
-                    rotate_180 = 0
-                if not rotate_90:
-                    rotate_90 = 0
+                # the solver returns binaries up to a tolerance, e.g. 1e-12 or 0.99999
+                rotate_180, rotate_90 = [
+                    (
+                        int(round(variable.value.item()))
+                        if variable.value is not None
+                        else 0
+                    )
+                    for variable in variables_dict[object_name][2:4]
+                ]
 
                 # bbox has taken into account of the rotation
                 if rotate_90:
@@ -1,3 +1,4 @@
+import asyncio
 import datetime
 import os
 from typing import Optional, Dict, Any, Tuple
@@ -17,17 +18,27 @@ from ai2holodeck.constants import (
     HOLODECK_THOR_ANNOTATIONS_PATH,
     LLM_MODEL_NAME,
     ABS_PATH_OF_HOLODECK,
+    HOLODECK_CACHE_DIR,
+    HOLODECK_PERSIST_EMBEDDING_CACHE,
+    HOLODECK_LAYOUT_CACHE_MB,
+    HOLODECK_LLM_CACHE,
+    HOLODECK_LLM_CACHE_TTL_DAYS,
+    HOLODECK_LLM_CACHE_MAX_ENTRIES,
 )
 from ai2holodeck.generation.ceiling_objects import CeilingObjectGenerator
 from ai2holodeck.generation.doors import DoorGenerator
+from ai2holodeck.generation.embedding_cache import EmbeddingCache
 from ai2holodeck.generation.floor_objects import FloorObjectGenerator
 from ai2holodeck.generation.layers import map_asset2layer
+from ai2holodeck.generation.layout_cache import LayoutCache
 from ai2holodeck.generation.lights import generate_lights
+from ai2holodeck.generation.llm_cache import CachedLLM, LLMResponseCache
 from ai2holodeck.generation.objaverse_retriever import ObjathorRetriever
 from ai2holodeck.generation.object_selector import ObjectSelector
 from ai2holodeck.generation.rooms import FloorPlanGenerator
 from ai2holodeck.generation.skybox import getSkybox
 from ai2holodeck.generation.small_objects import SmallObjectGenerator
+from ai2holodeck.generation.stage_scheduler import Stage, StageScheduler
 from ai2holodeck.generation.utils import get_top_down_frame, room_video
 from ai2holodeck.generation.wall_objects import WallObjectGenerator
 from ai2holodeck.generation.walls import WallGenerator
@@ -74,6 +85,18 @@ class Holodeck:
             openai_api_key=openai_api_key,
             openai_api_base=openai_api_base,
         )
+        self.llm_cache = None
+        if HOLODECK_LLM_CACHE in ["on", "replay"]:
+            self.llm_cache = LLMResponseCache(
+                os.path.join(HOLODECK_CACHE_DIR, "llm_responses.sqlite"),
+                ttl=HOLODECK_LLM_CACHE_TTL_DAYS * 24 * 3600,
+                max_entries=HOLODECK_LLM_CACHE_MAX_ENTRIES,
+            )
+            self.llm = CachedLLM(
+                self.llm, self.llm_cache, replay=HOLODECK_LLM_CACHE == "replay"
+            )
+        elif HOLODECK_LLM_CACHE != "off":
+            print(f"Error: unknown HOLODECK_LLM_CACHE mode {HOLODECK_LLM_CACHE}")
 
         # initialize CLIP
         (
@@ -91,6 +114,16 @@ class Holodeck:
         # objaverse version and asset dir
         self.objaverse_asset_dir = objaverse_asset_dir
 
+        # cache of query embeddings, shared across rooms, variants and requests
+        self.embedding_cache = EmbeddingCache(
+            max_size=20000,
+            cache_path=(
+                os.path.join(HOLODECK_CACHE_DIR, "query_embeddings.sqlite")
+                if HOLODECK_PERSIST_EMBEDDING_CACHE
+                else None
+            ),
+        )
+
         # initialize generation
         self.retrieval_threshold = 28
         self.object_retriever = ObjathorRetriever(
@@ -99,6 +132,9 @@ class Holodeck:
             clip_tokenizer=self.clip_tokenizer,
             sbert_model=self.sbert_model,
             retrieval_threshold=self.retrieval_threshold,
+            embedding_cache=self.embedding_cache,
+            clip_model_name="ViT-L-14/laion2b_s32b_b82k",
+            sbert_model_name="all-mpnet-base-v2",
         )
         self.floor_generator = FloorPlanGenerator(
             self.clip_model, self.clip_preprocess, self.clip_tokenizer, self.llm
@@ -124,6 +160,18 @@ class Holodeck:
             object_retriever=self.object_retriever, llm=self.llm
         )
 
+        # solved floor and wall layouts, reused by reruns, variants and ablations
+        self.layout_cache = (
+            LayoutCache(
+                os.path.join(HOLODECK_CACHE_DIR, "layouts"),
+                max_bytes=HOLODECK_LAYOUT_CACHE_MB * 1024 * 1024,
+            )
+            if HOLODECK_LAYOUT_CACHE_MB > 0
+            else None
+        )
+        self.floor_object_generator.layout_cache = self.layout_cache
+        self.wall_object_generator.layout_cache = self.layout_cache
+
         # additional requirements
         single_room_requirements = "I only need one room"
 
@@ -139,6 +187,9 @@ class Holodeck:
         self.additional_requirements_object = "N/A"
         self.additional_requirements_ceiling = "N/A"
 
+        # stage name -> (start, duration) of the last generate_scene_async
+        self.stage_timings = {}
+
     def get_empty_scene(self):
         return compress_json.load(
             os.path.join(ABS_PATH_OF_HOLODECK, "generation/empty_house.json")
@@ -337,6 +388,260 @@ class Holodeck:
             )
             scene["objects"] += scene["ceiling_objects"]
 
+        return self.finish_scene(
+            scene, query, save_dir, generate_image, generate_video, add_time
+        )
+
+    async def generate_scene_async(
+        self,
+        scene,
+        query: str,
+        save_dir: str,
+        used_assets=[],
+        add_ceiling=False,
+        generate_image=True,
+        generate_video=False,
+        add_time=True,
+        use_constraint=True,
+        random_selection=False,
+        use_milp=False,
+    ) -> Tuple[Dict[str, Any], str]:
+        # same as generate_scene with the async llm calls, the stages run as a
+        # dependency graph so independent prompts are sent concurrently (up to
+        # HOLODECK_LLM_CONCURRENCY at a time)
+        query = query.replace("_", " ")
+        scene["query"] = query
+
+        # empty house
+        scene = self.empty_house(scene)
+
+        scheduler = StageScheduler(
+            self.get_scene_stages(
+                used_assets=used_assets,
+                add_ceiling=add_ceiling,
+                use_constraint=use_constraint,
+                random_selection=random_selection,
+                use_milp=use_milp,
+            )
+        )
+        scene = await scheduler.run(scene)
+        self.stage_timings = scheduler.timings
+        print(f"Stage timings (start + duration):\n{scheduler.format_timings()}")
+
+        return await asyncio.to_thread(
+            self.finish_scene,
+            scene,
+            query,
+            save_dir,
+            generate_image,
+            generate_video,
+            add_time,
+        )
+
+    def get_scene_stages(
+        self,
+        used_assets=[],
+        add_ceiling=False,
+        use_constraint=True,
+        random_selection=False,
+        use_milp=False,
+    ):
+        # the stages of generate_scene with the scene keys they read and write, in
+        # the order generate_scene runs them
+        async def rooms(scene):
+            self.floor_generator.used_assets = used_assets
+            rooms = await self.floor_generator.generate_rooms_async(
+                scene, self.additional_requirements_room
+            )
+            return {"rooms": rooms, "raw_floor_plan": scene["raw_floor_plan"]}
+
+        async def wall_height(scene):
+            return {
+                "wall_height": await self.wall_generator.get_wall_height_async(scene)
+            }
+
+        def walls(scene):
+            _, walls = self.wall_generator.generate_walls(scene)
+            return {"walls": walls}
+
+        async def doors(scene):
+            self.door_generator.used_assets = used_assets
+            (
+                raw_doorway_plan,
+                doors,
+                room_pairs,
+                open_room_pairs,
+            ) = await self.door_generator.generate_doors_async(
+                scene, self.additional_requirements_door
+            )
+            walls, open_walls = self.wall_generator.update_walls(
+                scene["walls"], open_room_pairs
+            )
+            return {
+                "raw_doorway_plan": raw_doorway_plan,
+                "doors": doors,
+                "room_pairs": room_pairs,
+                "open_room_pairs": open_room_pairs,
+                "walls": walls,
+                "open_walls": open_walls,
+            }
+
+        async def windows(scene):
+            self.window_generator.used_assets = used_assets
+            (
+                raw_window_plan,
+                walls,
+                windows,
+            ) = await self.window_generator.generate_windows_async(
+                scene, self.additional_requirements_window
+            )
+            return {
+                "raw_window_plan": raw_window_plan,
+                "walls": walls,
+                "windows": windows,
+            }
+
+        async def ceiling_objects(scene):
+            (
+                raw_ceiling_plan,
+                ceiling_objects,
+            ) = await self.ceiling_generator.generate_ceiling_objects_async(
+                scene, self.additional_requirements_ceiling
+            )
+            return {
+                "raw_ceiling_plan": raw_ceiling_plan,
+                "ceiling_objects": ceiling_objects,
+            }
+
+        async def select_objects(scene):
+            self.object_selector.random_selection = random_selection
+            self.object_selector.used_assets = used_assets
+            (
+                object_selection_plan,
+                selected_objects,
+            ) = await self.object_selector.select_objects_async(
+                scene, self.additional_requirements_object
+            )
+            return {
+                "object_selection_plan": object_selection_plan,
+                "selected_objects": selected_objects,
+            }
+
+        async def floor_objects(scene):
+            self.floor_object_generator.use_milp = use_milp
+            floor_objects = await self.floor_object_generator.generate_objects_async(
+                scene, use_constraint=use_constraint
+            )
+            return {"floor_objects": floor_objects}
+
+        async def wall_objects(scene):
+            wall_objects = await self.wall_object_generator.generate_wall_objects_async(
+                scene, use_constraint=use_constraint
+            )
+            return {"wall_objects": wall_objects}
+
+        def small_objects(scene):
+            scene["objects"] = scene["floor_objects"] + scene["wall_objects"]
+            scene = self.generate_small_objects(scene, used_assets=used_assets)
+            outputs = {
+                "objects": scene["objects"] + scene["small_objects"],
+                "small_objects": scene["small_objects"],
+            }
+            if "receptacle2small_objects" in scene:
+                outputs["receptacle2small_objects"] = scene["receptacle2small_objects"]
+            return outputs
+
+        def add_ceiling_objects(scene):
+            return {"objects": scene["objects"] + scene["ceiling_objects"]}
+
+        stages = [
+            Stage("rooms", rooms, ["query"], ["rooms", "raw_floor_plan"]),
+            Stage("wall_height", wall_height, ["query"], ["wall_height"]),
+            Stage("walls", walls, ["rooms", "wall_height"], ["walls"]),
+            Stage(
+                "doors",
+                doors,
+                ["query", "rooms", "walls", "wall_height"],
+                [
+                    "raw_doorway_plan",
+                    "doors",
+                    "room_pairs",
+                    "open_room_pairs",
+                    "walls",
+                    "open_walls",
+                ],
+            ),
+            Stage(
+                "windows",
+                windows,
+                ["query", "rooms", "walls", "doors", "wall_height"],
+                ["raw_window_plan", "walls", "windows"],
+            ),
+            Stage(
+                "select_objects",
+                select_objects,
+                ["query", "rooms", "doors", "windows", "open_walls", "wall_height"],
+                ["object_selection_plan", "selected_objects"],
+            ),
+            Stage(
+                "floor_objects",
+                floor_objects,
+                ["rooms", "doors", "windows", "open_walls", "selected_objects"],
+                ["floor_objects"],
+            ),
+            Stage(
+                "wall_objects",
+                wall_objects,
+                [
+                    "rooms",
+                    "doors",
+                    "windows",
+                    "open_walls",
+                    "wall_height",
+                    "selected_objects",
+                    "floor_objects",
+                ],
+                ["wall_objects"],
+            ),
+            Stage(
+                "small_objects",
+                small_objects,
+                [
+                    "rooms",
+                    "walls",
+                    "doors",
+                    "windows",
+                    "wall_height",
+                    "object_selection_plan",
+                    "floor_objects",
+                    "wall_objects",
+                ],
+                ["objects", "small_objects", "receptacle2small_objects"],
+            ),
+        ]
+
+        # the ceiling plan only needs the rooms, it runs alongside the other stages
+        if add_ceiling:
+            stages += [
+                Stage(
+                    "ceiling_objects",
+                    ceiling_objects,
+                    ["query", "rooms", "wall_height"],
+                    ["raw_ceiling_plan", "ceiling_objects"],
+                ),
+                Stage(
+                    "add_ceiling_objects",
+                    add_ceiling_objects,
+                    ["objects", "ceiling_objects"],
+                    ["objects"],
+                ),
+            ]
+
+        return stages
+
+    def finish_scene(
+        self, scene, query, save_dir, generate_image, generate_video, add_time
+    ):
         # generate lights
         lights = generate_lights(scene)
         scene["proceduralParameters"]["lights"] = lights
@@ -371,6 +676,11 @@ class Holodeck:
             os.path.join(save_dir, f"{query_name}.json"),
             json_kwargs=dict(indent=4),
         )
+        print(f"Query embedding cache: {self.embedding_cache.stats()}")
+        if self.layout_cache is not None:
+            print(f"Layout cache: {self.layout_cache.stats()}")
+        if self.llm_cache is not None:
+            print(f"LLM response cache: {self.llm_cache.stats()}")
 
         # save top down image
         if generate_image:
@@ -501,6 +811,11 @@ class Holodeck:
             f"{save_dir}/{folder_name}/{query_name}.json",
             json_kwargs=dict(indent=4),
         )
+        print(f"Query embedding cache: {self.embedding_cache.stats()}")
+        if self.layout_cache is not None:
+            print(f"Layout cache: {self.layout_cache.stats()}")
+        if self.llm_cache is not None:
+            print(f"LLM response cache: {self.llm_cache.stats()}")
 
         # save top down image
         if generate_image:
@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+
+def to_json(obj):
+    # numpy scalars and arrays, shapely geometries and other sequences as plain json
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if hasattr(obj, "exterior"):
+        return [list(obj.exterior.coords)] + [
+            list(ring.coords) for ring in obj.interiors
+        ]
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj)
+    raise TypeError(f"Can't hash {type(obj).__name__} for the layout cache")
+
+
+class LayoutCache:
+    # content addressed cache of solved room layouts on local disk. The key is a hash
+    # of everything the solver sees (room polygon, door / window boxes, object sizes,
+    # constraints, seed and solver settings), the value the placement list. One json
+    # file per layout, the least recently used files are evicted above max_bytes
+    def __init__(self, cache_dir, max_bytes=256 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def get_key(kind, *inputs):
+        # canonical json, dict keys sorted and tuples as lists, so equal inputs hash equal
+        text = json.dumps(
+            [kind] + list(inputs),
+            sort_keys=True,
+            separators=(",", ":"),
+            default=to_json,
+        )
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key):
+        path = self.get_path(key)
+        try:
+            with open(path, "r") as f:
+                placements = json.load(f)
+            os.utime(path)  # mark as recently used
+        except (OSError, json.JSONDecodeError):
+            with self.lock:
+                self.misses += 1
+            return None
+
+        with self.lock:
+            self.hits += 1
+        return placements
+
+    def put(self, key, placements):
+        path = self.get_path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, "w") as f:
+                json.dump(placements, f, default=to_json)
+            os.replace(temp_path, path)
+        except (OSError, TypeError) as e:
+            print(f"Failed to cache the layout: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+
+        self.evict()
+
+    def evict(self):
+        with self.lock:
+            entries = []
+            for entry in os.scandir(self.cache_dir):
+                if entry.name.endswith(".json"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+            total_bytes = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total_bytes <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total_bytes -= size
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total > 0 else 0.0,
+            }
+
+    def __getstate__(self):
+        # locks can't be pickled (e.g. by multiprocessing)
+        state = self.__dict__.copy()
+        state["lock"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
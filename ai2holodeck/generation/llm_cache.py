@@ -0,0 +1,182 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from langchain_core.messages import AIMessage
+
+
+class LLMReplayMiss(Exception):
+    # a prompt that isn't in the cache while replaying
+    def __init__(self, prompt):
+        super().__init__(f"No cached response in replay mode for: {prompt[:200]}")
+        self.prompt = prompt
+
+
+class LLMResponseCache:
+    # prompt -> response cache in a sqlite file, keyed on (model name, temperature,
+    # prompt hash). Entries older than ttl seconds are ignored (0 keeps them forever)
+    # and the least recently used ones are evicted above max_entries
+    def __init__(self, cache_path, ttl=30 * 24 * 3600, max_entries=100000):
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+        self.connection = None
+        self.connect()
+
+    def connect(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+        self.connection = sqlite3.connect(
+            self.cache_path, timeout=30, check_same_thread=False
+        )
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, model TEXT, "
+            "temperature REAL, prompt TEXT, response TEXT, created REAL, last_used REAL)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)"
+        )
+        self.connection.commit()
+
+    @staticmethod
+    def get_key(model_name, temperature, prompt):
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        return json.dumps([model_name, temperature, prompt_hash])
+
+    def get(self, key, expire=True):
+        # with expire=False (replay) entries older than the ttl are still returned
+        now = time.time()
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT response, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and expire and self.ttl > 0 and now - row[1] > self.ttl:
+                self.connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.connection.commit()
+                row = None
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.connection.execute(
+                "UPDATE responses SET last_used = ? WHERE key = ?", (now, key)
+            )
+            self.connection.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, model_name, temperature, prompt, response):
+        now = time.time()
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, model, temperature, prompt, response, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model_name, temperature, prompt, response, now, now),
+            )
+            self.evict()
+            self.connection.commit()
+
+    def evict(self):
+        if self.ttl > 0:
+            self.connection.execute(
+                "DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,)
+            )
+        (count,) = self.connection.execute("SELECT COUNT(*) FROM responses").fetchone()
+        if count > self.max_entries:
+            self.connection.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY last_used LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total > 0 else 0.0,
+        }
+
+    def __getstate__(self):
+        # locks and sqlite connections can't be pickled (e.g. by multiprocessing)
+        state = self.__dict__.copy()
+        state["lock"] = None
+        state["connection"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+        self.connect()
+
+
+class CachedLLM:
+    # wraps a chat model with the same invoke / ainvoke interface, responses are
+    # served from the cache when possible. With replay=True nothing is sent to the
+    # model, nothing in the cache expires and a prompt that isn't cached raises
+    # LLMReplayMiss.
+    # A generator that retries a prompt because it can't use the response passes
+    # refresh=True, the prompt is then sent to the model (outside of replay) and the
+    # new response replaces the cached one
+    def __init__(self, llm, cache, replay=False):
+        self.llm = llm
+        self.cache = cache
+        self.replay = replay
+
+    def __getattr__(self, name):
+        # everything else (model_name, ...) comes from the wrapped model
+        if name == "llm":
+            raise AttributeError(name)
+        return getattr(self.llm, name)
+
+    def get_model_name(self):
+        return getattr(self.llm, "model_name", None) or getattr(self.llm, "model", "")
+
+    def get_temperature(self):
+        return getattr(self.llm, "temperature", None)
+
+    @staticmethod
+    def get_prompt(messages):
+        if isinstance(messages, str):
+            return messages
+        return "\n\n".join(f"{message.type}: {message.content}" for message in messages)
+
+    def lookup(self, messages, refresh=False):
+        prompt = self.get_prompt(messages)
+        key = self.cache.get_key(self.get_model_name(), self.get_temperature(), prompt)
+        if refresh and not self.replay:
+            return prompt, key, None
+
+        response = self.cache.get(key, expire=not self.replay)
+        if response is None and self.replay:
+            raise LLMReplayMiss(prompt)
+        return prompt, key, response
+
+    def store(self, prompt, key, response):
+        self.cache.put(
+            key, self.get_model_name(), self.get_temperature(), prompt, response
+        )
+
+    def invoke(self, messages, refresh=False, **kwargs):
+        prompt, key, response = self.lookup(messages, refresh)
+        if response is None:
+            response = self.llm.invoke(messages, **kwargs).content
+            self.store(prompt, key, response)
+        return AIMessage(content=response)
+
+    async def ainvoke(self, messages, refresh=False, **kwargs):
+        prompt, key, response = self.lookup(messages, refresh)
+        if response is None:
+            response = (await self.llm.ainvoke(messages, **kwargs)).content
+            self.store(prompt, key, response)
+        return AIMessage(content=response)
@@ -1,23 +1,154 @@
 import cvxpy as cp
 
+from ai2holodeck.constants import HOLODECK_MILP_SOLVER
 
 M = 1e6  # A large number, should be chosen carefully depending on the context
 EPSILON = 1e-2
 
+# MILP solvers in order of preference, the first one that is installed and works is used
+MILP_SOLVERS = ["GUROBI", "HIGHS", "SCIP", "CBC", "GLPK_MI", "SCIPY"]
+working_solver = None
+failed_solvers = set()
+
+
+def get_milp_solvers(preferred=HOLODECK_MILP_SOLVER):
+    if working_solver is not None:
+        return [working_solver]
+    solvers = [preferred] if preferred else []
+    solvers += [solver for solver in MILP_SOLVERS if solver not in solvers]
+    installed_solvers = cp.installed_solvers()
+    return [
+        solver
+        for solver in solvers
+        if solver in installed_solvers and solver not in failed_solvers
+    ]
 
-def create_boundary_constraints(c, object_dim, bbox):
-    room_min_x, room_min_y, room_max_x, room_max_y = bbox
-    x_size, y_size = object_dim
-    # Decision variables for object centers
-    cx, cy, rotate_90 = c[0], c[1], c[3]
 
-    # Half-sizes considering rotation
+def solve_milp(problem, preferred=HOLODECK_MILP_SOLVER, verbose=False):
+    # e.g. GUROBI is installed with the requirements but needs a license to solve
+    global working_solver
+    for solver in get_milp_solvers(preferred):
+        solver_options = {"reoptimize": True} if solver == "GUROBI" else {}
+        try:
+            if verbose:
+                print(f"solving milp using {solver} ...")
+            problem.solve(
+                solver=solver, warm_start=True, verbose=False, **solver_options
+            )
+        except cp.error.SolverError as e:
+            if working_solver is not None:
+                raise
+            print(f"MILP solver {solver} is not usable: {e}")
+            failed_solvers.add(solver)
+            continue
+        working_solver = solver
+        return problem.value
+
+    print("No usable MILP solver found, install one of: " + ", ".join(MILP_SOLVERS))
+    return None
+
+
+def get_big_m(room_dim, object_dims):
+    # the big-M of the disjunctive constraints only has to exceed the largest
+    # difference of two coordinates (plus object sizes) in this room, a tight value
+    # gives much stronger LP relaxations than a global 1e6
+    room_min_x, room_min_y, room_max_x, room_max_y = room_dim
+    room_span = max(room_max_x - room_min_x, room_max_y - room_min_y)
+    max_object_size = max([max(object_dim) for object_dim in object_dims] + [0])
+    return 2 * (room_span + max_object_size) + 1
+
+
+def get_identical_object_pairs(objects_list, constraints):
+    # objects of the same type with the same size and constraints that no other
+    # object refers to are interchangeable (e.g. several copies of the same chair)
+    targets = set(
+        constraint["target"]
+        for object_constraints in constraints.values()
+        for constraint in object_constraints
+        if "target" in constraint
+    )
+    pairs = []
+    for i, (object_name_1, object_dim_1) in enumerate(objects_list):
+        for object_name_2, object_dim_2 in objects_list[i + 1 :]:
+            if (
+                object_name_1.rsplit("-", 1)[0] == object_name_2.rsplit("-", 1)[0]
+                and object_dim_1 == object_dim_2
+                and constraints[object_name_1] == constraints[object_name_2]
+                and object_name_1 not in targets
+                and object_name_2 not in targets
+            ):
+                pairs.append((object_name_1, object_name_2))
+                break  # chain the copies, 0 <= 1 <= 2 ...
+    return pairs
+
+
+def create_symmetry_breaking_constraints(c1, c2):
+    # order interchangeable objects along x so the solver explores only one of
+    # the equivalent permutations
+    return [c1[0] <= c2[0]]
+
+
+def parse_object_properties(object_properties):
+    x, y = object_properties[0]
+    rotation = int(object_properties[1] or 0)
+    # set rotation to the closest 90 degree
+    rotation = int(round(rotation / 90) * 90)
+    assert rotation in [0, 90, 180, 270]
+    object_bbox = object_properties[2]
+    min_x = min([point[0] for point in object_bbox])
+    max_x = max([point[0] for point in object_bbox])
+    min_y = min([point[1] for point in object_bbox])
+    max_y = max([point[1] for point in object_bbox])
+    object_dim = (
+        (max_x - min_x, max_y - min_y)
+        if rotation == 0 or rotation == 180
+        else (max_y - min_y, max_x - min_x)
+    )
+    return x, y, rotation, object_dim
+
+
+def get_half_sizes(c, object_dim):
+    # half width and height of an object considering its rotation. Placed objects
+    # carry them (as parameters) after x, y, rotate_180 and rotate_90, a product of
+    # their size and rotation parameters would not be DPP
+    if len(c) > 4:
+        return c[4], c[5]
+    x_size, y_size = object_dim
+    rotate_90 = c[3]
     half_width = cp.multiply(0.5 * x_size, 1 - rotate_90) + cp.multiply(
         0.5 * y_size, rotate_90
     )
     half_height = cp.multiply(0.5 * y_size, 1 - rotate_90) + cp.multiply(
         0.5 * x_size, rotate_90
     )
+    return half_width, half_height
+
+
+def get_placed_values(object_properties):
+    # parameter values of a placed object: x, y, then rotate_180, rotate_90 and the
+    # half sizes for its rotation and again for the rotation snapped to 90 degrees
+    x, y = object_properties[0]
+    rotation = int(round(object_properties[1] or 0))
+    _, _, snapped_rotation, object_dim = parse_object_properties(object_properties)
+    values = [x, y]
+    for current_rotation in [rotation, snapped_rotation]:
+        rotate_90 = current_rotation == 90 or current_rotation == 270
+        values += [
+            current_rotation == 180,
+            rotate_90,
+            0.5 * object_dim[1] if rotate_90 else 0.5 * object_dim[0],
+            0.5 * object_dim[0] if rotate_90 else 0.5 * object_dim[1],
+        ]
+    return [float(value) for value in values]
+
+
+def create_boundary_constraints(c, object_dim, bbox):
+    room_min_x, room_min_y, room_max_x, room_max_y = bbox
+    # Decision variables for object centers
+    cx, cy = c[0], c[1]
+
+    # Half-sizes considering rotation
+    half_width, half_height = get_half_sizes(c, object_dim)
 
     # Constraints
     constraints = [
@@ -30,9 +161,7 @@ def create_boundary_constraints(c, object_dim, bbox):
     return constraints
 
 
-def create_directional_constraints(c1, c2, object_dim_1, object_dim_2):
-    x_size1, y_size1 = object_dim_1
-    x_size2, y_size2 = object_dim_2
+def create_directional_constraints(c1, c2, object_dim_1, object_dim_2, M=M):
     # Decision variables for object centers
     cx1 = c1[0]
     cy1 = c1[1]
@@ -41,23 +170,10 @@ def create_directional_constraints(c1, c2, object_dim_1, object_dim_2):
 
     cx2 = c2[0]
     cy2 = c2[1]
-    rotate_180_2 = c2[2]
-    rotate_90_2 = c2[3]
 
     # Half-sizes considering rotation
-    half_width1 = cp.multiply(0.5 * x_size1, 1 - rotate_90_1) + cp.multiply(
-        0.5 * y_size1, rotate_90_1
-    )
-    half_height1 = cp.multiply(0.5 * y_size1, 1 - rotate_90_1) + cp.multiply(
-        0.5 * x_size1, rotate_90_1
-    )
-
-    half_width2 = cp.multiply(0.5 * x_size2, 1 - rotate_90_2) + cp.multiply(
-        0.5 * y_size2, rotate_90_2
-    )
-    half_height2 = cp.multiply(0.5 * y_size2, 1 - rotate_90_2) + cp.multiply(
-        0.5 * x_size2, rotate_90_2
-    )
+    half_width1, half_height1 = get_half_sizes(c1, object_dim_1)
+    half_width2, half_height2 = get_half_sizes(c2, object_dim_2)
 
     # Binary variables to determine the relative positions
     left_of = cp.Variable(boolean=True)
@@ -91,34 +207,17 @@ def create_directional_constraints(c1, c2, object_dim_1, object_dim_2):
     return constraints
 
 
-def create_nooverlap_constraints(c1, c2, object_dim_1, object_dim_2):
-    x_size1, y_size1 = object_dim_1
-    x_size2, y_size2 = object_dim_2
+def create_nooverlap_constraints(c1, c2, object_dim_1, object_dim_2, M=M):
     # Decision variables for object centers
     cx1 = c1[0]
     cy1 = c1[1]
-    # rotate_180_1 = c1[2]
-    rotate_90_1 = c1[3]
 
     cx2 = c2[0]
     cy2 = c2[1]
-    # rotate_180_2 = c2[2]
-    rotate_90_2 = c2[3]
 
     # Half-sizes considering rotation
-    half_width1 = cp.multiply(0.5 * x_size1, 1 - rotate_90_1) + cp.multiply(
-        0.5 * y_size1, rotate_90_1
-    )
-    half_height1 = cp.multiply(0.5 * y_size1, 1 - rotate_90_1) + cp.multiply(
-        0.5 * x_size1, rotate_90_1
-    )
-
-    half_width2 = cp.multiply(0.5 * x_size2, 1 - rotate_90_2) + cp.multiply(
-        0.5 * y_size2, rotate_90_2
-    )
-    half_height2 = cp.multiply(0.5 * y_size2, 1 - rotate_90_2) + cp.multiply(
-        0.5 * x_size2, rotate_90_2
-    )
+    half_width1, half_height1 = get_half_sizes(c1, object_dim_1)
+    half_width2, half_height2 = get_half_sizes(c2, object_dim_2)
 
     # Binary variables to determine the relative positions
     left_of = cp.Variable(boolean=True)
@@ -143,7 +242,7 @@ def create_nooverlap_constraints(c1, c2, object_dim_1, object_dim_2):
     return constraints
 
 
-def create_alignment_constraints(c1, c2, object_dim_1, object_dim_2):
+def create_alignment_constraints(c1, c2, object_dim_1, object_dim_2, M=M):
     x_size1, y_size1 = object_dim_1
     x_size2, y_size2 = object_dim_2
     # Decision variables for object centers
@@ -175,21 +274,17 @@ def create_alignment_constraints(c1, c2, object_dim_1, object_dim_2):
     return constraints
 
 
-def create_edge_constraints(var, object_dim, room_dim, hard=True, use_longer_edge=True):
+def create_edge_constraints(
+    var, object_dim, room_dim, hard=True, use_longer_edge=True, M=M
+):
     x = var[0]
     y = var[1]
     rotate_180 = var[2]
     rotate_90 = var[3]
-    x_size, y_size = object_dim
     room_min_x, room_min_y, room_max_x, room_max_y = room_dim
 
     # Half-sizes considering rotation
-    half_width1 = cp.multiply(0.5 * x_size, 1 - rotate_90) + cp.multiply(
-        0.5 * y_size, rotate_90
-    )
-    half_height1 = cp.multiply(0.5 * y_size, 1 - rotate_90) + cp.multiply(
-        0.5 * x_size, rotate_90
-    )
+    half_width1, half_height1 = get_half_sizes(var, object_dim)
 
     a = room_min_x + half_width1
     b = room_max_x - half_width1
@@ -274,7 +369,7 @@ def create_edge_constraints(var, object_dim, room_dim, hard=True, use_longer_edg
         return hard_constraints, [bx_a + bx_b + by_c + by_d]
 
 
-def create_abs_constraints(X, Y, a, constraint_type="geq"):
+def create_abs_constraints(X, Y, a, constraint_type="geq", M=M):
     """
     Create a constraint for |X - Y| <= a or |X - Y| >= a.
 
@@ -306,7 +401,7 @@ def create_abs_constraints(X, Y, a, constraint_type="geq"):
     return constraints
 
 
-def create_distance_constraints(c1, c2, upper_bound, type="near"):
+def create_distance_constraints(c1, c2, upper_bound, type="near", M=M):
     X1, Y1 = c1[0], c1[1]
     X2, Y2 = c2[0], c2[1]
     if type == "near":
@@ -345,6 +440,9 @@ def create_distance_constraints(c1, c2, upper_bound, type="near"):
             Y2 - Y1 >= y_lower_bound - M * Y1_larger,
             x_lower_bound >= 0,
             y_lower_bound >= 0,
+            # the distance can't exceed the room size, keeps the relaxation bounded
+            x_lower_bound <= upper_bound[0],
+            y_lower_bound <= upper_bound[1],
         ]
         soft_constraints = [x_lower_bound + y_lower_bound]
     else:
@@ -362,10 +460,9 @@ def create_if_and_constraints(A, B):
     return constraints, z
 
 
-def create_relative_constraints(c1, c2, object_dim_1, object_dim_2, constraint_type):
-    x_size1, y_size1 = object_dim_1
-    x_size2, y_size2 = object_dim_2
-
+def create_relative_constraints(
+    c1, c2, object_dim_1, object_dim_2, constraint_type, M=M
+):
     # Decision variables for object centers
     cx1 = c1[0]
     cy1 = c1[1]
@@ -382,12 +479,7 @@ def create_relative_constraints(c1, c2, object_dim_1, object_dim_2, constraint_t
     # half_xwidth1 = cp.multiply(0.5 * x_size1, 1 - rotate_90_1) + cp.multiply(0.5 * y_size1, rotate_90_1)
     # half_yheight1 = cp.multiply(0.5 * y_size1, 1 - rotate_90_1) + cp.multiply(0.5 * x_size1, rotate_90_1)
 
-    half_xwidth2 = cp.multiply(0.5 * x_size2, 1 - rotate_90_2) + cp.multiply(
-        0.5 * y_size2, rotate_90_2
-    )
-    half_yheight2 = cp.multiply(0.5 * y_size2, 1 - rotate_90_2) + cp.multiply(
-        0.5 * x_size2, rotate_90_2
-    )
+    half_xwidth2, half_yheight2 = get_half_sizes(c2, object_dim_2)
 
     hard_constraints = []
     soft_constraints = []
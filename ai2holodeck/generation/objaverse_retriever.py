@@ -1,18 +1,27 @@
 import os
 
-import compress_json
-import compress_pickle
 import numpy as np
 import torch
 import torch.nn.functional as F
 
 from ai2holodeck.constants import (
-    OBJATHOR_ANNOTATIONS_PATH,
-    HOLODECK_THOR_ANNOTATIONS_PATH,
-    OBJATHOR_FEATURES_DIR,
-    HOLODECK_THOR_FEATURES_DIR,
+    HOLODECK_FEATURE_STORE_DIR,
+    HOLODECK_RETRIEVAL_INDEX,
+    HOLODECK_RETRIEVAL_NPROBE,
+)
+from ai2holodeck.generation.asset_table import AssetTable
+from ai2holodeck.generation.feature_store import (
+    compile_feature_store,
+    get_store_fingerprint,
+    is_feature_store_fresh,
+    load_feature_store,
+    load_source_features,
+)
+from ai2holodeck.generation.retrieval_index import (
+    IVF_INDEX_FILE,
+    ExactIndex,
+    IVFIndex,
 )
-from ai2holodeck.generation.utils import get_bbox_dims
 
 
 class ObjathorRetriever:
@@ -23,64 +32,71 @@ class ObjathorRetriever:
         clip_tokenizer,
         sbert_model,
         retrieval_threshold,
+        embedding_cache=None,
+        clip_model_name="clip",
+        sbert_model_name="sbert",
     ):
-        objathor_annotations = compress_json.load(OBJATHOR_ANNOTATIONS_PATH)
-        thor_annotations = compress_json.load(HOLODECK_THOR_ANNOTATIONS_PATH)
-        self.database = {**objathor_annotations, **thor_annotations}
-
-        objathor_clip_features_dict = compress_pickle.load(
-            os.path.join(OBJATHOR_FEATURES_DIR, f"clip_features.pkl")
-        )  # clip features
-        objathor_sbert_features_dict = compress_pickle.load(
-            os.path.join(OBJATHOR_FEATURES_DIR, f"sbert_features.pkl")
-        )  # sbert features
-        assert (
-            objathor_clip_features_dict["uids"] == objathor_sbert_features_dict["uids"]
-        )
-
-        objathor_uids = objathor_clip_features_dict["uids"]
-        objathor_clip_features = objathor_clip_features_dict["img_features"].astype(
-            np.float32
-        )
-        objathor_sbert_features = objathor_sbert_features_dict["text_features"].astype(
-            np.float32
-        )
-
-        thor_clip_features_dict = compress_pickle.load(
-            os.path.join(HOLODECK_THOR_FEATURES_DIR, "clip_features.pkl")
-        )  # clip features
-        thor_sbert_features_dict = compress_pickle.load(
-            os.path.join(HOLODECK_THOR_FEATURES_DIR, "sbert_features.pkl")
-        )  # clip features
-        assert thor_clip_features_dict["uids"] == thor_sbert_features_dict["uids"]
-
-        thor_uids = thor_clip_features_dict["uids"]
-        thor_clip_features = thor_clip_features_dict["img_features"].astype(np.float32)
-        thor_sbert_features = thor_sbert_features_dict["text_features"].astype(
-            np.float32
-        )
-
-        self.clip_features = torch.from_numpy(
-            np.concatenate([objathor_clip_features, thor_clip_features], axis=0)
-        )
-        self.clip_features = F.normalize(self.clip_features, p=2, dim=-1)
-
-        self.sbert_features = torch.from_numpy(
-            np.concatenate([objathor_sbert_features, thor_sbert_features], axis=0)
-        )
+        if is_feature_store_fresh():
+            features = load_feature_store()
+        else:
+            print(
+                f"Feature store at {HOLODECK_FEATURE_STORE_DIR} is missing or outdated, loading the original features."
+            )
+            features = load_source_features()
+            try:
+                compile_feature_store(features=features)
+                features = load_feature_store()
+            except Exception as e:
+                print(f"Could not compile the feature store: {e}")
+                features["clip_features"] = torch.from_numpy(features["clip_features"])
+                features["sbert_features"] = torch.from_numpy(
+                    features["sbert_features"]
+                )
 
-        self.asset_ids = objathor_uids + thor_uids
+        self.database = features["database"]
+        self.clip_features = features["clip_features"]  # already L2-normalized
+        self.sbert_features = features["sbert_features"]
+        self.asset_ids = features["uids"]
+        # compiled into the store, built from the annotations without one
+        self.asset_table = features.get("asset_table")
+        if self.asset_table is None:
+            self.asset_table = AssetTable(self.database, self.asset_ids)
 
         self.clip_model = clip_model
         self.clip_preprocess = clip_preprocess
         self.clip_tokenizer = clip_tokenizer
         self.sbert_model = sbert_model
 
+        # optional cache of query embeddings, keyed on the model names
+        self.embedding_cache = embedding_cache
+        self.clip_model_name = clip_model_name
+        self.sbert_model_name = sbert_model_name
+
         self.retrieval_threshold = retrieval_threshold
 
         self.use_text = True
+        self.chunk_size = 4096  # number of assets scored at once, bounds peak memory
 
-    def retrieve(self, queries, threshold=28):
+        # exact search over all assets, or an approximate ivf index built offline
+        # for exactly these features
+        self.index = ExactIndex()
+        if HOLODECK_RETRIEVAL_INDEX == "ivf":
+            index_path = os.path.join(HOLODECK_FEATURE_STORE_DIR, IVF_INDEX_FILE)
+            try:
+                self.index = IVFIndex.load(
+                    index_path,
+                    nprobe=HOLODECK_RETRIEVAL_NPROBE,
+                    num_assets=len(self.asset_ids),
+                    fingerprint=get_store_fingerprint(
+                        self.asset_ids, self.clip_features, self.sbert_features
+                    ),
+                )
+            except Exception as e:
+                print(
+                    f"Could not load the ivf index from {index_path}, using exact search: {e}"
+                )
+
+    def encode_clip(self, queries):
         with torch.no_grad():
             query_feature_clip = self.clip_model.encode_text(
                 self.clip_tokenizer(queries)
@@ -88,49 +104,178 @@ class ObjathorRetriever:
 
             query_feature_clip = F.normalize(query_feature_clip, p=2, dim=-1)
 
-        clip_similarities = 100 * torch.einsum(
-            "ij, lkj -> ilk", query_feature_clip, self.clip_features
-        )
-        clip_similarities = torch.max(clip_similarities, dim=-1).values
+        return query_feature_clip
 
-        query_feature_sbert = self.sbert_model.encode(
+    def encode_sbert(self, queries):
+        return self.sbert_model.encode(
             queries, convert_to_tensor=True, show_progress_bar=False
         )
-        sbert_similarities = query_feature_sbert @ self.sbert_features.T
 
-        if self.use_text:
-            similarities = clip_similarities + sbert_similarities
-        else:
-            similarities = clip_similarities
+    def encode_queries(self, queries):
+        if self.embedding_cache is None:
+            return self.encode_clip(queries), self.encode_sbert(queries)
 
-        threshold_indices = torch.where(clip_similarities > threshold)
+        query_feature_clip = self.embedding_cache.encode(
+            self.clip_model_name, queries, self.encode_clip
+        )
+        query_feature_sbert = self.embedding_cache.encode(
+            self.sbert_model_name, queries, self.encode_sbert
+        )
+        return query_feature_clip, query_feature_sbert
 
+    def iter_similarities(self, query_feature_clip, query_feature_sbert, rows=None):
+        # stream the feature bank in blocks of assets, so the query x asset x view
+        # tensor is never materialized for the whole database
+        num_rows = len(self.asset_ids) if rows is None else len(rows)
+        for start in range(0, num_rows, self.chunk_size):
+            end = min(start + self.chunk_size, num_rows)
+            if rows is None:
+                asset_indices = torch.arange(start, end)
+                clip_features = self.clip_features[start:end]
+                sbert_features = self.sbert_features[start:end]
+            else:
+                asset_indices = rows[start:end]
+                clip_features = self.clip_features[asset_indices]
+                sbert_features = self.sbert_features[asset_indices]
+
+            # one query at a time, a product with several queries rounds differently
+            # and the scores must be the same as a search for the query alone
+            clip_similarities = torch.cat(
+                [
+                    100
+                    * torch.einsum(
+                        "ij, lkj -> ilk",
+                        query_feature_clip[i : i + 1],
+                        clip_features,
+                    )
+                    for i in range(len(query_feature_clip))
+                ]
+            )
+            clip_similarities = torch.max(clip_similarities, dim=-1).values
+
+            sbert_similarities = torch.cat(
+                [
+                    query_feature_sbert[i : i + 1] @ sbert_features.T
+                    for i in range(len(query_feature_sbert))
+                ]
+            )
+
+            if self.use_text:
+                similarities = clip_similarities + sbert_similarities
+            else:
+                similarities = clip_similarities
+
+            yield asset_indices, clip_similarities, similarities
+
+    def retrieve(self, queries, threshold=28):
+        # candidates of all queries in a single list
         unsorted_results = []
-        for query_index, asset_index in zip(*threshold_indices):
-            score = similarities[query_index, asset_index].item()
-            unsorted_results.append((self.asset_ids[asset_index], score))
+        for results in self.retrieve_batch(queries, threshold):
+            unsorted_results += results
 
         # Sorting the results in descending order by score
         results = sorted(unsorted_results, key=lambda x: x[1], reverse=True)
 
         return results
 
-    def compute_size_difference(self, target_size, candidates):
-        candidate_sizes = []
-        for uid, _ in candidates:
-            size = get_bbox_dims(self.database[uid])
-            size_list = [size["x"] * 100, size["y"] * 100, size["z"] * 100]
-            size_list.sort()
-            candidate_sizes.append(size_list)
+    def retrieve_batch(self, queries, thresholds=28, filters=None, top_k=None):
+        # one encoder pass and one streamed similarity scan for all queries,
+        # returns a separate sorted candidate list for each query
+        return [
+            self.asset_table.get_candidates(rows, scores)
+            for rows, scores in self.retrieve_rows(queries, thresholds, filters, top_k)
+        ]
+
+    def retrieve_rows(self, queries, thresholds=28, filters=None, top_k=None):
+        # same as retrieve_batch, but returns (asset rows, scores) arrays per query
+        if len(queries) == 0:
+            return []
 
-        candidate_sizes = torch.tensor(candidate_sizes)
+        if not isinstance(thresholds, (list, tuple)):
+            thresholds = [thresholds] * len(queries)
+        if filters is None:
+            filters = [None] * len(queries)
+        filters = [None if mask is None else torch.as_tensor(mask) for mask in filters]
 
-        target_size_list = list(target_size)
-        target_size_list.sort()
-        target_size = torch.tensor(target_size_list)
+        query_feature_clip, query_feature_sbert = self.encode_queries(queries)
+        thresholds = torch.tensor(thresholds, dtype=torch.float32).unsqueeze(1)
 
-        size_difference = abs(candidate_sizes - target_size).mean(axis=1) / 100
-        size_difference = size_difference.tolist()
+        # the index narrows down the assets to score, None means all of them
+        rows, allowed = None, None
+        candidate_rows = self.index.search(query_feature_clip)
+        if candidate_rows is not None:
+            rows = torch.unique(torch.cat(candidate_rows))
+            allowed = torch.zeros((len(queries), len(self.asset_ids)), dtype=torch.bool)
+            for query_index, query_rows in enumerate(candidate_rows):
+                allowed[query_index, query_rows] = True
+
+        if top_k is not None:
+            best_scores = torch.full((len(queries), top_k), float("-inf"))
+            best_indices = torch.full((len(queries), top_k), -1, dtype=torch.long)
+        else:
+            valid_scores = [[] for _ in queries]
+            valid_indices = [[] for _ in queries]
+
+        for asset_indices, clip_similarities, similarities in self.iter_similarities(
+            query_feature_clip, query_feature_sbert, rows
+        ):
+            valid = clip_similarities.cpu() > thresholds
+            similarities = similarities.cpu()
+            for query_index, mask in enumerate(filters):
+                if mask is not None:
+                    valid[query_index] &= mask[asset_indices]
+            if allowed is not None:
+                valid &= allowed[:, asset_indices]
+
+            if top_k is not None:
+                # running top-k over the blocks seen so far
+                block_scores = torch.where(
+                    valid, similarities, torch.tensor(float("-inf"))
+                )
+                block_indices = asset_indices.expand(len(queries), -1)
+                merged_scores = torch.cat([best_scores, block_scores], dim=1)
+                merged_indices = torch.cat([best_indices, block_indices], dim=1)
+                # stable, so ties keep the earlier blocks first like the full results
+                merged_scores, positions = torch.sort(
+                    merged_scores, dim=1, descending=True, stable=True
+                )
+                best_scores = merged_scores[:, :top_k]
+                best_indices = torch.gather(merged_indices, 1, positions[:, :top_k])
+            else:
+                query_indices, positions = torch.nonzero(valid, as_tuple=True)
+                scores = similarities[query_indices, positions]
+                for query_index in range(len(queries)):
+                    selected = query_indices == query_index
+                    valid_scores[query_index].append(scores[selected])
+                    valid_indices[query_index].append(
+                        asset_indices[positions[selected]]
+                    )
+
+        results = []
+        for query_index in range(len(queries)):
+            if top_k is not None:
+                scores = best_scores[query_index]
+                asset_indices = best_indices[query_index]
+                found = scores > float("-inf")
+                scores, asset_indices = scores[found], asset_indices[found]
+            elif len(valid_scores[query_index]) == 0:
+                # no blocks to score, e.g. the index only probed empty lists
+                scores = torch.zeros(0, dtype=torch.float32)
+                asset_indices = torch.zeros(0, dtype=torch.long)
+            else:
+                scores = torch.cat(valid_scores[query_index])
+                asset_indices = torch.cat(valid_indices[query_index])
+                # stable, so ties keep the database order
+                scores, order = torch.sort(scores, descending=True, stable=True)
+                asset_indices = asset_indices[order]
+
+            results.append((asset_indices.numpy(), scores.numpy().astype(np.float64)))
+
+        return results
+
+    def compute_size_difference(self, target_size, candidates):
+        rows = self.asset_table.get_rows([uid for uid, _ in candidates])
+        size_difference = self.asset_table.size_difference(rows, target_size).tolist()
 
         candidates_with_size_difference = []
         for i, (uid, score) in enumerate(candidates):
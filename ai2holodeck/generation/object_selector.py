@@ -1,4 +1,5 @@
 import ast
+import asyncio
 import copy
 import json
 from concurrent.futures import ThreadPoolExecutor
@@ -7,19 +8,23 @@ import re
 import traceback
 from typing import Dict, List
 
+import numpy as np
 import torch
 import torch.nn.functional as F
 from colorama import Fore
 from langchain_core.prompts import PromptTemplate
 from langchain_openai import OpenAI
 from shapely import Polygon
-from langchain_core.messages import HumanMessage
 
 import ai2holodeck.generation.prompts as prompts
-from ai2holodeck.generation.floor_objects import DFS_Solver_Floor
+from ai2holodeck.generation.async_llm import arun_llm_steps, run_llm_steps
+from ai2holodeck.generation.candidate_pipeline import CandidatePipeline
 from ai2holodeck.generation.objaverse_retriever import ObjathorRetriever
-from ai2holodeck.generation.utils import get_bbox_dims, get_annotations
-from ai2holodeck.generation.wall_objects import DFS_Solver_Wall
+from ai2holodeck.generation.placement_oracle import (
+    FloorPlacementOracle,
+    WallPlacementOracle,
+)
+from ai2holodeck.generation.utils import get_bbox_dims
 
 EXPECTED_OBJECT_ATTRIBUTES = [
     "description",
@@ -36,6 +41,24 @@ class ObjectSelector:
         # object retriever
         self.object_retriever = object_retriever
         self.database = object_retriever.database
+        self.asset_table = object_retriever.asset_table
+        not_door_window = self.asset_table.category_mask(
+            lambda category: all(
+                k not in category.lower() for k in ["door", "window", "frame"]
+            )
+        )  # ignore doors and windows and frames
+        self.floor_asset_mask = (
+            self.asset_table.on_floor  # only select objects on the floor
+            & ~self.asset_table.on_ceiling  # only select objects not on the ceiling
+            & not_door_window
+        )
+        not_door_window_wall = self.asset_table.category_mask(
+            lambda category: "door" not in category.lower()
+            and "window" not in category.lower()
+        )  # ignore doors and windows
+        self.wall_asset_mask = (
+            self.asset_table.on_wall & not_door_window_wall
+        )  # only select objects on the wall
 
         # language model and prompt templates
         self.llm = llm
@@ -62,10 +85,34 @@ class ObjectSelector:
 
         self.random_selection = False
         self.reuse_selection = False
-        self.multiprocessing = False  # Disabled due to pickling issues with new LangChain
+        # plan the rooms on threads, they mostly wait for the language model
+        self.multiprocessing = True
 
     def select_objects(self, scene, additional_requirements="N/A"):
-        rooms_types = [room["roomType"] for room in scene["rooms"]]
+        if "object_selection_plan" in scene:
+            return self.reselect_objects(scene)
+
+        packed_args = self.get_plan_room_args(scene, additional_requirements)
+        if self.multiprocessing:
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                results = list(executor.map(self.plan_room, packed_args))
+        else:
+            results = [self.plan_room(args) for args in packed_args]
+
+        return self.collect_room_plans(scene, results)
+
+    async def select_objects_async(self, scene, additional_requirements="N/A"):
+        # the rooms are planned concurrently, each with its own chain of prompts
+        if "object_selection_plan" in scene:
+            return await asyncio.to_thread(self.reselect_objects, scene)
+
+        packed_args = self.get_plan_room_args(scene, additional_requirements)
+        results = await asyncio.gather(
+            *[self.plan_room_async(args) for args in packed_args]
+        )
+        return self.collect_room_plans(scene, results)
+
+    def get_room_info(self, scene):
         room2area = {
             room["roomType"]: self.get_room_area(room) for room in scene["rooms"]
         }
@@ -90,51 +137,64 @@ class ObjectSelector:
             room_type: [room_perimeter * self.wall_capacity_ratio, 0]
             for room_type, room_perimeter in room2perimeter.items()
         }
-        selected_objects = {
-            room["roomType"]: {"floor": [], "wall": []} for room in scene["rooms"]
-        }
+        return room2size, room2floor_capacity, room2wall_capacity, room2vertices
 
-        if "object_selection_plan" in scene:
-            object_selection_plan = scene["object_selection_plan"]
-            if self.reuse_selection:
-                selected_objects = scene["selected_objects"]
-            else:
-                for room_type in rooms_types:
-                    floor_objects, _, wall_objects, _ = self.get_objects_by_room(
-                        object_selection_plan[room_type],
-                        scene,
-                        room2size[room_type],
-                        room2floor_capacity[room_type],
-                        room2wall_capacity[room_type],
-                        room2vertices[room_type],
-                    )
-                    selected_objects[room_type]["floor"] = floor_objects
-                    selected_objects[room_type]["wall"] = wall_objects
+    def reselect_objects(self, scene):
+        # retrieve the objects of an existing selection plan again
+        object_selection_plan = scene["object_selection_plan"]
+        if self.reuse_selection:
+            selected_objects = scene["selected_objects"]
         else:
-            object_selection_plan = {room["roomType"]: [] for room in scene["rooms"]}
-            packed_args = [
-                (
-                    room_type,
+            room2size, room2floor_capacity, room2wall_capacity, room2vertices = (
+                self.get_room_info(scene)
+            )
+            selected_objects = {
+                room["roomType"]: {"floor": [], "wall": []} for room in scene["rooms"]
+            }
+            for room in scene["rooms"]:
+                room_type = room["roomType"]
+                floor_objects, _, wall_objects, _ = self.get_objects_by_room(
+                    object_selection_plan[room_type],
                     scene,
-                    additional_requirements,
-                    room2size,
-                    room2floor_capacity,
-                    room2wall_capacity,
-                    room2vertices,
+                    room2size[room_type],
+                    room2floor_capacity[room_type],
+                    room2wall_capacity[room_type],
+                    room2vertices[room_type],
                 )
-                for room_type in rooms_types
-            ]
+                selected_objects[room_type]["floor"] = floor_objects
+                selected_objects[room_type]["wall"] = wall_objects
 
-            if self.multiprocessing:
-                with ThreadPoolExecutor(max_workers=4) as executor:
-                    results = list(executor.map(self.plan_room, packed_args))
-            else:
-                results = [self.plan_room(args) for args in packed_args]
+        print(
+            f"\n{Fore.GREEN}AI: Here is the object selection plan:\n{object_selection_plan}{Fore.RESET}"
+        )
+        return object_selection_plan, selected_objects
 
-            for room_type, result in results:
-                selected_objects[room_type]["floor"] = result["floor"]
-                selected_objects[room_type]["wall"] = result["wall"]
-                object_selection_plan[room_type] = result["plan"]
+    def get_plan_room_args(self, scene, additional_requirements):
+        room2size, room2floor_capacity, room2wall_capacity, room2vertices = (
+            self.get_room_info(scene)
+        )
+        return [
+            (
+                room["roomType"],
+                scene,
+                additional_requirements,
+                room2size,
+                room2floor_capacity,
+                room2wall_capacity,
+                room2vertices,
+            )
+            for room in scene["rooms"]
+        ]
+
+    def collect_room_plans(self, scene, results):
+        object_selection_plan = {room["roomType"]: [] for room in scene["rooms"]}
+        selected_objects = {
+            room["roomType"]: {"floor": [], "wall": []} for room in scene["rooms"]
+        }
+        for room_type, result in results:
+            selected_objects[room_type]["floor"] = result["floor"]
+            selected_objects[room_type]["wall"] = result["wall"]
+            object_selection_plan[room_type] = result["plan"]
 
         print(
             f"\n{Fore.GREEN}AI: Here is the object selection plan:\n{object_selection_plan}{Fore.RESET}"
@@ -142,6 +202,12 @@ class ObjectSelector:
         return object_selection_plan, selected_objects
 
     def plan_room(self, args):
+        return run_llm_steps(self.llm, self.plan_room_steps(args))
+
+    async def plan_room_async(self, args):
+        return await arun_llm_steps(self.llm, self.plan_room_steps(args))
+
+    def plan_room_steps(self, args):
         (
             room_type,
             scene,
@@ -164,7 +230,7 @@ class ObjectSelector:
         )
 
         # output_1 = self.llm(prompt_1).lower()
-        output_1 = self.llm.invoke([HumanMessage(content=prompt_1)]).content.lower()
+        output_1 = (yield prompt_1).lower()
         plan_1 = self.extract_json(output_1)
 
         if plan_1 is None:
@@ -202,7 +268,7 @@ class ObjectSelector:
                 object_selection_1=output_1,
                 room=room_type,
             )
-            output_2 = self.llm.invoke([HumanMessage(content=prompt_2)]).content.lower()
+            output_2 = (yield prompt_2).lower()
             plan_2 = self.extract_json(output_2)
 
             if plan_2 is None:
@@ -372,11 +438,32 @@ class ObjectSelector:
             else:
                 wall_object_list.append(object_info)
 
+        # retrieve the top candidates for all objects of the room at once
+        retrieved_candidates = self.object_retriever.retrieve_rows(
+            [self.get_retrieval_query(obj) for obj in floor_object_list]
+            + [self.get_retrieval_query(obj) for obj in wall_object_list],
+            [self.similarity_threshold_floor] * len(floor_object_list)
+            + [self.similarity_threshold_wall] * len(wall_object_list),
+            [self.get_floor_filter(room_size)] * len(floor_object_list)
+            + [self.get_wall_filter(room_size)] * len(wall_object_list),
+            top_k=20,
+        )
+
         floor_objects, floor_capacity = self.get_floor_objects(
-            floor_object_list, floor_capacity, room_size, vertices, scene
+            floor_object_list,
+            floor_capacity,
+            room_size,
+            vertices,
+            scene,
+            retrieved_candidates[: len(floor_object_list)],
         )
         wall_objects, wall_capacity = self.get_wall_objects(
-            wall_object_list, wall_capacity, room_size, vertices, scene
+            wall_object_list,
+            wall_capacity,
+            room_size,
+            vertices,
+            scene,
+            retrieved_candidates[len(floor_object_list) :],
         )
 
         return floor_objects, floor_capacity, wall_objects, wall_capacity
@@ -403,11 +490,52 @@ class ObjectSelector:
         room_polygon = Polygon(room_vertices)
         return room_polygon.length
 
+    def get_floor_filter(self, room_size):
+        # floor objects that are not too big for the room
+        return self.floor_asset_mask & self.asset_table.size_mask(
+            room_size, self.object_size_tolerance
+        )
+
+    def get_wall_filter(self, room_size):
+        # wall objects that are not too big for the room and thin enough
+        return (
+            self.wall_asset_mask
+            & self.asset_table.size_mask(room_size, self.object_size_tolerance)
+            & self.asset_table.thin_mask(self.thin_threshold)
+        )
+
+    def get_retrieval_query(self, object_info):
+        object_type = object_info["object_name"]
+        object_description = object_info["description"]
+        return f"a 3D model of {object_type}, {object_description}"
+
     def get_floor_objects(
-        self, floor_object_list, floor_capacity, room_size, room_vertices, scene
+        self,
+        floor_object_list,
+        floor_capacity,
+        room_size,
+        room_vertices,
+        scene,
+        retrieved_candidates=None,
     ):
         selected_floor_objects_all = []
-        for floor_object in floor_object_list:
+        if retrieved_candidates is None:
+            retrieved_candidates = self.object_retriever.retrieve_rows(
+                [self.get_retrieval_query(obj) for obj in floor_object_list],
+                self.similarity_threshold_floor,
+                [self.get_floor_filter(room_size)] * len(floor_object_list),
+                top_k=20,
+            )
+        used_mask = self.asset_table.used_mask(self.used_assets)
+        # the room does not change while selecting its objects
+        placement_oracle = FloorPlacementOracle(
+            room_vertices,
+            self.get_initial_state_floor(room_vertices, scene, add_window=False),
+        )
+
+        for floor_object, (rows, scores) in zip(
+            floor_object_list, retrieved_candidates
+        ):
             object_type = floor_object["object_name"]
             object_description = floor_object["description"]
             object_size = floor_object["size"]
@@ -419,40 +547,19 @@ class ObjectSelector:
                 )
             variance_type = floor_object.get("variance_type", "same")
 
-            candidates = self.object_retriever.retrieve(
-                [f"a 3D model of {object_type}, {object_description}"],
-                self.similarity_threshold_floor,
-            )
-
-            candidates = [
-                candidate
-                for candidate, annotation in zip(
-                    candidates,
-                    [
-                        get_annotations(self.database[candidate[0]])
-                        for candidate in candidates
-                    ],
-                )
-                if annotation["onFloor"]  # only select objects on the floor
-                and (
-                    not annotation["onCeiling"]
-                )  # only select objects not on the ceiling
-                and all(  # ignore doors and windows and frames
-                    k not in annotation["category"].lower()
-                    for k in ["door", "window", "frame"]
-                )
-            ]
-
-            # check if the object is too big
-            candidates = self.check_object_size(candidates, room_size)
-
             # check if object can be placed on the floor
-            candidates = self.check_floor_placement(
-                candidates[:20], room_vertices, scene
+            rows, scores = (
+                CandidatePipeline(self.asset_table)
+                .apply(
+                    lambda candidates: self.check_floor_placement(
+                        candidates, room_vertices, scene, placement_oracle
+                    )
+                )
+                .run(rows, scores)
             )
 
             # No candidates found
-            if len(candidates) == 0:
+            if len(rows) == 0:
                 print(
                     "No candidates found for {} {}".format(
                         object_type, object_description
@@ -460,24 +567,12 @@ class ObjectSelector:
                 )
                 continue
 
-            # remove used assets
-            top_one_candidate = candidates[0]
-            if len(candidates) > 1:
-                candidates = [
-                    candidate
-                    for candidate in candidates
-                    if candidate[0] not in self.used_assets
-                ]
-            if len(candidates) == 0:
-                candidates = [top_one_candidate]
-
-            # consider object size difference
+            # remove used assets, consider object size difference and only
+            # select top 10 candidates
+            pipeline = CandidatePipeline(self.asset_table).prefer_unused(used_mask)
             if object_size is not None and self.consider_size:
-                candidates = self.object_retriever.compute_size_difference(
-                    object_size, candidates
-                )
-
-            candidates = candidates[:10]  # only select top 10 candidates
+                pipeline.penalize_size(object_size)
+            candidates = pipeline.head(10).run_candidates(rows, scores)
 
             selected_asset_ids = []
             if variance_type == "same":
@@ -549,54 +644,47 @@ class ObjectSelector:
         return selected_floor_objects_ordered, floor_capacity
 
     def get_wall_objects(
-        self, wall_object_list, wall_capacity, room_size, room_vertices, scene
+        self,
+        wall_object_list,
+        wall_capacity,
+        room_size,
+        room_vertices,
+        scene,
+        retrieved_candidates=None,
     ):
         selected_wall_objects_all = []
-        for wall_object in wall_object_list:
+        if retrieved_candidates is None:
+            retrieved_candidates = self.object_retriever.retrieve_rows(
+                [self.get_retrieval_query(obj) for obj in wall_object_list],
+                self.similarity_threshold_wall,
+                [self.get_wall_filter(room_size)] * len(wall_object_list),
+                top_k=20,
+            )
+        used_mask = self.asset_table.used_mask(self.used_assets)
+        # the room does not change while selecting its objects
+        placement_oracle = WallPlacementOracle(
+            room_vertices, self.get_initial_state_wall(room_vertices, scene)
+        )
+
+        for wall_object, (rows, scores) in zip(wall_object_list, retrieved_candidates):
             object_type = wall_object["object_name"]
             object_description = wall_object["description"]
             object_size = wall_object["size"]
             quantity = min(wall_object["quantity"], 10)
             variance_type = wall_object["variance_type"]
 
-            candidates = self.object_retriever.retrieve(
-                [f"a 3D model of {object_type}, {object_description}"],
-                self.similarity_threshold_wall,
-            )
-
-            # check on wall objects
-            candidates = [
-                candidate
-                for candidate in candidates
-                if get_annotations(self.database[candidate[0]])["onWall"] == True
-            ]  # only select objects on the wall
-
-            # ignore doors and windows
-            candidates = [
-                candidate
-                for candidate in candidates
-                if "door"
-                not in get_annotations(self.database[candidate[0]])["category"].lower()
-            ]
-            candidates = [
-                candidate
-                for candidate in candidates
-                if "window"
-                not in get_annotations(self.database[candidate[0]])["category"].lower()
-            ]
-
-            # check if the object is too big
-            candidates = self.check_object_size(candidates, room_size)
-
-            # check thin objects
-            candidates = self.check_thin_object(candidates)
-
             # check if object can be placed on the wall
-            candidates = self.check_wall_placement(
-                candidates[:20], room_vertices, scene
+            rows, scores = (
+                CandidatePipeline(self.asset_table)
+                .apply(
+                    lambda candidates: self.check_wall_placement(
+                        candidates, room_vertices, scene, placement_oracle
+                    )
+                )
+                .run(rows, scores)
             )
 
-            if len(candidates) == 0:
+            if len(rows) == 0:
                 print(
                     "No candidates found for {} {}".format(
                         object_type, object_description
@@ -604,24 +692,12 @@ class ObjectSelector:
                 )
                 continue
 
-            # remove used assets
-            top_one_candidate = candidates[0]
-            if len(candidates) > 1:
-                candidates = [
-                    candidate
-                    for candidate in candidates
-                    if candidate[0] not in self.used_assets
-                ]
-            if len(candidates) == 0:
-                candidates = [top_one_candidate]
-
-            # consider object size difference
+            # remove used assets, consider object size difference and only
+            # select top 10 candidates
+            pipeline = CandidatePipeline(self.asset_table).prefer_unused(used_mask)
             if object_size is not None and self.consider_size:
-                candidates = self.object_retriever.compute_size_difference(
-                    object_size, candidates
-                )
-
-            candidates = candidates[:10]  # only select top 10 candidates
+                pipeline.penalize_size(object_size)
+            candidates = pipeline.head(10).run_candidates(rows, scores)
 
             selected_asset_ids = []
             if variance_type == "same":
@@ -691,35 +767,22 @@ class ObjectSelector:
         return selected_wall_objects_ordered, wall_capacity
 
     def check_object_size(self, candidates, room_size):
-        valid_candidates = []
-        for candidate in candidates:
-            dimension = get_bbox_dims(self.database[candidate[0]])
-            size = [dimension["x"], dimension["y"], dimension["z"]]
-            if size[2] > size[0]:
-                size = [size[2], size[1], size[0]]  # make sure that x > z
+        if len(candidates) == 0:
+            return candidates
 
-            if size[0] > room_size[0] * self.object_size_tolerance:
-                continue
-            if size[1] > room_size[1] * self.object_size_tolerance:
-                continue
-            if size[2] > room_size[2] * self.object_size_tolerance:
-                continue
-            if size[0] * size[2] > room_size[0] * room_size[2] * 0.5:
-                continue  # TODO: consider using the floor area instead of the room area
+        rows = self.asset_table.get_rows([candidate[0] for candidate in candidates])
+        valid = self.asset_table.size_mask(room_size, self.object_size_tolerance)
 
-            valid_candidates.append(candidate)
-
-        return valid_candidates
+        return [candidate for candidate, keep in zip(candidates, valid[rows]) if keep]
 
     def check_thin_object(self, candidates):
-        valid_candidates = []
-        for candidate in candidates:
-            dimension = get_bbox_dims(self.database[candidate[0]])
-            size = [dimension["x"], dimension["y"], dimension["z"]]
-            if size[2] > min(size[0], size[1]) * self.thin_threshold:
-                continue
-            valid_candidates.append(candidate)
-        return valid_candidates
+        if len(candidates) == 0:
+            return candidates
+
+        rows = self.asset_table.get_rows([candidate[0] for candidate in candidates])
+        valid = self.asset_table.thin_mask(self.thin_threshold)
+
+        return [candidate for candidate, keep in zip(candidates, valid[rows]) if keep]
 
     def random_select(self, candidates):
         if self.random_selection:
@@ -781,24 +844,12 @@ class ObjectSelector:
 
         return room2wall_capacity
 
-    def check_floor_placement(self, candidates, room_vertices, scene):
-        room_x = max([vertex[0] for vertex in room_vertices]) - min(
-            [vertex[0] for vertex in room_vertices]
-        )
-        room_z = max([vertex[1] for vertex in room_vertices]) - min(
-            [vertex[1] for vertex in room_vertices]
-        )
-        grid_size = int(max(room_x // 20, room_z // 20))
-
-        solver = DFS_Solver_Floor(grid_size=grid_size)
-
-        room_poly = Polygon(room_vertices)
-        initial_state = self.get_initial_state_floor(
-            room_vertices, scene, add_window=False
-        )
-
-        grid_points = solver.create_grids(room_poly)
-        grid_points = solver.remove_points(grid_points, initial_state)
+    def check_floor_placement(self, candidates, room_vertices, scene, oracle=None):
+        if oracle is None:
+            oracle = FloorPlacementOracle(
+                room_vertices,
+                self.get_initial_state_floor(room_vertices, scene, add_window=False),
+            )
 
         valid_candidates = []
         for candidate in candidates:
@@ -808,11 +859,7 @@ class ObjectSelector:
                 object_size["z"] * 100 + self.size_buffer,
             )
 
-            solutions = solver.get_all_solutions(room_poly, grid_points, object_dim)
-            solutions = solver.filter_collision(initial_state, solutions)
-            solutions = solver.place_edge(room_poly, solutions, object_dim)
-
-            if solutions != []:
+            if oracle.can_place(object_dim):
                 valid_candidates.append(candidate)
             else:
                 print(
@@ -822,20 +869,11 @@ class ObjectSelector:
 
         return valid_candidates
 
-    def check_wall_placement(self, candidates, room_vertices, scene):
-        room_x = max([vertex[0] for vertex in room_vertices]) - min(
-            [vertex[0] for vertex in room_vertices]
-        )
-        room_z = max([vertex[1] for vertex in room_vertices]) - min(
-            [vertex[1] for vertex in room_vertices]
-        )
-        grid_size = int(max(room_x // 20, room_z // 20))
-
-        solver = DFS_Solver_Wall(grid_size=grid_size)
-
-        room_poly = Polygon(room_vertices)
-        initial_state = self.get_initial_state_wall(room_vertices, scene)
-        grid_points = solver.create_grids(room_poly)
+    def check_wall_placement(self, candidates, room_vertices, scene, oracle=None):
+        if oracle is None:
+            oracle = WallPlacementOracle(
+                room_vertices, self.get_initial_state_wall(room_vertices, scene)
+            )
 
         valid_candidates = []
         for candidate in candidates:
@@ -846,12 +884,7 @@ class ObjectSelector:
                 object_size["z"] * 100,
             )
 
-            solutions = solver.get_all_solutions(
-                room_poly, grid_points, object_dim, height=0
-            )
-            solutions = solver.filter_collision(initial_state, solutions)
-
-            if solutions != []:
+            if oracle.can_place(object_dim):
                 valid_candidates.append(candidate)
             else:
                 print(
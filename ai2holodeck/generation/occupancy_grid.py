@@ -0,0 +1,84 @@
+import numpy as np
+import shapely
+from shapely.geometry import Polygon
+
+
+class OccupancyGrid:
+    # incremental occupancy of a room for the floor solver. Objects are rasterized
+    # into cells of grid_size (by their bounding box, so the cells over-cover them)
+    # and the grid points inside each object are counted, placing and removing an
+    # object only touches its own cells and points
+    def __init__(self, room_poly, grid_size, grid_points):
+        min_x, min_z, max_x, max_z = room_poly.bounds
+        self.origin = np.array([min_x, min_z], dtype=np.float64)
+        self.cell_size = grid_size
+        self.shape = (
+            int((max_x - min_x) // grid_size) + 1,
+            int((max_z - min_z) // grid_size) + 1,
+        )
+        self.cells = np.zeros(self.shape, dtype=np.int32)
+        self.summed_area = None
+
+        self.grid_points = list(grid_points)
+        self.point_xy = np.array(self.grid_points, dtype=np.float64).reshape(-1, 2)
+        self.point_counts = np.zeros(len(self.grid_points), dtype=np.int32)
+
+        self.objects = {}
+
+    def get_cell_range(self, min_xy, max_xy):
+        # inclusive cell ranges, rounding is monotonic so touching boxes share a cell
+        cell_min = np.floor((min_xy - self.origin) / self.cell_size).astype(np.int64)
+        cell_max = np.floor((max_xy - self.origin) / self.cell_size).astype(np.int64)
+        upper = np.array(self.shape, dtype=np.int64) - 1
+        return np.clip(cell_min, 0, upper), np.clip(cell_max, 0, upper)
+
+    def place(self, object_name, obj_coords):
+        if object_name in self.objects:
+            self.remove(object_name)
+
+        obj_poly = Polygon(obj_coords)
+        min_x, min_z, max_x, max_z = obj_poly.bounds
+        (x_0, z_0), (x_1, z_1) = self.get_cell_range(
+            np.array([min_x, min_z]), np.array([max_x, max_z])
+        )
+        covered_points = np.flatnonzero(
+            shapely.contains_xy(obj_poly, self.point_xy[:, 0], self.point_xy[:, 1])
+        )
+
+        self.cells[x_0 : x_1 + 1, z_0 : z_1 + 1] += 1
+        self.point_counts[covered_points] += 1
+        self.objects[object_name] = (x_0, z_0, x_1, z_1, covered_points)
+        self.summed_area = None
+
+    def remove(self, object_name):
+        x_0, z_0, x_1, z_1, covered_points = self.objects.pop(object_name)
+        self.cells[x_0 : x_1 + 1, z_0 : z_1 + 1] -= 1
+        self.point_counts[covered_points] -= 1
+        self.summed_area = None
+
+    def get_free_points(self):
+        # same as DFS_Solver_Floor.remove_points with the placed objects
+        return [
+            point
+            for point, count in zip(self.grid_points, self.point_counts.tolist())
+            if count == 0
+        ]
+
+    def may_collide(self, min_xy, max_xy):
+        # False means that the box can't touch any placed object
+        if self.summed_area is None:
+            self.summed_area = np.zeros(
+                (self.shape[0] + 1, self.shape[1] + 1), dtype=np.int32
+            )
+            self.summed_area[1:, 1:] = (self.cells > 0).cumsum(axis=0).cumsum(axis=1)
+
+        cell_min, cell_max = self.get_cell_range(min_xy, max_xy)
+        x_0, z_0 = cell_min[:, 0], cell_min[:, 1]
+        x_1, z_1 = cell_max[:, 0] + 1, cell_max[:, 1] + 1
+        occupied = (
+            self.summed_area[x_1, z_1]
+            - self.summed_area[x_0, z_1]
+            - self.summed_area[x_1, z_0]
+            + self.summed_area[x_0, z_0]
+        )
+        return occupied > 0
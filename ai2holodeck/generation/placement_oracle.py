@@ -0,0 +1,182 @@
+import numpy as np
+import shapely
+from shapely import STRtree
+from shapely.geometry import Polygon
+
+from ai2holodeck.generation.floor_objects import DFS_Solver_Floor
+from ai2holodeck.generation.wall_objects import DFS_Solver_Wall
+
+
+def get_room_grid_size(room_vertices):
+    room_x = max([vertex[0] for vertex in room_vertices]) - min(
+        [vertex[0] for vertex in room_vertices]
+    )
+    room_z = max([vertex[1] for vertex in room_vertices]) - min(
+        [vertex[1] for vertex in room_vertices]
+    )
+    return int(max(room_x // 20, room_z // 20))
+
+
+class FloorPlacementOracle:
+    # answers "can an object of this size be placed against an edge of the room"
+    # with the same grid, collision and edge rules as DFS_Solver_Floor, the room
+    # grid and obstacles are built once and the answers are cached per exact size
+    def __init__(self, room_vertices, initial_state):
+        self.cache = {}  # keyed on the exact size, so answers match the solver
+
+        self.solver = DFS_Solver_Floor(grid_size=get_room_grid_size(room_vertices))
+        self.room_poly = Polygon(room_vertices)
+        self.boundary = self.room_poly.boundary
+        shapely.prepare(self.room_poly)
+        shapely.prepare(self.boundary)
+
+        grid_points = self.solver.create_grids(self.room_poly)
+        grid_points = self.solver.remove_points(grid_points, initial_state)
+        self.grid_points = np.array(grid_points, dtype=np.float64).reshape(-1, 2)
+        self.distance_field = self.solver.get_distance_field(self.room_poly)
+        self.center_distances = self.distance_field.distance(self.grid_points)
+
+        self.obstacles = STRtree(
+            [Polygon(obj_coords) for _, _, obj_coords, _ in initial_state.values()]
+        )
+
+    def can_place(self, object_dim):
+        key = tuple(object_dim)
+        if key not in self.cache:
+            self.cache[key] = self.check(key)
+        return self.cache[key]
+
+    def check(self, object_dim):
+        obj_half_length, obj_half_width = object_dim[0] / 2, object_dim[1] / 2
+        center_x, center_y = self.grid_points[:, 0], self.grid_points[:, 1]
+
+        # rotations 0/180 and 90/270 cover the same box, only the back differs
+        for half_x, half_y, back_adjustments in [
+            (
+                obj_half_length,
+                obj_half_width,
+                [(0, -obj_half_width), (0, obj_half_width)],
+            ),
+            (
+                obj_half_width,
+                obj_half_length,
+                [(-obj_half_width, 0), (obj_half_width, 0)],
+            ),
+        ]:
+            boxes = shapely.box(
+                center_x - half_x,
+                center_y - half_y,
+                center_x + half_x,
+                center_y + half_y,
+            )
+            valid = shapely.contains(self.room_poly, boxes)
+
+            collisions = self.obstacles.query(boxes[valid], predicate="intersects")[0]
+            valid_indices = np.flatnonzero(valid)
+            valid[valid_indices[collisions]] = False
+            if not valid.any():
+                continue
+
+            center_distances = self.center_distances[valid]
+            for back_x, back_y in back_adjustments:
+                back_distances = self.distance_field.distance(
+                    np.stack([center_x[valid] + back_x, center_y[valid] + back_y], 1)
+                )
+                if np.any(
+                    (back_distances <= self.solver.grid_size)
+                    & (back_distances < center_distances)
+                ):
+                    return True
+
+        return False
+
+
+class WallPlacementOracle:
+    # same as FloorPlacementOracle, with the rules of DFS_Solver_Wall
+    def __init__(self, room_vertices, initial_state):
+        self.cache = {}  # keyed on the exact size, so answers match the solver
+
+        self.solver = DFS_Solver_Wall(grid_size=get_room_grid_size(room_vertices))
+        self.room_poly = Polygon(room_vertices)
+        self.boundary = self.room_poly.boundary
+        # zero area boxes on a wall are contained for a prepared room, not for the
+        # original search, those are tested against this unprepared one
+        self.unprepared_poly = Polygon(room_vertices)
+        shapely.prepare(self.room_poly)
+        shapely.prepare(self.boundary)
+
+        grid_points = self.solver.create_grids(self.room_poly)
+        self.grid_points = np.array(grid_points, dtype=np.float64).reshape(-1, 2)
+
+        # (x, y, z) boxes of the doors, windows and open walls
+        self.obstacles = self.solver.get_collision_index(initial_state)
+
+    def can_place(self, object_dim):
+        key = tuple(object_dim)
+        if key not in self.cache:
+            self.cache[key] = self.check(key)
+        return self.cache[key]
+
+    def check(self, object_dim, height=0):
+        obj_length, obj_height, obj_width = object_dim
+        obj_half_length = obj_length / 2
+        center_x, center_y = self.grid_points[:, 0], self.grid_points[:, 1]
+
+        for (min_x, min_y), (max_x, max_y) in [
+            ((-obj_half_length, 0), (obj_half_length, obj_width)),
+            ((0, -obj_half_length), (obj_width, obj_half_length)),
+            ((-obj_half_length, -obj_width), (obj_half_length, 0)),
+            ((-obj_width, -obj_half_length), (0, obj_half_length)),
+        ]:
+            lower_left_x, lower_left_y = center_x + min_x, center_y + min_y
+            upper_right_x, upper_right_y = center_x + max_x, center_y + max_y
+
+            boxes = shapely.box(
+                lower_left_x, lower_left_y, upper_right_x, upper_right_y
+            )
+            valid = shapely.contains(self.room_poly, boxes)
+            degenerate = (lower_left_x == upper_right_x) | (
+                lower_left_y == upper_right_y
+            )
+            if degenerate.any():
+                valid[degenerate] = shapely.contains(
+                    self.unprepared_poly, boxes[degenerate]
+                )
+
+            # at least two distinct corners of the object have to touch the wall
+            corners = [
+                (upper_right_x, lower_left_y),
+                (upper_right_x, upper_right_y),
+                (lower_left_x, upper_right_y),
+                (lower_left_x, lower_left_y),
+            ]
+            corners_on_edge = np.zeros(len(center_x), dtype=np.int64)
+            for i, (corner_x, corner_y) in enumerate(corners):
+                is_new = np.ones(len(center_x), dtype=bool)
+                for other_x, other_y in corners[:i]:
+                    is_new &= (corner_x != other_x) | (corner_y != other_y)
+                corners_on_edge += is_new & shapely.contains(
+                    self.boundary, shapely.points(corner_x, corner_y)
+                )
+            valid &= corners_on_edge >= 2
+
+            if len(self.obstacles) > 0 and valid.any():
+                solution_min = np.stack(
+                    [lower_left_x, np.full_like(lower_left_x, height), lower_left_y],
+                    axis=1,
+                )[valid]
+                solution_max = np.stack(
+                    [
+                        upper_right_x,
+                        np.full_like(upper_right_x, height + obj_height),
+                        upper_right_y,
+                    ],
+                    axis=1,
+                )[valid]
+                collisions = self.obstacles.query(solution_min, solution_max)
+                valid[np.flatnonzero(valid)[collisions]] = False
+
+            if valid.any():
+                return True
+
+        return False
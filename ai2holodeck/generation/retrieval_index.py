@@ -0,0 +1,228 @@
+import os
+import time
+from argparse import ArgumentParser
+
+import torch
+import torch.nn.functional as F
+
+from ai2holodeck.constants import HOLODECK_FEATURE_STORE_DIR
+
+IVF_INDEX_FILE = "clip_ivf_index.pt"
+
+
+class ExactIndex:
+    # brute force over all assets (the default behaviour)
+    def search(self, query_feature_clip):
+        return None
+
+
+class IVFIndex:
+    # inverted file index over the CLIP view features: every rendered view is
+    # assigned to its closest centroid, a query only scores the assets found in
+    # the nprobe lists closest to it
+    def __init__(
+        self,
+        centroids,
+        list_offsets,
+        list_rows,
+        num_assets,
+        fingerprint=None,
+        nprobe=16,
+    ):
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_rows = list_rows
+        self.num_assets = num_assets
+        self.fingerprint = fingerprint  # of the feature store the index was built on
+        self.nprobe = nprobe  # more lists means higher recall but slower search
+
+    @classmethod
+    def build(
+        cls,
+        clip_features,
+        num_lists=None,
+        num_iterations=10,
+        seed=0,
+        chunk_size=8192,
+        fingerprint=None,
+    ):
+        num_assets, num_views, dim = clip_features.shape
+        vectors = clip_features.reshape(-1, dim).float()
+        rows = torch.arange(num_assets).repeat_interleave(num_views)
+
+        if num_lists is None:
+            num_lists = max(1, int(4 * num_assets**0.5))
+        num_lists = min(num_lists, vectors.shape[0])
+
+        # spherical k-means
+        generator = torch.Generator().manual_seed(seed)
+        init = torch.randperm(vectors.shape[0], generator=generator)[:num_lists]
+        centroids = vectors[init].clone()
+        for _ in range(num_iterations):
+            assignments = cls.assign(vectors, centroids, chunk_size)
+            sums = torch.zeros_like(centroids).index_add_(0, assignments, vectors)
+            counts = torch.bincount(assignments, minlength=num_lists)
+            empty = counts == 0
+            sums[empty] = centroids[empty]  # keep empty lists where they are
+            centroids = F.normalize(sums, p=2, dim=-1)
+
+        assignments = cls.assign(vectors, centroids, chunk_size)
+
+        # unique (list, asset) pairs, grouped by list
+        keys = torch.unique(assignments * num_assets + rows)
+        list_ids = keys // num_assets
+        list_rows = keys % num_assets
+        counts = torch.bincount(list_ids, minlength=num_lists)
+        list_offsets = torch.zeros(num_lists + 1, dtype=torch.long)
+        list_offsets[1:] = torch.cumsum(counts, dim=0)
+
+        return cls(centroids, list_offsets, list_rows, num_assets, fingerprint)
+
+    @staticmethod
+    def assign(vectors, centroids, chunk_size=8192):
+        assignments = []
+        for start in range(0, vectors.shape[0], chunk_size):
+            similarities = vectors[start : start + chunk_size] @ centroids.T
+            assignments.append(torch.argmax(similarities, dim=1))
+        return torch.cat(assignments)
+
+    def search(self, query_feature_clip):
+        # candidate asset rows for each query
+        nprobe = min(self.nprobe, self.centroids.shape[0])
+        centroid_similarities = query_feature_clip.float().cpu() @ self.centroids.T
+        probed_lists = torch.topk(centroid_similarities, nprobe, dim=1).indices
+
+        candidate_rows = []
+        for lists in probed_lists.tolist():
+            rows = [
+                self.list_rows[self.list_offsets[i] : self.list_offsets[i + 1]]
+                for i in lists
+            ]
+            candidate_rows.append(torch.unique(torch.cat(rows)))
+        return candidate_rows
+
+    def save(self, path):
+        torch.save(
+            {
+                "centroids": self.centroids,
+                "list_offsets": self.list_offsets,
+                "list_rows": self.list_rows,
+                "num_assets": self.num_assets,
+                "fingerprint": self.fingerprint,
+            },
+            path,
+        )
+
+    @classmethod
+    def load(cls, path, nprobe=16, num_assets=None, fingerprint=None):
+        # the list rows index into the feature store, so an index built on another
+        # version of the store would silently return the wrong assets
+        data = torch.load(path)
+        if num_assets is not None and data["num_assets"] != num_assets:
+            raise ValueError(
+                f"index was built for {data['num_assets']} assets, the store has {num_assets}"
+            )
+        if fingerprint is not None and data.get("fingerprint") != fingerprint:
+            raise ValueError("index was built for a different feature store")
+        return cls(
+            data["centroids"],
+            data["list_offsets"],
+            data["list_rows"],
+            data["num_assets"],
+            data.get("fingerprint"),
+            nprobe=nprobe,
+        )
+
+
+def exact_clip_top_k(query_feature_clip, clip_features, k, chunk_size=4096):
+    best_scores, best_indices = [], []
+    for start in range(0, clip_features.shape[0], chunk_size):
+        similarities = torch.einsum(
+            "ij, lkj -> ilk",
+            query_feature_clip,
+            clip_features[start : start + chunk_size],
+        )
+        best_scores.append(torch.max(similarities, dim=-1).values)
+    similarities = torch.cat(best_scores, dim=1)
+    return torch.topk(similarities, min(k, similarities.shape[1]), dim=1).indices
+
+
+def benchmark(index, clip_features, num_queries=200, k=20, nprobes=(1, 4, 16, 64)):
+    # recall of the ivf top-k against the exact top-k, using perturbed asset views
+    # as queries so no text encoder is needed
+    generator = torch.Generator().manual_seed(0)
+    num_assets, num_views, dim = clip_features.shape
+    rows = torch.randint(0, num_assets, (num_queries,), generator=generator)
+    views = torch.randint(0, num_views, (num_queries,), generator=generator)
+    queries = clip_features[rows, views].float()
+    queries = queries + 0.05 * torch.randn(queries.shape, generator=generator)
+    queries = F.normalize(queries, p=2, dim=-1)
+
+    start_time = time.time()
+    exact = exact_clip_top_k(queries, clip_features, k)
+    exact_time = (time.time() - start_time) / num_queries
+    print(f"exact: {exact_time * 1000:.3f} ms/query")
+
+    for nprobe in nprobes:
+        index.nprobe = nprobe
+        start_time = time.time()
+        recalls = []
+        candidate_rows = index.search(queries)
+        for query_index, rows in enumerate(candidate_rows):
+            approximate = rows[
+                exact_clip_top_k(
+                    queries[query_index : query_index + 1], clip_features[rows], k
+                )[0]
+            ]
+            found = len(set(approximate.tolist()) & set(exact[query_index].tolist()))
+            recalls.append(found / exact.shape[1])
+        search_time = (time.time() - start_time) / num_queries
+        print(
+            f"ivf nprobe={nprobe}: recall@{k}={sum(recalls) / len(recalls):.4f}, {search_time * 1000:.3f} ms/query"
+        )
+
+
+if __name__ == "__main__":
+    from ai2holodeck.generation.feature_store import (
+        get_store_fingerprint,
+        load_feature_store,
+    )
+
+    parser = ArgumentParser()
+    parser.add_argument("mode", choices=["build", "benchmark"])
+    parser.add_argument(
+        "--store_dir",
+        help="Directory of the compiled feature store.",
+        default=HOLODECK_FEATURE_STORE_DIR,
+    )
+    parser.add_argument("--num_lists", type=int, default=None)
+    parser.add_argument("--num_iterations", type=int, default=10)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--num_queries", type=int, default=200)
+    args = parser.parse_args()
+
+    features = load_feature_store(args.store_dir)
+    clip_features = features["clip_features"]
+    fingerprint = get_store_fingerprint(
+        features["uids"], clip_features, features["sbert_features"]
+    )
+    index_path = os.path.join(args.store_dir, IVF_INDEX_FILE)
+
+    if args.mode == "build":
+        index = IVFIndex.build(
+            clip_features,
+            num_lists=args.num_lists,
+            num_iterations=args.num_iterations,
+            fingerprint=fingerprint,
+        )
+        index.save(index_path)
+        print(f"Saved ivf index with {index.centroids.shape[0]} lists to {index_path}.")
+    else:
+        benchmark(
+            IVFIndex.load(
+                index_path, num_assets=len(features["uids"]), fingerprint=fingerprint
+            ),
+            clip_features,
+            num_queries=args.num_queries,
+            k=args.k,
+        )
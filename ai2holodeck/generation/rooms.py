@@ -16,10 +16,10 @@ from langchain_core.prompts import PromptTemplate
 from langchain_openai import OpenAI
 from shapely.geometry import LineString, Point, Polygon
 from tqdm import tqdm
-from langchain_core.messages import HumanMessage
 
 import ai2holodeck.generation.prompts as prompts
 from ai2holodeck.constants import HOLODECK_BASE_DATA_DIR, DEBUGGING
+from ai2holodeck.generation.async_llm import arun_llm_steps, run_llm_steps
 
 
 class FloorPlanGenerator:
@@ -44,13 +44,28 @@ class FloorPlanGenerator:
         self.used_assets = []
 
     def generate_rooms(self, scene, additional_requirements="N/A", visualize=False):
+        return run_llm_steps(
+            self.llm,
+            self.generate_rooms_steps(scene, additional_requirements, visualize),
+        )
+
+    async def generate_rooms_async(
+        self, scene, additional_requirements="N/A", visualize=False
+    ):
+        return await arun_llm_steps(
+            self.llm,
+            self.generate_rooms_steps(scene, additional_requirements, visualize),
+        )
+
+    def generate_rooms_steps(
+        self, scene, additional_requirements="N/A", visualize=False
+    ):
         # get floor plan if not provided
         floor_plan_prompt = self.floor_plan_template.format(
             input=scene["query"], additional_requirements=additional_requirements
         )
         if "raw_floor_plan" not in scene:
-            result = self.llm.invoke([HumanMessage(content=floor_plan_prompt)])
-            raw_floor_plan = result.content
+            raw_floor_plan = yield floor_plan_prompt
             scene["raw_floor_plan"] = raw_floor_plan
         else:
             raw_floor_plan = scene["raw_floor_plan"]
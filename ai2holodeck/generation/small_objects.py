@@ -11,10 +11,11 @@ from procthor.constants import FLOOR_Y
 from procthor.utils.types import Vector3
 
 from ai2holodeck.constants import THOR_COMMIT_ID
+from ai2holodeck.generation.aabb_collision import AABBIndex
+from ai2holodeck.generation.candidate_pipeline import CandidatePipeline
 from ai2holodeck.generation.objaverse_retriever import ObjathorRetriever
 from ai2holodeck.generation.utils import (
     get_bbox_dims,
-    get_annotations,
     get_secondary_properties,
 )
 
@@ -24,6 +25,9 @@ class SmallObjectGenerator:
         self.llm = llm
         self.object_retriever = object_retriever
         self.database = object_retriever.database
+        self.asset_table = object_retriever.asset_table
+        # Only select objects that can be placed on other objects
+        self.small_asset_mask = self.asset_table.on_object
 
         # set kinematic to false for small objects
         self.json_template = {
@@ -162,9 +166,34 @@ class SmallObjectGenerator:
             if len(small_object_plans) > 0:
                 receptacle2small_object_plans[receptacle_id] = small_object_plans
 
+        # retrieve candidates for all small objects of the scene at once
+        object_names = list(
+            set(
+                small_object["object_name"]
+                for small_objects in receptacle2small_object_plans.values()
+                for small_object in small_objects
+            )
+        )
+        retrieved_candidates = self.object_retriever.retrieve_rows(
+            [f"a 3D model of {object_name}" for object_name in object_names],
+            self.clip_threshold,
+            [self.small_asset_mask] * len(object_names),
+        )
+        object_name2candidates = dict(zip(object_names, retrieved_candidates))
+
         receptacle2small_objects = {}
         packed_args = [
-            (receptacle, small_objects, receptacle2asset_id)
+            (
+                receptacle,
+                small_objects,
+                receptacle2asset_id,
+                {
+                    small_object["object_name"]: object_name2candidates[
+                        small_object["object_name"]
+                    ]
+                    for small_object in small_objects
+                },
+            )
             for receptacle, small_objects in receptacle2small_object_plans.items()
         ]
         pool = multiprocessing.Pool(processes=4)
@@ -178,7 +207,7 @@ class SmallObjectGenerator:
         return receptacle2small_objects
 
     def select_small_objects_per_receptacle(self, args):
-        receptacle, small_objects, receptacle2asset_id = args
+        receptacle, small_objects, receptacle2asset_id, object_name2candidates = args
 
         results = []
         receptacle_dimensions = get_bbox_dims(
@@ -189,6 +218,7 @@ class SmallObjectGenerator:
         capacity = 0
         num_objects = 0
         sorted(receptacle_size)
+        used_mask = self.asset_table.used_mask(self.used_assets)
         for small_object in small_objects:
             object_name, quantity, variance_type = (
                 small_object["object_name"],
@@ -197,44 +227,29 @@ class SmallObjectGenerator:
             )
             quantity = min(quantity, 5)  # maximum 5 objects per receptacle
             print(f"Selecting {quantity} {object_name} for {receptacle}")
-            # Select the object
-            candidates = self.object_retriever.retrieve(
-                [f"a 3D model of {object_name}"], self.clip_threshold
+            # Select the object, if the object is smaller than the receptacle,
+            # threshold is 90%
+            rows, scores = (
+                CandidatePipeline(self.asset_table)
+                .where(
+                    self.asset_table.footprint_mask(
+                        receptacle_size[0] * 0.9, receptacle_size[1] * 0.9
+                    )
+                )
+                .run(*object_name2candidates[object_name])
             )
-            candidates = [
-                candidate
-                for candidate in candidates
-                if get_annotations(self.database[candidate[0]])["onObject"] == True
-            ]  # Only select objects that can be placed on other objects
-
-            valid_candidates = []  # Only select objects with high confidence
-
-            for candidate in candidates:
-                candidate_dimensions = get_bbox_dims(self.database[candidate[0]])
-                candidate_size = [candidate_dimensions["x"], candidate_dimensions["z"]]
-                sorted(candidate_size)
-                if (
-                    candidate_size[0] < receptacle_size[0] * 0.9
-                    and candidate_size[1] < receptacle_size[1] * 0.9
-                ):  # if the object is smaller than the receptacle, threshold is 90%
-                    valid_candidates.append(candidate)
 
-            if len(valid_candidates) == 0:
+            if len(rows) == 0:
                 print(f"No valid candidate for {object_name}.")
                 continue
 
-            # remove used assets
-            top_one_candidate = valid_candidates[0]
-            if len(valid_candidates) > 1:
-                valid_candidates = [
-                    candidate
-                    for candidate in valid_candidates
-                    if candidate[0] not in self.used_assets
-                ]
-            if len(valid_candidates) == 0:
-                valid_candidates = [top_one_candidate]
-
-            valid_candidates = valid_candidates[:5]  # only select top 5 candidates
+            # remove used assets and only select top 5 candidates
+            valid_candidates = (
+                CandidatePipeline(self.asset_table)
+                .prefer_unused(used_mask)
+                .head(5)
+                .run_candidates(rows, scores)
+            )
 
             selected_asset_ids = []
             if variance_type == "same":
@@ -433,13 +448,11 @@ class SmallObjectGenerator:
         if len(static_placements) <= 1:
             return placements
         else:
-            colliding_pairs = []
-            for i, placement_1 in enumerate(static_placements[:-1]):
-                for placement_2 in static_placements[i + 1 :]:
-                    box1 = self.get_bounding_box(placement_1)
-                    box2 = self.get_bounding_box(placement_2)
-                    if self.intersect_3d(box1, box2):
-                        colliding_pairs.append((placement_1["id"], placement_2["id"]))
+            collision_index = AABBIndex()
+            for placement in static_placements:
+                box = self.get_bounding_box(placement)
+                collision_index.insert(placement["id"], box["min"], box["max"])
+            colliding_pairs = collision_index.query_pairs()
             id2assetId = {
                 placement["id"]: placement["assetId"] for placement in placements
             }
@@ -452,11 +465,11 @@ class SmallObjectGenerator:
                     )
                 )
                 # order by size from small to large
-                colliding_ids = sorted(
-                    colliding_ids,
-                    key=lambda x: get_bbox_dims(self.database[id2assetId[x]])["x"]
-                    * get_bbox_dims(self.database[id2assetId[x]])["z"],
-                )
+                sizes = self.asset_table.bbox[
+                    self.asset_table.get_rows([id2assetId[x] for x in colliding_ids])
+                ]
+                id2area = dict(zip(colliding_ids, (sizes[:, 0] * sizes[:, 2]).tolist()))
+                colliding_ids = sorted(colliding_ids, key=lambda x: id2area[x])
                 for object_id in colliding_ids:
                     remove_ids.append(object_id)
                     colliding_pairs = [
@@ -475,7 +488,7 @@ class SmallObjectGenerator:
 
     def get_bounding_box(self, placement):
         asset_id = placement["assetId"]
-        dimensions = get_bbox_dims(self.database[asset_id])
+        dimensions = self.asset_table.get_bbox_dims(asset_id)
         size = (dimensions["x"] * 100, dimensions["y"] * 100, dimensions["z"] * 100)
         position = placement["position"]
         box = {
@@ -491,11 +504,3 @@ class SmallObjectGenerator:
             ],
         }
         return box
-
-    def intersect_3d(self, box1, box2):
-        # box1 and box2 are dictionaries with 'min' and 'max' keys,
-        # which are tuples representing the minimum and maximum corners of the 3D box.
-        for i in range(3):
-            if box1["max"][i] < box2["min"][i] or box1["min"][i] > box2["max"][i]:
-                return False
-        return True
@@ -0,0 +1,124 @@
+import asyncio
+import inspect
+import time
+
+
+class Stage:
+    # one step of the scene pipeline, run(scene) returns a dict with (some of) its
+    # outputs, it can be a coroutine function or a plain function (run on a thread)
+    def __init__(self, name, run, inputs=(), outputs=()):
+        self.name = name
+        self.run = run
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+
+
+class StageScheduler:
+    # runs the stages as a dependency graph on the scene dict, every stage starts as
+    # soon as the stages producing its inputs are done. The stages are declared in
+    # a valid sequential order, which decides between several writers of a key
+    def __init__(self, stages):
+        self.stages = stages
+        self.dependencies = self.get_dependencies(stages)
+        self.timings = {}  # stage name -> (start, duration) in seconds
+
+    @staticmethod
+    def get_dependencies(stages):
+        names = [stage.name for stage in stages]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Stage names must be unique: {names}")
+
+        dependencies = {}
+        last_writer = {}  # key -> name of the last stage that writes it
+        readers = {}  # key -> stages that read the current version of the key
+        for stage in stages:
+            stage_dependencies = set()
+            for key in stage.inputs:
+                if key in last_writer:
+                    stage_dependencies.add(last_writer[key])
+            for key in stage.outputs:
+                # don't overwrite a key before the previous writer and its readers are done
+                if key in last_writer:
+                    stage_dependencies.add(last_writer[key])
+                stage_dependencies.update(readers.get(key, []))
+            stage_dependencies.discard(stage.name)
+            dependencies[stage.name] = stage_dependencies
+
+            for key in stage.inputs:
+                readers.setdefault(key, []).append(stage.name)
+            for key in stage.outputs:
+                last_writer[key] = stage.name
+                readers[key] = []
+        return dependencies
+
+    def check_inputs(self, scene):
+        produced = set()
+        for stage in self.stages:
+            missing = [
+                key for key in stage.inputs if key not in produced and key not in scene
+            ]
+            if missing:
+                raise ValueError(
+                    f"Stage {stage.name} needs {missing}, which are neither in the scene"
+                    f" nor produced by an earlier stage."
+                )
+            produced.update(stage.outputs)
+
+    async def run_stage(self, stage, scene, start_time):
+        stage_start = time.perf_counter()
+        if inspect.iscoroutinefunction(stage.run):
+            outputs = await stage.run(scene)
+        else:
+            outputs = await asyncio.to_thread(stage.run, scene)
+        self.timings[stage.name] = (
+            stage_start - start_time,
+            time.perf_counter() - stage_start,
+        )
+
+        outputs = outputs or {}
+        undeclared = [key for key in outputs if key not in stage.outputs]
+        if undeclared:
+            raise ValueError(f"Stage {stage.name} returned undeclared {undeclared}.")
+        return outputs
+
+    async def run(self, scene):
+        self.check_inputs(scene)
+        self.timings = {}
+        start_time = time.perf_counter()
+
+        stages = {stage.name: stage for stage in self.stages}
+        done = set()
+        running = {}  # task -> stage name
+        try:
+            while len(done) < len(stages):
+                for name, stage in stages.items():
+                    if (
+                        name not in done
+                        and name not in running.values()
+                        and self.dependencies[name] <= done
+                    ):
+                        task = asyncio.create_task(
+                            self.run_stage(stage, scene, start_time)
+                        )
+                        running[task] = name
+
+                finished, _ = await asyncio.wait(
+                    running, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in finished:
+                    scene.update(task.result())
+                    done.add(running.pop(task))
+        finally:
+            for task in running:
+                task.cancel()
+
+        return scene
+
+    def format_timings(self):
+        lines = [
+            f"{name}: {start:.1f}s + {duration:.1f}s"
+            for name, (start, duration) in sorted(
+                self.timings.items(), key=lambda item: item[1][0]
+            )
+        ]
+        return "\n".join(lines)
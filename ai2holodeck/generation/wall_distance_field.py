@@ -0,0 +1,52 @@
+import numpy as np
+
+
+def point_segment_distance(points, start, end):
+    # distances from points to segments, (..., 2) arrays that broadcast together.
+    # Same arithmetic as GEOS (and so shapely), the results are equal bit for bit
+    dx = points[..., 0] - start[..., 0]
+    dy = points[..., 1] - start[..., 1]
+    end_dx = points[..., 0] - end[..., 0]
+    end_dy = points[..., 1] - end[..., 1]
+    edge_dx = end[..., 0] - start[..., 0]
+    edge_dy = end[..., 1] - start[..., 1]
+    edge_length2 = edge_dx * edge_dx + edge_dy * edge_dy
+
+    # projection of the points on the segments, clamped to the endpoints
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r = (dx * edge_dx + dy * edge_dy) / edge_length2
+        s = (dx * edge_dy - dy * edge_dx) / edge_length2
+    to_start = np.sqrt(dx * dx + dy * dy)
+    to_end = np.sqrt(end_dx * end_dx + end_dy * end_dy)
+    to_line = np.abs(s) * np.sqrt(edge_length2)
+
+    distances = np.where(r <= 0, to_start, np.where(r >= 1, to_end, to_line))
+    return np.where(edge_length2 == 0, to_start, distances)
+
+
+class WallDistanceField:
+    # distance from points to the walls (exterior and holes) of a room, computed
+    # analytically for all points and wall segments at once. Built once per room so
+    # the edge, corner and facing wall tests of DFS_Solver_Floor are array math
+    # instead of a shapely distance query per candidate
+    def __init__(self, room_poly):
+        self.room_poly = room_poly
+
+        edge_start, edge_end = [], []
+        for ring in [room_poly.exterior] + list(room_poly.interiors):
+            coords = np.array(ring.coords, dtype=np.float64)
+            edge_start.append(coords[:-1])
+            edge_end.append(coords[1:])
+
+        self.edge_start = np.concatenate(edge_start)
+        self.edge_end = np.concatenate(edge_end)
+
+    def distance(self, points):
+        # same as room_poly.boundary.distance(Point(x, y)) for each (x, y)
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        if len(points) == 0:
+            return np.zeros(0, dtype=np.float64)
+
+        return point_segment_distance(
+            points[:, None], self.edge_start[None], self.edge_end[None]
+        ).min(axis=1)
@@ -0,0 +1,160 @@
+import math
+
+import numpy as np
+import shapely
+
+# rotations of a wall object and the inward wall normal its back has to face
+WALL_ROTATIONS = [0, 90, 180, 270]
+WALL_NORMALS = np.array([(0, 1), (1, 0), (0, -1), (-1, 0)], dtype=np.float64)
+
+
+class WallEdgeIndex:
+    # the walls of a room as arrays of segments, built once per room. Gives the grid
+    # points along the walls and the rotations that put an object's back against a
+    # wall at each of them, so DFS_Solver_Wall generates candidates with arithmetic
+    # instead of shapely calls per point and corner
+    def __init__(self, room_poly, grid_size):
+        self.room_poly = room_poly
+        self.grid_size = grid_size
+        # a prepared copy for the containment tests, the room itself is left as it is.
+        # Prepared predicates also count zero area boxes on a wall as contained, those
+        # are tested against the room like the original search did
+        self.prepared_poly = shapely.from_wkb(shapely.to_wkb(room_poly))
+        shapely.prepare(self.prepared_poly)
+
+        edge_start, edge_end, edge_normal = [], [], []
+        for ring, is_exterior in [(room_poly.exterior, True)] + [
+            (ring, False) for ring in room_poly.interiors
+        ]:
+            coords = np.array(ring.coords, dtype=np.float64)
+            direction = coords[1:] - coords[:-1]
+            # the room is left of a counter-clockwise exterior and right of a counter-clockwise hole
+            side = 1.0 if ring.is_ccw == is_exterior else -1.0
+            edge_start.append(coords[:-1])
+            edge_end.append(coords[1:])
+            edge_normal.append(side * np.stack([-direction[:, 1], direction[:, 0]], 1))
+
+        self.edge_start = np.concatenate(edge_start)
+        self.edge_end = np.concatenate(edge_end)
+        self.edge_min = np.minimum(self.edge_start, self.edge_end)
+        self.edge_max = np.maximum(self.edge_start, self.edge_end)
+        self.edge_direction = self.edge_end - self.edge_start
+
+        # walls that an object can stand against, only axis aligned walls qualify
+        edge_normal = np.sign(np.concatenate(edge_normal))
+        self.edge_rotations = (edge_normal[:, None, :] == WALL_NORMALS[None]).all(2)
+
+        self.grid_points = self.create_grids(room_poly)
+        self.grid_xy = np.array(self.grid_points, dtype=np.float64).reshape(-1, 2)
+        self.grid_rotations = self.get_rotation_mask(self.grid_xy)
+
+    def create_grids(self, room_poly):
+        # same points as shapely's substring(line, j, j) along every exterior edge
+        poly_coords = list(room_poly.exterior.coords)
+
+        grid_points = []
+        for (x_0, y_0), (x_1, y_1) in zip(poly_coords[:-1], poly_coords[1:]):
+            line_length = math.sqrt(
+                (x_1 - x_0) * (x_1 - x_0) + (y_1 - y_0) * (y_1 - y_0)
+            )
+            for j in range(0, int(line_length), self.grid_size):
+                fraction = j / line_length
+                grid_points.append(
+                    (
+                        (x_1 - x_0) * fraction + x_0 if j > 0 else x_0,
+                        (y_1 - y_0) * fraction + y_0 if j > 0 else y_0,
+                    )
+                )
+        return grid_points
+
+    def get_edge_mask(self, x, y):
+        # (points, edges) mask of the points that lie on each wall segment
+        x, y = np.asarray(x)[:, None], np.asarray(y)[:, None]
+        cross = self.edge_direction[:, 0] * (y - self.edge_start[:, 1]) - (
+            self.edge_direction[:, 1] * (x - self.edge_start[:, 0])
+        )
+        return (
+            (cross == 0)
+            & (x >= self.edge_min[:, 0])
+            & (x <= self.edge_max[:, 0])
+            & (y >= self.edge_min[:, 1])
+            & (y <= self.edge_max[:, 1])
+        )
+
+    def on_boundary(self, x, y):
+        return self.get_edge_mask(x, y).any(axis=1)
+
+    def get_rotation_mask(self, points_xy):
+        # (points, rotations) mask, an object can only be flush with a wall through the point
+        edge_mask = self.get_edge_mask(points_xy[:, 0], points_xy[:, 1])
+        return (edge_mask[:, :, None] & self.edge_rotations[None]).any(axis=1)
+
+    def get_solutions(self, grid_points, object_dim, height):
+        # same solutions, in the same order, as the original per point search
+        if grid_points is self.grid_points:
+            grid_xy, grid_rotations = self.grid_xy, self.grid_rotations
+        else:
+            grid_xy = np.array(grid_points, dtype=np.float64).reshape(-1, 2)
+            grid_rotations = self.get_rotation_mask(grid_xy)
+
+        obj_length, obj_height, obj_width = object_dim
+        obj_half_length = obj_length / 2
+
+        rotation_adjustments = {
+            0: ((-obj_half_length, 0), (obj_half_length, obj_width)),
+            90: ((0, -obj_half_length), (obj_width, obj_half_length)),
+            180: ((-obj_half_length, -obj_width), (obj_half_length, 0)),
+            270: ((-obj_width, -obj_half_length), (0, obj_half_length)),
+        }
+
+        solutions = []
+        for k, rotation in enumerate(WALL_ROTATIONS):
+            center_xy = grid_xy[grid_rotations[:, k]]
+            (min_x, min_y), (max_x, max_y) = rotation_adjustments[rotation]
+            lower_left_x = center_xy[:, 0] + min_x
+            lower_left_y = center_xy[:, 1] + min_y
+            upper_right_x = center_xy[:, 0] + max_x
+            upper_right_y = center_xy[:, 1] + max_y
+
+            boxes = shapely.box(
+                lower_left_x, lower_left_y, upper_right_x, upper_right_y
+            )
+            valid = shapely.contains(self.prepared_poly, boxes)
+            degenerate = (lower_left_x == upper_right_x) | (
+                lower_left_y == upper_right_y
+            )
+            if degenerate.any():
+                valid[degenerate] = shapely.contains(self.room_poly, boxes[degenerate])
+
+            # at least two distinct corners of the object have to touch the wall
+            corners = [
+                (upper_right_x, lower_left_y),
+                (upper_right_x, upper_right_y),
+                (lower_left_x, upper_right_y),
+                (lower_left_x, lower_left_y),
+            ]
+            corners_on_edge = np.zeros(len(center_xy), dtype=np.int64)
+            for i, (corner_x, corner_y) in enumerate(corners):
+                is_new = np.ones(len(center_xy), dtype=bool)
+                for other_x, other_y in corners[:i]:
+                    is_new &= (corner_x != other_x) | (corner_y != other_y)
+                corners_on_edge += is_new & self.on_boundary(corner_x, corner_y)
+            valid &= corners_on_edge >= 2
+
+            for x_0, y_0, x_1, y_1 in zip(
+                lower_left_x[valid].tolist(),
+                lower_left_y[valid].tolist(),
+                upper_right_x[valid].tolist(),
+                upper_right_y[valid].tolist(),
+            ):
+                solutions.append(
+                    [
+                        (x_0, height, y_0),
+                        (x_1, height + obj_height, y_1),
+                        rotation,
+                        ((x_1, y_0), (x_1, y_1), (x_0, y_1), (x_0, y_0), (x_1, y_0)),
+                        1,
+                    ]
+                )
+
+        return solutions
@@ -1,5 +1,5 @@
-import copy
 from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import random
 import re
 import time
@@ -8,12 +8,13 @@ import matplotlib.pyplot as plt
 import numpy as np
 from langchain_core.prompts import PromptTemplate
 from langchain_openai import OpenAI
-from shapely.geometry import Polygon, box, Point, LineString
-from shapely.ops import substring
-from langchain_core.messages import HumanMessage
+from shapely.geometry import Polygon
 import ai2holodeck.generation.prompts as prompts
+from ai2holodeck.generation.aabb_collision import AABBIndex
+from ai2holodeck.generation.async_llm import arun_llm_steps, run_llm_steps, solver_lock
 from ai2holodeck.generation.objaverse_retriever import ObjathorRetriever
 from ai2holodeck.generation.utils import get_bbox_dims
+from ai2holodeck.generation.wall_edge_index import WallEdgeIndex
 
 
 class WallObjectGenerator:
@@ -42,6 +43,7 @@ class WallObjectGenerator:
         self.grid_size = 25
         self.default_height = 150
         self.constraint_type = "llm"
+        self.layout_cache = None  # LayoutCache of solved rooms
 
     def generate_wall_objects(self, scene, use_constraint=True):
         doors = scene["doors"]
@@ -75,7 +77,38 @@ class WallObjectGenerator:
 
         return wall_objects
 
+    async def generate_wall_objects_async(self, scene, use_constraint=True):
+        # the constraint prompts of all rooms are sent concurrently
+        all_placements = await asyncio.gather(
+            *[
+                arun_llm_steps(
+                    self.llm,
+                    self.generate_wall_objects_per_room_steps(
+                        (
+                            room,
+                            scene,
+                            scene["doors"],
+                            scene["windows"],
+                            scene["open_walls"],
+                            scene["wall_height"],
+                            scene["selected_objects"],
+                            use_constraint,
+                        )
+                    ),
+                )
+                for room in scene["rooms"]
+            ]
+        )
+
+        wall_objects = []
+        for placements in all_placements:
+            wall_objects += placements
+        return wall_objects
+
     def generate_wall_objects_per_room(self, args):
+        return run_llm_steps(self.llm, self.generate_wall_objects_per_room_steps(args))
+
+    def generate_wall_objects_per_room_steps(self, args):
         (
             room,
             scene,
@@ -114,9 +147,7 @@ class WallObjectGenerator:
         )
         if self.constraint_type == "llm" and use_constraint:
             # constraint_plan = self.llm(constraints_prompt)
-            constraint_plan = self.llm.invoke(
-                [HumanMessage(content=constraints_prompt)]
-            ).content
+            constraint_plan = yield constraints_prompt
         else:
             constraint_plan = ""
             for object_name in wall_object_names:
@@ -171,14 +202,34 @@ class WallObjectGenerator:
         room_x, room_z = self.get_room_size(room)
         grid_size = max(room_x // 20, room_z // 20)
 
+        # the same room, objects and constraints give the same layout
+        if self.layout_cache is not None:
+            cache_key = self.layout_cache.get_key(
+                "wall",
+                grid_size,
+                room_vertices,
+                wall_objects_list,
+                constraints,
+                initial_state,
+                wall_object_name2id,
+                room_id,
+            )
+            placements = self.layout_cache.get(cache_key)
+            if placements is not None:
+                print(f"Reusing the cached wall layout of {room_id}.")
+                return placements
+
         solver = DFS_Solver_Wall(
             grid_size=grid_size, max_duration=5, constraint_bouns=100
         )
-        solutions = solver.get_solution(
-            room_poly, wall_objects_list, constraints, initial_state
-        )
+        with solver_lock:
+            solutions = solver.get_solution(
+                room_poly, wall_objects_list, constraints, initial_state
+            )
 
         placements = self.solution2placement(solutions, wall_object_name2id, room_id)
+        if self.layout_cache is not None:
+            self.layout_cache.put(cache_key, placements)
 
         return placements
 
@@ -388,14 +439,22 @@ class DFS_Solver_Wall:
         self.start_time = None
         self.solutions = []
         self.visualize = False
+        self.edge_index = None
+        self.collision_index = None
 
     def get_solution(self, room_poly, wall_objects_list, constraints, initial_state):
-        grid_points = self.create_grids(room_poly)
+        grid_points = self.get_edge_index(room_poly).grid_points
+        # boxes of the placed objects, updated along with placed_objects by the dfs
+        self.collision_index = self.get_collision_index(initial_state)
 
         self.start_time = time.time()
         try:
             self.dfs(
-                room_poly, wall_objects_list, constraints, grid_points, initial_state
+                room_poly,
+                wall_objects_list,
+                constraints,
+                grid_points,
+                dict(initial_state),
             )
         except SolutionFound as e:
             print(f"Time taken: {time.time() - self.start_time}")
@@ -416,9 +475,11 @@ class DFS_Solver_Wall:
     def dfs(
         self, room_poly, wall_objects_list, constraints, grid_points, placed_objects
     ):
+        # placed_objects is shared by the whole search, snapshot it for the solutions
         if len(wall_objects_list) == 0:
-            self.solutions.append(placed_objects)
-            return placed_objects
+            solution = dict(placed_objects)
+            self.solutions.append(solution)
+            return solution
 
         if time.time() - self.start_time > self.max_duration:
             print(f"Time limit reached.")
@@ -430,22 +491,26 @@ class DFS_Solver_Wall:
         )
 
         if len(placements) == 0:
-            self.solutions.append(placed_objects)
+            self.solutions.append(dict(placed_objects))
 
         paths = []
         for placement in placements:
-            placed_objects_updated = copy.deepcopy(placed_objects)
-            placed_objects_updated[object_name] = placement
+            # push the placement, search the rest and pop it again
+            placed_objects[object_name] = placement
+            self.collision_index.insert(object_name, placement[0], placement[1])
 
             sub_paths = self.dfs(
                 room_poly,
                 wall_objects_list[1:],
                 constraints,
                 grid_points,
-                placed_objects_updated,
+                placed_objects,
             )
             paths.extend(sub_paths)
 
+            del placed_objects[object_name]
+            self.collision_index.remove(object_name)
+
         return paths
 
     def get_possible_placements(
@@ -456,6 +521,7 @@ class DFS_Solver_Wall:
             self.get_all_solutions(
                 room_poly, grid_points, object_dim, constraint["height"]
             ),
+            self.collision_index,
         )
         random.shuffle(all_solutions)
         target_floor_object_name = constraint["target_floor_object_name"]
@@ -470,106 +536,44 @@ class DFS_Solver_Wall:
             all_solutions = sorted(all_solutions, key=lambda x: x[-1], reverse=True)
         return all_solutions
 
-    def create_grids(self, room_poly):
-        # Get the coordinates of the polygon
-        poly_coords = list(room_poly.exterior.coords)
-
-        grid_points = []
-        # Iterate over each pair of points (edges of the polygon)
-        for i in range(len(poly_coords) - 1):
-            line = LineString([poly_coords[i], poly_coords[i + 1]])
-            line_length = line.length
-
-            # Create points along the edge at intervals of grid size
-            for j in range(0, int(line_length), self.grid_size):
-                point_on_line = substring(
-                    line, j, j
-                )  # Get a point at distance j from the start of the line
-                if point_on_line:
-                    grid_points.append((point_on_line.x, point_on_line.y))
+    def get_edge_index(self, room_poly):
+        # the walls of the room are indexed once and reused by every dfs step
+        if self.edge_index is None or self.edge_index.room_poly is not room_poly:
+            self.edge_index = WallEdgeIndex(room_poly, self.grid_size)
+        return self.edge_index
 
-        return grid_points
+    def create_grids(self, room_poly):
+        return self.get_edge_index(room_poly).grid_points
 
     def get_all_solutions(self, room_poly, grid_points, object_dim, height):
-        obj_length, obj_height, obj_width = object_dim
-        obj_half_length = obj_length / 2
-
-        rotation_adjustments = {
-            0: ((-obj_half_length, 0), (obj_half_length, obj_width)),
-            90: ((0, -obj_half_length), (obj_width, obj_half_length)),
-            180: ((-obj_half_length, -obj_width), (obj_half_length, 0)),
-            270: ((-obj_width, -obj_half_length), (0, obj_half_length)),
-        }
-
-        solutions = []
-        for rotation in [0, 90, 180, 270]:
-            for point in grid_points:
-                center_x, center_y = point
-                lower_left_adjustment, upper_right_adjustment = rotation_adjustments[
-                    rotation
-                ]
-                lower_left = (
-                    center_x + lower_left_adjustment[0],
-                    center_y + lower_left_adjustment[1],
-                )
-                upper_right = (
-                    center_x + upper_right_adjustment[0],
-                    center_y + upper_right_adjustment[1],
-                )
-                obj_box = box(*lower_left, *upper_right)
-
-                if room_poly.contains(obj_box):
-                    object_coords = obj_box.exterior.coords[:]
-                    coordinates_on_edge = [
-                        coord
-                        for coord in object_coords
-                        if room_poly.boundary.contains(Point(coord))
-                    ]
-                    coordinates_on_edge = list(set(coordinates_on_edge))
-                    if len(coordinates_on_edge) >= 2:
-                        vertex_min = (lower_left[0], height, lower_left[1])
-                        vertex_max = (
-                            upper_right[0],
-                            height + obj_height,
-                            upper_right[1],
-                        )
-
-                        solutions.append(
-                            [
-                                vertex_min,
-                                vertex_max,
-                                rotation,
-                                tuple(obj_box.exterior.coords[:]),
-                                1,
-                            ]
-                        )
+        return self.get_edge_index(room_poly).get_solutions(
+            grid_points, object_dim, height
+        )
 
-        return solutions
+    def get_collision_index(self, placed_objects):
+        return AABBIndex(
+            {
+                object_name: (solution[0], solution[1])
+                for object_name, solution in placed_objects.items()
+            }
+        )
 
-    def filter_collision(self, placed_objects, solutions):
-        def intersect_3d(box1, box2):
-            # box1 and box2 are dictionaries with 'min' and 'max' keys,
-            # which are tuples representing the minimum and maximum corners of the 3D box.
-            for i in range(3):
-                if box1["max"][i] < box2["min"][i] or box1["min"][i] > box2["max"][i]:
-                    return False
-            return True
+    def filter_collision(self, placed_objects, solutions, collision_index=None):
+        if collision_index is None:
+            collision_index = self.get_collision_index(placed_objects)
+        if len(solutions) == 0:
+            return []
 
-        valid_solutions = []
-        boxes = [
-            {"min": vertex_min, "max": vertex_max}
-            for vertex_min, vertex_max, rotation, box_coords, path_weight in placed_objects.values()
+        collisions = collision_index.query(
+            [solution[0] for solution in solutions],
+            [solution[1] for solution in solutions],
+        )
+        return [
+            solution
+            for solution, collision in zip(solutions, collisions.tolist())
+            if not collision
         ]
 
-        for solution in solutions:
-            for box in boxes:
-                if intersect_3d(box, {"min": solution[0], "max": solution[1]}):
-                    break
-            else:
-                valid_solutions.append(solution)
-
-        return valid_solutions
-
     def score_solution_by_distance(self, solutions, target_object):
         distances = []
         scored_solutions = []
@@ -7,7 +7,7 @@ from langchain_core.prompts import PromptTemplate
 from langchain_openai import OpenAI
 from shapely.geometry import LineString, Polygon, Point
 import ai2holodeck.generation.prompts as prompts
-from langchain_core.messages import HumanMessage
+from ai2holodeck.generation.async_llm import arun_llm_steps, run_llm_steps
 
 class WallGenerator:
     def __init__(self, llm: OpenAI):
@@ -98,12 +98,18 @@ class WallGenerator:
         return wall_height, walls
 
     def get_wall_height(self, scene):
+        return run_llm_steps(self.llm, self.get_wall_height_steps(scene))
+
+    async def get_wall_height_async(self, scene):
+        return await arun_llm_steps(self.llm, self.get_wall_height_steps(scene))
+
+    def get_wall_height_steps(self, scene):
         # get wall height
         wall_height_prompt = self.wall_height_template.format(input=scene["query"])
 
         if "wall_height" not in scene:
             # wall_height = self.llm(wall_height_prompt).split("\n")[0].strip()
-            wall_height= self.llm.invoke([HumanMessage(content=wall_height_prompt)]).content.split("\n")[0].strip()
+            wall_height = (yield wall_height_prompt).split("\n")[0].strip()
             try:
                 wall_height = float(wall_height)
             except:
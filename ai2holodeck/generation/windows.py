@@ -9,9 +9,9 @@ import numpy as np
 from colorama import Fore
 from langchain_core.prompts import PromptTemplate
 from langchain_openai import OpenAI
-from langchain_core.messages import HumanMessage
 import ai2holodeck.generation.prompts as prompts
 from ai2holodeck.constants import HOLODECK_BASE_DATA_DIR
+from ai2holodeck.generation.async_llm import arun_llm_steps, run_llm_steps
 
 
 class WindowGenerator:
@@ -46,6 +46,16 @@ class WindowGenerator:
         self.used_assets = []
 
     def generate_windows(self, scene, additional_requirements_window):
+        return run_llm_steps(
+            self.llm, self.generate_windows_steps(scene, additional_requirements_window)
+        )
+
+    async def generate_windows_async(self, scene, additional_requirements_window):
+        return await arun_llm_steps(
+            self.llm, self.generate_windows_steps(scene, additional_requirements_window)
+        )
+
+    def generate_windows_steps(self, scene, additional_requirements_window):
         # get organized walls
         organized_walls, available_wall_str = self.get_wall_for_windows(scene)
         window_prompt = self.window_template.format(
@@ -57,7 +67,7 @@ class WindowGenerator:
 
         if "raw_window_plan" not in scene:
             # raw_window_plan = self.llm(window_prompt)
-            raw_window_plan = self.llm.invoke([HumanMessage(content=window_prompt)]).content
+            raw_window_plan = yield window_prompt
         else:
             raw_window_plan = scene["raw_window_plan"]
 
@@ -1,4 +1,5 @@
 import ast
+import asyncio
 import os
 import traceback
 from argparse import ArgumentParser
@@ -54,7 +55,7 @@ def generate_single_scene(args):
         scene = args.model.get_empty_scene()
 
     try:
-        _, save_dir = args.model.generate_scene(
+        scene_kwargs = dict(
             scene=scene,
             query=args.query,
             save_dir=args.save_dir,
@@ -67,6 +68,10 @@ def generate_single_scene(args):
             use_milp=ast.literal_eval(args.use_milp),
             random_selection=ast.literal_eval(args.random_selection),
         )
+        if ast.literal_eval(args.async_llm):
+            _, save_dir = asyncio.run(args.model.generate_scene_async(**scene_kwargs))
+        else:
+            _, save_dir = args.model.generate_scene(**scene_kwargs)
     except:
         print(
             f"[ERROR] Could not generate scene from {args.query}. Traceback:\n{traceback.format_exc()}"
@@ -191,6 +196,11 @@ if __name__ == "__main__":
         help="Whether to generate a single room scene.",
         default="False",
     )
+    parser.add_argument(
+        "--async_llm",
+        help="Whether to send independent LLM prompts concurrently (see HOLODECK_LLM_CONCURRENCY).",
+        default="False",
+    )
 
     args = parser.parse_args()
 
@@ -0,0 +1,686 @@
+from argparse import ArgumentParser
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+from typing import Optional, List, Union
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import random
+import re
+import time
+import uuid
+
+# Offline stand-in for an OpenAI compatible chat completions endpoint, to load test
+# and profile the pipeline without a real model. Each Holodeck prompt is recognised
+# by its wording and answered with a generated response in the format its parser
+# expects, after a latency drawn from the configured distribution. The responses
+# only depend on the prompt, so repeated runs generate the same scenes.
+#
+#   python api_server/fake_llm_server.py --port 8001 --latency lognormal --latency_mean 2 --latency_std 1
+#   python ai2holodeck/main.py --query "a living room" --openai_api_base http://localhost:8001/v1
+
+app = FastAPI(title="Holodeck Fake LLM Server")
+logger = logging.getLogger(__name__)
+
+
+class ChatMessage(BaseModel):
+    role: str
+    content: Union[str, List[dict], None] = None
+
+
+class ChatCompletionRequest(BaseModel):
+    model: str = "fake-llm"
+    messages: List[ChatMessage]
+    temperature: Optional[float] = None
+    stream: bool = False
+
+
+class LatencySampler:
+    # seconds to wait before answering: fixed (mean), uniform (min to max), normal or
+    # lognormal (mean and std of the latency itself), plus per_token seconds for each
+    # token of the response, clipped to [min_latency, max_latency]
+    def __init__(
+        self,
+        distribution="fixed",
+        mean=0.0,
+        std=0.0,
+        min_latency=0.0,
+        max_latency=600.0,
+        per_token=0.0,
+        seed=None,
+    ):
+        self.distribution = distribution
+        self.mean = mean
+        self.std = std
+        self.min_latency = min_latency
+        self.max_latency = max_latency
+        self.per_token = per_token
+        self.random = random.Random(seed)
+
+    def sample(self, num_tokens=0):
+        if self.distribution == "fixed":
+            latency = self.mean
+        elif self.distribution == "uniform":
+            latency = self.random.uniform(self.min_latency, self.max_latency)
+        elif self.distribution == "normal":
+            latency = self.random.gauss(self.mean, self.std)
+        elif self.distribution == "lognormal":
+            # parameters of the underlying normal for the requested mean and std
+            sigma2 = math.log1p((self.std / self.mean) ** 2) if self.mean > 0 else 0.0
+            mu = math.log(self.mean) - sigma2 / 2 if self.mean > 0 else -math.inf
+            latency = self.random.lognormvariate(mu, math.sqrt(sigma2))
+        else:
+            raise ValueError(f"Unknown latency distribution: {self.distribution}")
+
+        latency += self.per_token * num_tokens
+        return min(max(latency, self.min_latency), self.max_latency)
+
+
+# room types recognised in the query, in the order they are laid out
+ROOM_TYPES = [
+    "living room",
+    "kitchen",
+    "dining room",
+    "bedroom",
+    "bathroom",
+    "office",
+    "study room",
+    "classroom",
+    "library",
+    "gym",
+    "game room",
+    "laundry room",
+]
+
+FLOOR_DESIGNS = [
+    "maple hardwood, matte",
+    "light oak wood, smooth",
+    "grey carpet, soft",
+    "white hex tile, glossy",
+    "dark walnut wood, polished",
+]
+
+WALL_DESIGNS = [
+    "light grey drywall, smooth",
+    "white painted plaster, matte",
+    "beige wallpaper, textured",
+    "soft blue drywall, smooth",
+]
+
+# object name -> [description, location, size, quantity, variance type, objects on top]
+OBJECT_CATALOG = {
+    "living room": {
+        "sofa": [
+            "modern light grey sofa",
+            "floor",
+            [200, 90, 80],
+            1,
+            "same",
+            [["pillow", 2]],
+        ],
+        "coffee table": [
+            "low wooden coffee table",
+            "floor",
+            [110, 60, 45],
+            1,
+            "same",
+            [["book", 2], ["vase", 1]],
+        ],
+        "tv stand": ["white tv stand", "floor", [160, 45, 50], 1, "same", [["tv", 1]]],
+        "armchair": ["fabric armchair", "floor", [80, 80, 90], 1, "same", []],
+        "bookshelf": [
+            "tall wooden bookshelf",
+            "floor",
+            [90, 35, 180],
+            1,
+            "same",
+            [["book", 4]],
+        ],
+        "painting": ["abstract painting", "wall", [100, 5, 70], 1, "same", []],
+    },
+    "kitchen": {
+        "refrigerator": [
+            "stainless steel refrigerator",
+            "floor",
+            [80, 75, 180],
+            1,
+            "same",
+            [],
+        ],
+        "kitchen counter": [
+            "white kitchen counter with cabinets",
+            "floor",
+            [200, 60, 90],
+            1,
+            "same",
+            [["microwave", 1], ["kettle", 1]],
+        ],
+        "dining table": [
+            "small wooden dining table",
+            "floor",
+            [120, 80, 75],
+            1,
+            "same",
+            [["fruit bowl", 1]],
+        ],
+        "chair": ["wooden dining chair", "floor", [45, 45, 90], 2, "same", []],
+        "wall shelf": ["wooden wall shelf", "wall", [80, 25, 30], 1, "same", []],
+    },
+    "dining room": {
+        "dining table": [
+            "rectangular wooden dining table",
+            "floor",
+            [180, 90, 75],
+            1,
+            "same",
+            [["plate", 4], ["vase", 1]],
+        ],
+        "chair": ["upholstered dining chair", "floor", [45, 50, 95], 4, "same", []],
+        "sideboard": [
+            "low wooden sideboard",
+            "floor",
+            [160, 45, 80],
+            1,
+            "same",
+            [["lamp", 1]],
+        ],
+        "painting": ["still life painting", "wall", [90, 5, 60], 1, "same", []],
+    },
+    "bedroom": {
+        "bed": [
+            "queen size bed with a wooden frame",
+            "floor",
+            [210, 160, 60],
+            1,
+            "same",
+            [["pillow", 2]],
+        ],
+        "nightstand": [
+            "wooden nightstand",
+            "floor",
+            [50, 40, 55],
+            2,
+            "same",
+            [["table lamp", 1]],
+        ],
+        "wardrobe": ["white wardrobe", "floor", [150, 60, 200], 1, "same", []],
+        "dresser": [
+            "wooden dresser",
+            "floor",
+            [120, 50, 80],
+            1,
+            "same",
+            [["mirror", 1]],
+        ],
+        "painting": ["landscape painting", "wall", [80, 5, 60], 1, "same", []],
+    },
+    "bathroom": {
+        "toilet": ["white ceramic toilet", "floor", [40, 65, 75], 1, "same", []],
+        "sink cabinet": [
+            "bathroom sink with cabinet",
+            "floor",
+            [80, 50, 85],
+            1,
+            "same",
+            [["soap dispenser", 1]],
+        ],
+        "bathtub": ["white bathtub", "floor", [170, 75, 60], 1, "same", []],
+        "mirror": ["rectangular bathroom mirror", "wall", [60, 3, 80], 1, "same", []],
+    },
+    "office": {
+        "desk": [
+            "modern office desk",
+            "floor",
+            [140, 70, 75],
+            1,
+            "same",
+            [["computer monitor", 1], ["keyboard", 1]],
+        ],
+        "chair": ["ergonomic office chair", "floor", [60, 60, 110], 1, "same", []],
+        "filing cabinet": [
+            "metal filing cabinet",
+            "floor",
+            [45, 60, 100],
+            1,
+            "same",
+            [],
+        ],
+        "bookshelf": [
+            "tall bookshelf",
+            "floor",
+            [90, 35, 180],
+            1,
+            "same",
+            [["book", 4]],
+        ],
+        "clock": ["round wall clock", "wall", [35, 5, 35], 1, "same", []],
+    },
+}
+
+# objects for rooms without their own catalog entry
+DEFAULT_OBJECTS = {
+    "table": ["wooden table", "floor", [140, 80, 75], 1, "same", [["book", 2]]],
+    "chair": ["simple wooden chair", "floor", [45, 45, 90], 2, "same", []],
+    "shelf": ["wooden shelf", "floor", [100, 40, 160], 1, "same", [["box", 2]]],
+    "painting": ["framed painting", "wall", [80, 5, 60], 1, "same", []],
+}
+
+# added when the selected objects leave the room too empty
+EXTRA_OBJECTS = {
+    "floor lamp": ["tall floor lamp", "floor", [40, 40, 160], 1, "same", []],
+    "plant": ["potted plant", "floor", [40, 40, 100], 1, "same", []],
+    "side table": [
+        "small round side table",
+        "floor",
+        [45, 45, 55],
+        1,
+        "same",
+        [["book", 1]],
+    ],
+}
+
+# object type -> (target types, constraints), the first object of a target type
+# already in the plan is used
+PAIRED_OBJECTS = {
+    "coffee table": (
+        ("sofa",),
+        "middle | near, {target} | in front of, {target} | center aligned, {target} | face to, {target}",
+    ),
+    "tv stand": (
+        ("sofa",),
+        "edge | far, {target} | in front of, {target} | center aligned, {target} | face to, {target}",
+    ),
+    "armchair": (
+        ("coffee table",),
+        "middle | near, {target} | side of, {target} | face to, {target}",
+    ),
+    "side table": (("sofa",), "edge | near, {target} | side of, {target}"),
+    "nightstand": (("bed",), "edge | near, {target} | side of, {target}"),
+    "chair": (("table", "desk"), "middle | around, {target}"),
+    "floor lamp": (("armchair", "sofa"), "middle | near, {target} | side of, {target}"),
+}
+
+# bottom height (cm) of wall objects
+WALL_OBJECT_HEIGHTS = {"painting": 150, "mirror": 120, "clock": 180, "shelf": 140}
+
+# one size per window type, from the sizes listed in the window prompt
+WINDOW_SIZES = {"fixed": (150, 120), "hung": (96, 91), "slider": (120, 91)}
+
+CEILING_OBJECTS = [
+    "modern, 3-light, semi-flush mount ceiling light",
+    "round flush mount led ceiling light",
+    "black metal pendant light",
+]
+
+DOOR_STYLES = [
+    "wooden door with white frames",
+    "white modern door",
+    "dark brown wooden door",
+]
+
+
+def get_random(prompt):
+    # a generator seeded by the prompt, same prompt same response
+    seed = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    return random.Random(seed)
+
+
+def find(pattern, prompt, default=""):
+    match = re.search(pattern, prompt, re.DOTALL)
+    return match.group(1).strip() if match else default
+
+
+def get_object_type(object_name):
+    return object_name.rsplit("-", 1)[0]
+
+
+def respond_floor_plan(prompt, rng):
+    query = find(r"Now, I need a design for (.*?)\.\nAdditional", prompt).lower()
+    room_types = [room_type for room_type in ROOM_TYPES if room_type in query]
+    if not room_types:
+        if any(word in query for word in ["apartment", "house", "home", "flat"]):
+            room_types = ["living room", "kitchen", "bedroom"]
+        else:
+            room_types = ["living room"]
+
+    # rooms side by side with the same depth, each sharing a full wall with the next
+    depth = rng.choice([4, 5, 6])
+    lines = []
+    x = 0
+    for room_type in room_types[:4]:
+        width = rng.choice([3, 4, 5, 6])
+        vertices = [(x, 0), (x, depth), (x + width, depth), (x + width, 0)]
+        lines.append(
+            f"{room_type} | {rng.choice(FLOOR_DESIGNS)} | {rng.choice(WALL_DESIGNS)} | {vertices}"
+        )
+        x += width
+    return "\n".join(lines)
+
+
+def respond_wall_height(prompt, rng):
+    return rng.choice(["2.7", "3.0", "3.2"])
+
+
+def respond_doorway(prompt, rng):
+    rooms = find(r"which includes these rooms: (.*?)\. The length", prompt).split(", ")
+    room_pairs = re.findall(
+        r"\(([^()]*?), ([^()]*?)\)", find(r"share a wall: (.*?)\. There must", prompt)
+    )
+    if not any("exterior" in pair for pair in room_pairs) and rooms[0]:
+        room_pairs.insert(0, ("exterior", rooms[0]))
+
+    lines = []
+    for room0, room1 in room_pairs:
+        if "exterior" in (room0, room1) or rng.random() < 0.7:
+            lines.append(
+                f"{room0} | {room1} | doorway | single | {rng.choice(DOOR_STYLES)}"
+            )
+        else:
+            lines.append(f"{room0} | {room1} | doorframe | single | N/A")
+    return "\n".join(lines)
+
+
+def respond_window(prompt, rng):
+    wall_height = int(find(r"The wall height is (\d+) cm", prompt, "300"))
+    walls = find(r"in each room are:\n(.*?)\nPlease note", prompt)
+
+    lines = []
+    for line in walls.split("\n"):
+        room_id, _, available_walls = line.partition(": ")
+        available_walls = re.findall(r"(\w+), (\d+) cm", available_walls)
+        if not available_walls:
+            continue
+
+        direction, wall_width = max(available_walls, key=lambda wall: int(wall[1]))
+        window_type = rng.choice(list(WINDOW_SIZES))
+        window_width, window_height = WINDOW_SIZES[window_type]
+        # leave at least 50 cm around each window
+        quantity = max(1, min(2, (int(wall_width) - 50) // (window_width + 50)))
+        base_height = max(0, min(80, wall_height - window_height - 40))
+        lines.append(
+            f"{room_id} | {direction} | {window_type} | ({window_width}, {window_height}) | {quantity} | {base_height}"
+        )
+    return "\n".join(lines)
+
+
+def get_selected_objects(room_type):
+    for catalog_room_type, objects in OBJECT_CATALOG.items():
+        if catalog_room_type in room_type:
+            return dict(objects)
+    return dict(DEFAULT_OBJECTS)
+
+
+def format_object_plan(room_type, objects):
+    plan = {}
+    for object_name, values in objects.items():
+        description, location, size, quantity, variance_type, objects_on_top = values
+        plan[object_name] = {
+            "description": description,
+            "location": location,
+            "size": size,
+            "quantity": quantity,
+            "variance_type": variance_type,
+            "objects_on_top": [
+                {"object_name": name, "quantity": count, "variance_type": "varied"}
+                for name, count in objects_on_top
+            ],
+        }
+    return (
+        f"The {room_type} gets the essential furniture along the walls, with small "
+        f"objects on top to make it look lived in.\n{json.dumps(plan, indent=4)}"
+    )
+
+
+def respond_object_selection(prompt, rng):
+    room_type = find(r"we are working on the \*(.*?)\* with the size", prompt).lower()
+    return format_object_plan(room_type, get_selected_objects(room_type))
+
+
+def respond_object_reselection(prompt, rng):
+    room_type = find(r"I found the \*(.*?)\* is still too empty", prompt).lower()
+    objects = get_selected_objects(room_type)
+    objects.update(EXTRA_OBJECTS)
+    return format_object_plan(room_type, objects)
+
+
+def get_object_names(prompt):
+    objects = find(r"that I want to place in the [^\n]*:\n(.*?)\n", prompt)
+    return [name.strip() for name in objects.split(", ") if name.strip()]
+
+
+def respond_floor_constraints(prompt, rng):
+    lines = []
+    placed = []
+    for object_name in get_object_names(prompt):
+        constraints = "edge"
+        object_type = get_object_type(object_name)
+        for paired_type, (target_types, paired_constraints) in PAIRED_OBJECTS.items():
+            if paired_type not in object_type:
+                continue
+            targets = [
+                name
+                for name in placed
+                if any(target in get_object_type(name) for target in target_types)
+            ]
+            if targets:
+                constraints = paired_constraints.format(target=targets[0])
+            break
+
+        lines.append(f"{object_name} | {constraints}")
+        placed.append(object_name)
+    return "I start with the largest objects along the walls.\n" + "\n".join(lines)
+
+
+def respond_floor_baseline(prompt, rng):
+    room_size = find(r"the room size is (\d+ cm x \d+) cm", prompt, "400 cm x 400")
+    room_x, room_z = [int(size) for size in room_size.split(" cm x ")]
+    object_names = get_object_names(prompt)
+
+    # spread the objects over a grid of the room
+    columns = max(1, math.ceil(math.sqrt(len(object_names))))
+    rows = max(1, math.ceil(len(object_names) / columns))
+    placements = []
+    for i, object_name in enumerate(object_names):
+        row, column = divmod(i, columns)
+        placements.append(
+            {
+                "object_name": object_name,
+                "position": {
+                    "X": int(room_x * (column + 0.5) / columns),
+                    "Y": int(room_z * (row + 0.5) / rows),
+                },
+                "rotation": rng.choice([0, 90, 180, 270]),
+            }
+        )
+    return f"```json\n{json.dumps(placements, indent=4)}\n```"
+
+
+def respond_wall_constraints(prompt, rng):
+    wall_height = int(find(r"the wall height is (\d+) cm", prompt, "300"))
+    wall_objects = find(
+        r"The wall objects I want to place in the .*? are: (.*?)\.\n", prompt
+    )
+
+    lines = []
+    for object_name in wall_objects.split(", "):
+        if not object_name.strip():
+            continue
+        height = int(wall_height * 0.5)
+        for object_type, object_height in WALL_OBJECT_HEIGHTS.items():
+            if object_type in object_name:
+                height = object_height
+                break
+        height = max(0, min(height, wall_height - 60))
+        lines.append(f"{object_name.strip()} | N/A | {height}")
+    return "\n".join(lines)
+
+
+def respond_ceiling(prompt, rng):
+    rooms = find(r"featuring these rooms: (.*?)\. You need", prompt).split(", ")
+    ceiling_object = rng.choice(CEILING_OBJECTS)
+    return "\n".join(f"{room} | {ceiling_object}" for room in rooms if room)
+
+
+# (phrase in the prompt, responder), checked in order. The reselection prompt
+# repeats the selection prompt, so it comes first
+RESPONDERS = [
+    ("is still too empty", "object_reselection", respond_object_reselection),
+    (
+        "selecting large *floor*/*wall* objects",
+        "object_selection",
+        respond_object_selection,
+    ),
+    ("arrange wall objects", "wall_constraints", respond_wall_constraints),
+    ("You operate in a 2D Space", "floor_baseline", respond_floor_baseline),
+    (
+        "arrange objects in the room by assigning constraints",
+        "floor_constraints",
+        respond_floor_constraints,
+    ),
+    ("crafting a floor plan", "floor_plan", respond_floor_plan),
+    ("decide the wall height", "wall_height", respond_wall_height),
+    ("designing the connections between rooms", "doorway", respond_doorway),
+    ("designing the windows", "window", respond_window),
+    ("ceiling objects (light/fan)", "ceiling", respond_ceiling),
+]
+
+
+def respond(prompt):
+    # (prompt kind, response text) for a Holodeck prompt
+    rng = get_random(prompt)
+    for phrase, kind, responder in RESPONDERS:
+        if phrase in prompt:
+            return kind, responder(prompt, rng)
+
+    # a prompt whose wording changed, it shows up as unknown_prompts in /stats
+    logger.warning("Unknown prompt, answering N/A: %s", prompt[:200])
+    return "unknown", "N/A"
+
+
+def get_prompt(messages):
+    # text of the last user message, content parts are joined
+    for message in reversed(messages):
+        if message.role != "user":
+            continue
+        if isinstance(message.content, list):
+            return "".join(part.get("text", "") for part in message.content)
+        return message.content or ""
+    return ""
+
+
+def count_tokens(text):
+    # rough estimate, about four characters per token
+    return len(text) // 4 + 1
+
+
+app.state.latency = LatencySampler()
+app.state.stats = {"requests": 0, "latency": 0.0, "kinds": {}}
+
+
+@app.post("/v1/chat/completions")
+@app.post("/chat/completions")
+async def chat_completions(request: ChatCompletionRequest):
+    if request.stream:
+        raise HTTPException(status_code=400, detail="Streaming is not supported")
+
+    prompt = get_prompt(request.messages)
+    kind, content = respond(prompt)
+
+    latency = app.state.latency.sample(count_tokens(content))
+    await asyncio.sleep(latency)
+
+    stats = app.state.stats
+    stats["requests"] += 1
+    stats["latency"] += latency
+    stats["kinds"][kind] = stats["kinds"].get(kind, 0) + 1
+
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": request.model,
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {
+            "prompt_tokens": count_tokens(prompt),
+            "completion_tokens": count_tokens(content),
+            "total_tokens": count_tokens(prompt) + count_tokens(content),
+        },
+    }
+
+
+@app.get("/v1/models")
+async def list_models():
+    return {
+        "object": "list",
+        "data": [{"id": "fake-llm", "object": "model", "owned_by": "holodeck"}],
+    }
+
+
+@app.get("/stats")
+async def get_stats():
+    stats = app.state.stats
+    requests = stats["requests"]
+    return {
+        "requests": requests,
+        "mean_latency": stats["latency"] / requests if requests > 0 else 0.0,
+        "kinds": stats["kinds"],
+        "unknown_prompts": stats["kinds"].get("unknown", 0),
+    }
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = ArgumentParser()
+    parser.add_argument("--host", help="Host to listen on.", default="0.0.0.0")
+    parser.add_argument("--port", help="Port to listen on.", type=int, default=8001)
+    parser.add_argument(
+        "--latency",
+        help="Latency distribution: fixed (mean), uniform (min to max), normal or lognormal (mean and std).",
+        default="fixed",
+        choices=["fixed", "uniform", "normal", "lognormal"],
+    )
+    parser.add_argument(
+        "--latency_mean", help="Mean latency in seconds.", type=float, default=0.0
+    )
+    parser.add_argument(
+        "--latency_std",
+        help="Latency standard deviation in seconds.",
+        type=float,
+        default=0.0,
+    )
+    parser.add_argument(
+        "--latency_min", help="Minimum latency in seconds.", type=float, default=0.0
+    )
+    parser.add_argument(
+        "--latency_max", help="Maximum latency in seconds.", type=float, default=600.0
+    )
+    parser.add_argument(
+        "--latency_per_token",
+        help="Additional latency in seconds per generated token.",
+        type=float,
+        default=0.0,
+    )
+    parser.add_argument(
+        "--seed", help="Seed of the latency samples.", type=int, default=None
+    )
+    args = parser.parse_args()
+
+    app.state.latency = LatencySampler(
+        distribution=args.latency,
+        mean=args.latency_mean,
+        std=args.latency_std,
+        min_latency=args.latency_min,
+        max_latency=args.latency_max,
+        per_token=args.latency_per_token,
+        seed=args.seed,
+    )
+    uvicorn.run(app, host=args.host, port=args.port)
@@ -0,0 +1,104 @@
+import random
+
+import numpy as np
+import pytest
+
+from ai2holodeck.generation.aabb_collision import AABBIndex
+from ai2holodeck.generation.wall_objects import DFS_Solver_Wall
+
+
+def intersect_3d(box1, box2):
+    # the pairwise test of the wall and small object solvers before the index
+    for i in range(3):
+        if box1["max"][i] < box2["min"][i] or box1["min"][i] > box2["max"][i]:
+            return False
+    return True
+
+
+def random_box(rng):
+    # grid aligned boxes touch each other, zero size boxes happen for flat assets
+    box_min = [rng.choice([0, 50, 100, rng.uniform(0, 400)]) for _ in range(3)]
+    box_max = [value + rng.choice([0, 50, rng.uniform(1, 150)]) for value in box_min]
+    return tuple(box_min), tuple(box_max)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_pairwise_test(seed):
+    rng = random.Random(seed)
+    index = AABBIndex()
+    boxes = {}
+    for step in range(80):
+        if boxes and rng.random() < 0.3:
+            name = rng.choice(list(boxes))
+            index.remove(name)
+            del boxes[name]
+        else:
+            name = f"box-{step}"
+            boxes[name] = random_box(rng)
+            index.insert(name, *boxes[name])
+        assert len(index) == len(boxes)
+
+        queries = [random_box(rng) for _ in range(30)]
+        mask = index.get_collision_mask(
+            [query_min for query_min, _ in queries],
+            [query_max for _, query_max in queries],
+        )
+        for query, row in zip(queries, mask):
+            expected = {
+                name
+                for name, (box_min, box_max) in boxes.items()
+                if intersect_3d(
+                    {"min": box_min, "max": box_max},
+                    {"min": query[0], "max": query[1]},
+                )
+            }
+            assert {index.names[i] for i in np.flatnonzero(row)} == expected
+
+        names = list(boxes)
+        expected = {
+            frozenset((name_1, name_2))
+            for i, name_1 in enumerate(names)
+            for name_2 in names[i + 1 :]
+            if intersect_3d(
+                {"min": boxes[name_1][0], "max": boxes[name_1][1]},
+                {"min": boxes[name_2][0], "max": boxes[name_2][1]},
+            )
+        }
+        pairs = index.query_pairs()
+        assert len(pairs) == len(expected)
+        assert {frozenset(pair) for pair in pairs} == expected
+
+
+def test_empty_index():
+    index = AABBIndex()
+    assert index.query([[0, 0, 0]], [[1, 1, 1]]).tolist() == [False]
+    assert index.query(np.zeros((0, 3)), np.zeros((0, 3))).tolist() == []
+    assert index.query_pairs() == []
+
+
+def test_wall_filter_collision_is_unchanged():
+    rng = random.Random(0)
+    placed_objects = {}
+    for i in range(6):
+        box_min, box_max = random_box(rng)
+        placed_objects[f"object-{i}"] = (box_min, box_max, 0, [], 1)
+    solutions = []
+    for _ in range(300):
+        box_min, box_max = random_box(rng)
+        solutions.append([box_min, box_max, 0, (), 1])
+
+    # the original filter, one pairwise test per solution and object
+    expected = [
+        solution
+        for solution in solutions
+        if not any(
+            intersect_3d(
+                {"min": vertex_min, "max": vertex_max},
+                {"min": solution[0], "max": solution[1]},
+            )
+            for vertex_min, vertex_max, _, _, _ in placed_objects.values()
+        )
+    ]
+    assert 0 < len(expected) < len(solutions)
+    solver = DFS_Solver_Wall(grid_size=25)
+    assert solver.filter_collision(placed_objects, solutions) == expected
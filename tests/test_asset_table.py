@@ -0,0 +1,181 @@
+import random
+
+import numpy as np
+import pytest
+import torch
+
+from ai2holodeck.generation.asset_table import AssetTable
+from ai2holodeck.generation.utils import (
+    get_annotations,
+    get_bbox_dims,
+    get_secondary_properties,
+)
+
+CATEGORIES = ["chair", "Door", "window frame", "lamp", "painting"]
+
+
+@pytest.fixture
+def database():
+    rng = random.Random(0)
+    database = {}
+    for i in range(300):
+        size = {
+            axis: rng.choice([0.05, 0.5, 1.0, rng.uniform(0.01, 3)]) for axis in "xyz"
+        }
+        # the different layouts of the objathor and thor annotations
+        if i % 3 == 0:
+            bounding_box = {"min": {axis: 0.0 for axis in "xyz"}, "max": size}
+        elif i % 3 == 1:
+            bounding_box = {"size": size}
+        else:
+            bounding_box = size
+        annotations = {
+            "category": rng.choice(CATEGORIES),
+            "onFloor": rng.random() < 0.5,
+            "onWall": rng.random() < 0.5,
+            "onCeiling": rng.random() < 0.2,
+            "onObject": rng.random() < 0.5,
+        }
+        metadata = {"boundingBox": bounding_box}
+        if i % 4 != 0:
+            metadata["secondaryProperties"] = ["CanBreak"] if i % 5 == 0 else []
+        if i % 2 == 0:
+            database[f"asset-{i}"] = {
+                "annotations": annotations,
+                "assetMetadata": metadata,
+            }
+        else:
+            database[f"asset-{i}"] = {
+                **annotations,
+                "thor_metadata": {"assetMetadata": metadata},
+            }
+    database["broken"] = {"annotations": {"category": "chair"}}
+    return database
+
+
+def get_size(obj_data):
+    dimension = get_bbox_dims(obj_data)
+    return [dimension["x"], dimension["y"], dimension["z"]]
+
+
+def test_columns_match_annotations(database):
+    asset_ids = list(database)
+    table = AssetTable(database, asset_ids)
+
+    for row, uid in enumerate(asset_ids):
+        if uid == "broken":
+            assert not table.valid[row]
+            continue
+
+        annotation = get_annotations(database[uid])
+        assert table.valid[row]
+        assert table.bbox[row].tolist() == get_size(database[uid])
+        assert table.on_floor[row] == bool(annotation["onFloor"])
+        assert table.on_wall[row] == (annotation["onWall"] == True)
+        assert table.on_ceiling[row] == bool(annotation["onCeiling"])
+        assert table.on_object[row] == (annotation["onObject"] == True)
+        try:
+            can_break = "CanBreak" in get_secondary_properties(database[uid])
+        except KeyError:
+            can_break = False
+        assert table.can_break[row] == can_break
+
+
+def test_category_mask(database):
+    asset_ids = list(database)
+    table = AssetTable(database, asset_ids)
+
+    predicate = lambda category: "door" in category.lower()
+    expected = [
+        uid != "broken" and predicate(get_annotations(database[uid])["category"])
+        for uid in asset_ids
+    ]
+    assert table.category_mask(predicate).tolist() == expected
+
+
+@pytest.mark.parametrize("room_size", [(4.0, 3.0, 5.0), (1.0, 1.0, 1.0), (8, 2.5, 2)])
+def test_size_mask(database, room_size):
+    # same as ObjectSelector.check_object_size before the table
+    asset_ids = [uid for uid in database if uid != "broken"]
+    table = AssetTable(database, asset_ids)
+    tolerance = 0.8
+
+    expected = []
+    for uid in asset_ids:
+        size = get_size(database[uid])
+        if size[2] > size[0]:
+            size = [size[2], size[1], size[0]]
+        expected.append(
+            size[0] <= room_size[0] * tolerance
+            and size[1] <= room_size[1] * tolerance
+            and size[2] <= room_size[2] * tolerance
+            and size[0] * size[2] <= room_size[0] * room_size[2] * 0.5
+        )
+    assert table.size_mask(room_size, tolerance).tolist() == expected
+
+
+def test_thin_mask(database):
+    # same as ObjectSelector.check_thin_object before the table
+    asset_ids = [uid for uid in database if uid != "broken"]
+    table = AssetTable(database, asset_ids)
+
+    expected = []
+    for uid in asset_ids:
+        size = get_size(database[uid])
+        expected.append(size[2] <= min(size[0], size[1]) * 3)
+    assert table.thin_mask(3).tolist() == expected
+
+
+def test_size_difference(database):
+    # same as ObjathorRetriever.compute_size_difference before the table
+    asset_ids = [uid for uid in database if uid != "broken"]
+    table = AssetTable(database, asset_ids)
+    target_size = (120, 45.5, 80)
+
+    candidate_sizes = [
+        sorted(dimension * 100 for dimension in get_size(database[uid]))
+        for uid in asset_ids
+    ]
+    candidate_sizes = torch.tensor(candidate_sizes)
+    size_difference = (
+        abs(candidate_sizes - torch.tensor(sorted(target_size))).mean(axis=1) / 100
+    )
+
+    rows = np.arange(len(asset_ids))
+    assert table.size_difference(rows, target_size).tolist() == size_difference.tolist()
+
+
+def test_used_mask(database):
+    asset_ids = list(database)
+    table = AssetTable(database, asset_ids)
+
+    used_assets = ["asset-3", "asset-10", "not-in-the-table"]
+    mask = table.used_mask(used_assets)
+    assert [asset_ids[row] for row in np.flatnonzero(mask)] == ["asset-3", "asset-10"]
+
+
+def test_from_saved_columns(database, tmp_path):
+    # the feature store saves the columns and loads them memory-mapped
+    asset_ids = list(database)
+    table = AssetTable(database, asset_ids)
+    columns = {}
+    for name, column in table.get_columns().items():
+        np.save(str(tmp_path / f"{name}.npy"), column)
+        columns[name] = np.load(str(tmp_path / f"{name}.npy"), mmap_mode="r")
+    loaded = AssetTable.from_columns(asset_ids, columns, table.categories)
+
+    predicate = lambda category: "door" in category.lower()
+    assert loaded.category_mask(predicate).tolist() == (
+        table.category_mask(predicate).tolist()
+    )
+    assert loaded.size_mask((4.0, 3.0, 5.0), 0.8).tolist() == (
+        table.size_mask((4.0, 3.0, 5.0), 0.8).tolist()
+    )
+    assert (
+        loaded.used_mask(["asset-3"]).tolist() == table.used_mask(["asset-3"]).tolist()
+    )
+    assert loaded.get_bbox_dims("asset-7") == table.get_bbox_dims("asset-7")
+    rows = np.arange(len(asset_ids))
+    assert loaded.size_difference(rows, (120, 45.5, 80)).tolist() == (
+        table.size_difference(rows, (120, 45.5, 80)).tolist()
+    )
@@ -0,0 +1,134 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from ai2holodeck.generation import floor_objects, wall_objects
+from ai2holodeck.generation.floor_objects import FloorObjectGenerator
+from ai2holodeck.generation.wall_objects import WallObjectGenerator
+
+CONSTRAINT_PLAN = """sofa-0 | edge
+coffee table-0 | middle | in front of, sofa-0 | near, sofa-0
+armchair-0 | edge | near, coffee table-0
+painting-0 | above, sofa-0 | 150
+clock-0 | N/A | 180"""
+
+
+class FakeLLM:
+    # the same plan for every prompt, each generator only parses its own objects
+    def invoke(self, messages):
+        return SimpleNamespace(content=CONSTRAINT_PLAN)
+
+    async def ainvoke(self, messages):
+        # the rooms wait for their responses at the same time
+        await asyncio.sleep(0.05)
+        return SimpleNamespace(content=CONSTRAINT_PLAN)
+
+
+def get_asset(x, y, z):
+    return {"assetMetadata": {"boundingBox": {"x": x, "y": y, "z": z}}}
+
+
+DATABASE = {
+    "sofa": get_asset(2.0, 0.8, 0.9),
+    "coffee-table": get_asset(1.0, 0.4, 0.6),
+    "armchair": get_asset(0.8, 0.9, 0.8),
+    "painting": get_asset(1.0, 0.7, 0.05),
+    "clock": get_asset(0.4, 0.4, 0.05),
+}
+
+
+def get_scene():
+    rooms = []
+    for i, (room_x, room_z) in enumerate([(5, 4), (6, 4), (4, 5)]):
+        vertices = [(0, 0), (0, room_z), (room_x, room_z), (room_x, 0)]
+        rooms.append(
+            {
+                "id": f"room-{i}",
+                "roomType": f"living room {i}",
+                "vertices": vertices,
+                "floorPolygon": [{"x": x, "y": 0, "z": z} for x, z in vertices],
+            }
+        )
+    selected_objects = {
+        room["roomType"]: {
+            "floor": [
+                ("sofa-0", "sofa"),
+                ("coffee table-0", "coffee-table"),
+                ("armchair-0", "armchair"),
+            ],
+            "wall": [("painting-0", "painting"), ("clock-0", "clock")],
+        }
+        for room in rooms
+    }
+    return {
+        "rooms": rooms,
+        "doors": [],
+        "windows": [],
+        "open_walls": [],
+        "wall_height": 2.7,
+        "selected_objects": selected_objects,
+    }
+
+
+@pytest.fixture
+def solve_times(monkeypatch):
+    # the (start, end) of every floor and wall solve
+    times = {"floor": [], "wall": []}
+
+    def record(kind, solve):
+        def timed_solve(*args):
+            start = time.perf_counter()
+            result = solve(*args)
+            times[kind].append((start, time.perf_counter()))
+            return result
+
+        return timed_solve
+
+    monkeypatch.setattr(
+        floor_objects,
+        "solve_floor_layout",
+        record("floor", floor_objects.solve_floor_layout),
+    )
+    get_solution = wall_objects.DFS_Solver_Wall.get_solution
+    monkeypatch.setattr(
+        wall_objects.DFS_Solver_Wall,
+        "get_solution",
+        lambda solver, *args: record("wall", get_solution)(solver, *args),
+    )
+    return times
+
+
+def check_turns(times):
+    times = sorted(times)
+    for (_, end), (start, _) in zip(times, times[1:]):
+        assert end <= start
+
+
+def test_async_solves_take_turns(solve_times):
+    retriever = SimpleNamespace(database=DATABASE)
+    floor_generator = FloorObjectGenerator(retriever, FakeLLM())
+    wall_generator = WallObjectGenerator(retriever, FakeLLM())
+
+    scene = get_scene()
+    floor_placements = floor_generator.generate_objects(scene)
+    async_floor_placements = asyncio.run(floor_generator.generate_objects_async(scene))
+    # the seeded searches of the rooms get their full budget either way
+    assert async_floor_placements == floor_placements
+    assert len(floor_placements) == 9
+
+    scene["floor_objects"] = floor_placements
+    async_wall_placements = asyncio.run(
+        wall_generator.generate_wall_objects_async(scene)
+    )
+    assert {placement["id"] for placement in async_wall_placements} == {
+        f"{object_name} (room-{i})"
+        for object_name in ["painting-0", "clock-0"]
+        for i in range(3)
+    }
+
+    assert len(solve_times["floor"]) == 6 and len(solve_times["wall"]) == 3
+    # the rooms of one house wait for their prompts together, but solve one by one
+    check_turns(solve_times["floor"][3:])
+    check_turns(solve_times["wall"])
@@ -0,0 +1,102 @@
+import copy
+import random
+
+import pytest
+from shapely.geometry import Polygon
+
+from ai2holodeck.generation.constraint_scoring import ConstraintScorer
+from ai2holodeck.generation.floor_objects import DFS_Solver_Floor
+
+CONSTRAINTS = [
+    ("relative", "left of"),
+    ("relative", "right of"),
+    ("relative", "in front of"),
+    ("relative", "behind"),
+    ("relative", "side of"),
+    ("distance", "near"),
+    ("distance", "far"),
+    ("direction", "face to"),
+    ("direction", "face same as"),
+    ("direction", "face opposite to"),
+    ("alignment", "center aligned"),
+]
+
+
+def get_solutions(obj_dim):
+    # grid solutions of a room, and the same moved against the walls like the
+    # edge solutions the scorer gets as well
+    room_poly = Polygon(
+        [(0, 0), (0, 700), (500, 700), (500, 300), (800, 300), (800, 0)]
+    )
+    solver = DFS_Solver_Floor(grid_size=25)
+    grid_points = solver.create_grids(room_poly)
+    solutions = solver.get_all_solutions(room_poly, grid_points, obj_dim)
+    edge_solutions = solver.place_edge(room_poly, copy.deepcopy(solutions), obj_dim)
+    return solver, solutions + edge_solutions
+
+
+def get_targets(solutions):
+    rng = random.Random(0)
+    targets = []
+    # placed objects are solutions of the objects before
+    for solution in rng.sample(solutions, 4):
+        targets.append(copy.deepcopy(solution))
+    # targets that aren't boxes, the shapely path of the scorer
+    for rotation in [0, 90, 180, 270]:
+        coords = [(200, 150), (320, 180.5), (300, 260), (190, 240)]
+        targets.append([(250, 210), rotation, coords, 1])
+        coords = [
+            (400, 100),
+            (400, 200),
+            (450, 200),
+            (450, 150),
+            (520, 150),
+            (520, 100),
+        ]
+        targets.append([(460, 150), rotation, coords, 1])
+    return targets
+
+
+def get_expected(solver, constraint_type, constraint, target_object, solutions):
+    # the place_* method of the solver, on solutions that start at a score of 0
+    func_dict = {
+        "relative": solver.place_relative,
+        "distance": solver.place_distance,
+        "direction": solver.place_face,
+        "alignment": solver.place_alignment_center,
+    }
+    solutions = copy.deepcopy(solutions)
+    for solution in solutions:
+        solution[-1] = 0
+    valid_solutions = func_dict[constraint_type](constraint, target_object, solutions)
+    valid_ids = {id(solution) for solution in valid_solutions}
+    valid = [id(solution) in valid_ids for solution in solutions]
+    scores = [solution[-1] for solution in solutions]
+    return valid, scores
+
+
+@pytest.mark.parametrize("obj_dim", [(100, 50), (173.5, 41.25)])
+@pytest.mark.parametrize("constraint_type,constraint", CONSTRAINTS)
+def test_scores_match_place_methods(obj_dim, constraint_type, constraint):
+    solver, solutions = get_solutions(obj_dim)
+    scorer = ConstraintScorer(solutions, solver.grid_size, solver.constraint_bouns)
+
+    for target_object in get_targets(solutions):
+        valid, scores = scorer.get_scores(constraint_type, constraint, target_object)
+        expected_valid, expected_scores = get_expected(
+            solver, constraint_type, constraint, target_object, solutions
+        )
+        assert valid.tolist() == expected_valid
+        assert scores.tolist() == expected_scores
+
+
+def test_distances_match_shapely():
+    _, solutions = get_solutions((100, 50))
+    scorer = ConstraintScorer(solutions, 25, 0.2)
+
+    for target_object in get_targets(solutions):
+        target_poly = Polygon(target_object[2])
+        expected = [
+            target_poly.distance(Polygon(solution[2])) for solution in solutions
+        ]
+        assert scorer.get_distances(target_object[2]).tolist() == expected
@@ -0,0 +1,106 @@
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+
+from ai2holodeck.generation.embedding_cache import EmbeddingCache
+
+
+class FakeEncoder:
+    # a vector per text that depends on the model, records the batches it encodes
+    def __init__(self, scale=1.0):
+        self.scale = scale
+        self.batches = []
+
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        return torch.stack(
+            [
+                self.scale * torch.tensor([len(text), sum(map(ord, text))])
+                for text in texts
+            ]
+        ).float()
+
+
+def test_hits_and_misses():
+    cache = EmbeddingCache()
+    encoder = FakeEncoder()
+    vectors = cache.encode("clip", ["a sofa", "a lamp", "a sofa"], encoder)
+    assert torch.equal(vectors, FakeEncoder()(["a sofa", "a lamp", "a sofa"]))
+    # duplicates are encoded once
+    assert encoder.batches == [["a sofa", "a lamp"]]
+
+    # the tokenizers ignore the whitespace, so the cache does too
+    vectors = cache.encode("clip", ["  a   sofa ", "a chair"], encoder)
+    assert torch.equal(vectors, FakeEncoder()(["a sofa", "a chair"]))
+    assert encoder.batches[1] == ["a chair"]
+    assert cache.stats() == {
+        "size": 3,
+        "hits": 2,
+        "disk_hits": 0,
+        "misses": 3,
+        "hit_rate": 0.4,
+    }
+
+
+def test_model_name_keying():
+    cache = EmbeddingCache()
+    clip, sbert = FakeEncoder(), FakeEncoder(scale=2.0)
+    clip_vectors = cache.encode("clip", ["a sofa"], clip)
+    sbert_vectors = cache.encode("sbert", ["a sofa"], sbert)
+    assert not torch.equal(clip_vectors, sbert_vectors)
+    assert len(sbert.batches) == 1
+
+    assert torch.equal(cache.encode("clip", ["a sofa"], clip), clip_vectors)
+    assert torch.equal(cache.encode("sbert", ["a sofa"], sbert), sbert_vectors)
+    assert len(clip.batches) == len(sbert.batches) == 1
+
+
+def test_least_recently_used_are_evicted():
+    cache = EmbeddingCache(max_size=3)
+    encoder = FakeEncoder()
+    cache.encode("clip", ["a", "b", "c"], encoder)
+    # reading the oldest makes it the most recently used
+    cache.encode("clip", ["a"], encoder)
+    cache.encode("clip", ["d"], encoder)
+    assert list(cache.memory) == [("clip", "c"), ("clip", "a"), ("clip", "d")]
+
+    encoder.batches = []
+    cache.encode("clip", ["a", "b", "c", "d"], encoder)
+    assert encoder.batches == [["b"]]
+    assert len(cache.memory) == 3
+
+
+def test_sqlite_round_trip(tmp_path):
+    cache_path = str(tmp_path / "cache" / "embeddings.sqlite")
+    encoder = FakeEncoder()
+    vectors = EmbeddingCache(cache_path=cache_path).encode(
+        "clip", ["a sofa", "a lamp"], encoder
+    )
+
+    # a new process reads the vectors from disk, only for the same model
+    cache = EmbeddingCache(cache_path=cache_path)
+    assert torch.equal(
+        cache.encode("clip", ["a lamp", "a sofa"], encoder), vectors[[1, 0]]
+    )
+    assert len(encoder.batches) == 1
+    assert cache.stats()["disk_hits"] == 2
+    cache.encode("sbert", ["a sofa"], encoder)
+    assert encoder.batches[1] == ["a sofa"]
+
+    # the generators are pickled for the process pool
+    cache = pickle.loads(pickle.dumps(cache))
+    assert cache.connection is not None
+    assert torch.equal(cache.encode("clip", ["a sofa"], encoder), vectors[:1])
+    assert len(encoder.batches) == 2
+
+
+def test_counters_from_threads():
+    cache = EmbeddingCache()
+    encoder = FakeEncoder()
+    texts = [f"object {i}" for i in range(10)]
+    cache.encode("clip", texts, encoder)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda _: cache.encode("clip", texts, encoder), range(200)))
+    stats = cache.stats()
+    assert stats["misses"] == 10 and stats["hits"] == 2000
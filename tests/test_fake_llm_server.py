@@ -0,0 +1,131 @@
+import asyncio
+import json
+import os
+import re
+import sys
+
+import pytest
+
+pytest.importorskip("fastapi")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api_server"))
+
+import fake_llm_server
+from ai2holodeck.generation import prompts
+
+ROOM_SIZE = "400cm in length, 500cm in width, 300cm in height"
+
+# every prompt template the pipeline sends, filled in the way its generator does
+OBJECT_SELECTION_PROMPT = (
+    prompts.object_selection_prompt_new_1.replace("INPUT", "a living room")
+    .replace("ROOM_TYPE", "living room")
+    .replace("ROOM_SIZE", ROOM_SIZE)
+    .replace("REQUIREMENTS", "N/A")
+)
+PROMPTS = [
+    (
+        "floor_plan",
+        prompts.floor_plan_prompt.format(
+            input="a house with a kitchen and a bedroom", additional_requirements="N/A"
+        ),
+    ),
+    ("wall_height", prompts.wall_height_prompt.format(input="a living room")),
+    (
+        "doorway",
+        prompts.doorway_prompt.format(
+            input="a house",
+            rooms="living room, kitchen",
+            room_sizes="living room: 4 m x 5 m x 3 m\nkitchen: 3 m x 4 m x 3 m\n",
+            room_pairs="(exterior, living room), (living room, kitchen)",
+            additional_requirements="N/A",
+        ),
+    ),
+    (
+        "window",
+        prompts.window_prompt.format(
+            input="a house",
+            walls="living room: west, 400 cm; north, 500 cm; \n",
+            wall_height=300,
+            additional_requirements="N/A",
+        ),
+    ),
+    ("object_selection", OBJECT_SELECTION_PROMPT),
+    (
+        "object_reselection",
+        prompts.object_selection_prompt_new_2.format(
+            object_selection_prompt_new_1=OBJECT_SELECTION_PROMPT,
+            object_selection_1=fake_llm_server.respond(OBJECT_SELECTION_PROMPT)[1],
+            room="living room",
+        ),
+    ),
+    (
+        "floor_constraints",
+        prompts.object_constraints_prompt.format(
+            room_type="living room",
+            room_size="400 cm x 500 cm",
+            objects="sofa-0, coffee table-0, armchair-0, armchair-1",
+        ),
+    ),
+    (
+        "floor_baseline",
+        prompts.floor_baseline_prompt.format(
+            room_type="living room",
+            room_size="400 cm x 500 cm",
+            objects="sofa-0, coffee table-0",
+        ),
+    ),
+    (
+        "wall_constraints",
+        prompts.wall_object_constraints_prompt.format(
+            room_type="living room",
+            wall_height=300,
+            floor_objects="sofa-0, tv stand-0",
+            wall_objects="painting-0, clock-0",
+        ),
+    ),
+    (
+        "ceiling",
+        prompts.ceiling_selection_prompt.format(
+            input="a house", rooms="living room, kitchen", additional_requirements="N/A"
+        ),
+    ),
+]
+
+
+@pytest.mark.parametrize("kind,prompt", PROMPTS, ids=[kind for kind, _ in PROMPTS])
+def test_respond_recognises_every_prompt(kind, prompt):
+    response_kind, response = fake_llm_server.respond(prompt)
+    assert response_kind == kind
+    assert response and response != "N/A"
+
+    # the same prompt always gets the same answer
+    assert fake_llm_server.respond(prompt) == (response_kind, response)
+
+
+def test_respond_formats():
+    responses = {kind: fake_llm_server.respond(prompt)[1] for kind, prompt in PROMPTS}
+
+    assert 2.0 <= float(responses["wall_height"].split("\n")[0]) <= 4.5
+
+    for line in responses["floor_plan"].strip().split("\n"):
+        assert len(line.split("|")) == 4
+
+    layout = re.findall(r"```(.*?)```", responses["floor_baseline"], re.DOTALL)[0]
+    layout = json.loads(re.sub(r"^json", "", layout, flags=re.MULTILINE))
+    assert [placement["object_name"] for placement in layout] == [
+        "sofa-0",
+        "coffee table-0",
+    ]
+
+
+def test_unknown_prompts_are_counted(caplog):
+    assert fake_llm_server.respond("Tell me a joke.") == ("unknown", "N/A")
+    assert "Unknown prompt" in caplog.text
+
+    unknown_prompts = asyncio.run(fake_llm_server.get_stats())["unknown_prompts"]
+    request = fake_llm_server.ChatCompletionRequest(
+        messages=[fake_llm_server.ChatMessage(role="user", content="Tell me a joke.")]
+    )
+    response = asyncio.run(fake_llm_server.chat_completions(request))
+    assert response["choices"][0]["message"]["content"] == "N/A"
+    stats = asyncio.run(fake_llm_server.get_stats())
+    assert stats["unknown_prompts"] == unknown_prompts + 1
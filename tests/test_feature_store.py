@@ -0,0 +1,145 @@
+import os
+
+import compress_json
+import compress_pickle
+import numpy as np
+import pytest
+import torch
+import torch.nn.functional as F
+
+from ai2holodeck.generation import feature_store
+from ai2holodeck.generation.asset_table import AssetTable
+
+
+def make_database(uids, category):
+    return {
+        uid: {
+            "annotations": {
+                "category": category,
+                "onFloor": i % 2 == 0,
+                "onWall": i % 3 == 0,
+                "onCeiling": False,
+                "onObject": i == 1,
+            },
+            "assetMetadata": {
+                "boundingBox": {"x": 1.0 + i, "y": 0.5, "z": 0.25},
+                "secondaryProperties": ["CanBreak"] if i == 2 else [],
+            },
+        }
+        for i, uid in enumerate(uids)
+    }
+
+
+@pytest.fixture
+def sources(tmp_path, monkeypatch):
+    # small stand-ins for the objathor and thor annotations and features
+    rng = np.random.default_rng(0)
+    paths = {}
+    for name, num_assets in [("objathor", 5), ("thor", 3)]:
+        features_dir = tmp_path / name
+        features_dir.mkdir()
+        uids = [f"{name}-{i}" for i in range(num_assets)]
+        annotations_path = str(tmp_path / f"{name}_annotations.json.gz")
+        compress_json.dump(make_database(uids, name), annotations_path)
+        compress_pickle.dump(
+            {
+                "uids": uids,
+                "img_features": rng.normal(size=(num_assets, 3, 8)).astype(np.float16),
+            },
+            str(features_dir / "clip_features.pkl"),
+        )
+        compress_pickle.dump(
+            {
+                "uids": uids,
+                "text_features": rng.normal(size=(num_assets, 6)).astype(np.float16),
+            },
+            str(features_dir / "sbert_features.pkl"),
+        )
+        paths[name] = (annotations_path, str(features_dir))
+
+    monkeypatch.setattr(
+        feature_store, "OBJATHOR_ANNOTATIONS_PATH", paths["objathor"][0]
+    )
+    monkeypatch.setattr(
+        feature_store, "HOLODECK_THOR_ANNOTATIONS_PATH", paths["thor"][0]
+    )
+    monkeypatch.setattr(feature_store, "OBJATHOR_FEATURES_DIR", paths["objathor"][1])
+    monkeypatch.setattr(feature_store, "HOLODECK_THOR_FEATURES_DIR", paths["thor"][1])
+    source_files = [paths["objathor"][0], paths["thor"][0]] + [
+        os.path.join(features_dir, f"{kind}_features.pkl")
+        for features_dir in [paths["objathor"][1], paths["thor"][1]]
+        for kind in ["clip", "sbert"]
+    ]
+    monkeypatch.setattr(feature_store, "SOURCE_FILES", source_files)
+    return source_files
+
+
+def load_original_features():
+    # what ObjathorRetriever computed from the source files before the store
+    database = {
+        **compress_json.load(feature_store.OBJATHOR_ANNOTATIONS_PATH),
+        **compress_json.load(feature_store.HOLODECK_THOR_ANNOTATIONS_PATH),
+    }
+    uids, clip_features, sbert_features = [], [], []
+    for features_dir in [
+        feature_store.OBJATHOR_FEATURES_DIR,
+        feature_store.HOLODECK_THOR_FEATURES_DIR,
+    ]:
+        clip = compress_pickle.load(os.path.join(features_dir, "clip_features.pkl"))
+        sbert = compress_pickle.load(os.path.join(features_dir, "sbert_features.pkl"))
+        uids += clip["uids"]
+        clip_features.append(clip["img_features"].astype(np.float32))
+        sbert_features.append(sbert["text_features"].astype(np.float32))
+
+    clip_features = torch.from_numpy(np.concatenate(clip_features, axis=0))
+    clip_features = F.normalize(clip_features, p=2, dim=-1)
+    sbert_features = torch.from_numpy(np.concatenate(sbert_features, axis=0))
+    return database, uids, clip_features, sbert_features
+
+
+def test_store_matches_source_features(sources, tmp_path):
+    store_dir = str(tmp_path / "store")
+    assert not feature_store.is_feature_store_fresh(store_dir)
+
+    feature_store.compile_feature_store(store_dir)
+    assert feature_store.is_feature_store_fresh(store_dir)
+
+    features = feature_store.load_feature_store(store_dir)
+    database, uids, clip_features, sbert_features = load_original_features()
+    assert features["uids"] == uids
+    assert features["database"] == database
+    assert torch.equal(features["clip_features"], clip_features)
+    assert torch.equal(features["sbert_features"], sbert_features)
+
+    # the asset table is read from memory-mapped columns
+    asset_table = features["asset_table"]
+    expected = AssetTable(database, uids)
+    assert asset_table.asset_ids == uids
+    assert asset_table.categories == expected.categories == ["objathor", "thor"]
+    for name, column in asset_table.get_columns().items():
+        assert isinstance(column, np.memmap)
+        assert column.dtype == getattr(expected, name).dtype
+        assert np.array_equal(column, getattr(expected, name))
+    assert asset_table.can_break.sum() == 2
+    assert asset_table.get_bbox_dims("thor-1") == {"x": 2.0, "y": 0.5, "z": 0.25}
+
+
+def test_store_is_stale_after_source_change(sources, tmp_path):
+    store_dir = str(tmp_path / "store")
+    feature_store.compile_feature_store(store_dir)
+
+    stat = os.stat(sources[0])
+    os.utime(sources[0], (stat.st_atime, stat.st_mtime + 10))
+    assert not feature_store.is_feature_store_fresh(store_dir)
+
+
+def test_store_is_stale_without_manifest(sources, tmp_path):
+    store_dir = str(tmp_path / "store")
+    feature_store.compile_feature_store(store_dir)
+
+    with open(os.path.join(store_dir, "manifest.json"), "w") as f:
+        f.write("{")
+    assert not feature_store.is_feature_store_fresh(store_dir)
+
+    os.remove(os.path.join(store_dir, "manifest.json"))
+    assert not feature_store.is_feature_store_fresh(store_dir)
@@ -0,0 +1,253 @@
+import copy
+import itertools
+import time
+
+import pytest
+from shapely.geometry import Polygon
+
+from ai2holodeck.generation.floor_objects import DFS_Solver_Floor
+from ai2holodeck.generation.milp_utils import (
+    M,
+    get_big_m,
+    get_identical_object_pairs,
+    solve_milp,
+)
+
+ROOM = Polygon([(0, 0), (0, 400), (500, 400), (500, 0)])
+INITIAL_STATE = {
+    "door-0": ((250, 25), 0, ((200, 0), (300, 0), (300, 50), (200, 50)), 1)
+}
+OBJECTS = [
+    ("sofa-0", (200, 90)),
+    ("tv stand-0", (150, 50)),
+    ("coffee table-0", (100, 60)),
+    ("armchair-0", (80, 80)),
+]
+CONSTRAINTS = {
+    "sofa-0": [{"type": "global", "constraint": "edge"}],
+    "tv stand-0": [
+        {"type": "global", "constraint": "edge"},
+        {"type": "direction", "constraint": "face to", "target": "sofa-0"},
+        {"type": "distance", "constraint": "far", "target": "sofa-0"},
+    ],
+    "coffee table-0": [
+        {"type": "global", "constraint": "middle"},
+        {"type": "relative", "constraint": "in front of", "target": "sofa-0"},
+        {"type": "distance", "constraint": "near", "target": "sofa-0"},
+        {"type": "alignment", "constraint": "center aligned", "target": "sofa-0"},
+    ],
+    "armchair-0": [
+        {"type": "global", "constraint": "edge"},
+        {"type": "distance", "constraint": "near", "target": "coffee table-0"},
+    ],
+}
+
+
+class CopyingSolver(DFS_Solver_Floor):
+    # DFS_Solver_Floor.dfs before the undo log, copies the placed objects and
+    # filters the grid points again at every step
+    def dfs(
+        self,
+        room_poly,
+        objects_list,
+        constraints,
+        grid_points,
+        placed_objects,
+        branch_factor,
+    ):
+        if len(objects_list) == 0:
+            self.solutions.append(placed_objects)
+            return placed_objects
+
+        object_name, object_dim = objects_list[0]
+        placements = self.get_possible_placements(
+            room_poly, object_dim, constraints[object_name], grid_points, placed_objects
+        )
+
+        if len(placements) == 0 and len(placed_objects) != 0:
+            self.solutions.append(placed_objects)
+
+        paths = []
+        if branch_factor > 1:
+            self.random.shuffle(placements)
+
+        for placement in placements[:branch_factor]:
+            placed_objects_updated = copy.deepcopy(placed_objects)
+            placed_objects_updated[object_name] = placement
+            grid_points_updated = self.remove_points(
+                grid_points, placed_objects_updated
+            )
+            paths.extend(
+                self.dfs(
+                    room_poly,
+                    objects_list[1:],
+                    constraints,
+                    grid_points_updated,
+                    placed_objects_updated,
+                    1,
+                )
+            )
+
+        return paths
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_dfs_matches_the_copying_search(seed):
+    solver = DFS_Solver_Floor(grid_size=25, random_seed=seed, max_duration=60)
+    solution = solver.get_solution(ROOM, OBJECTS, CONSTRAINTS, INITIAL_STATE)
+
+    reference = CopyingSolver(grid_size=25, random_seed=seed, max_duration=60)
+    reference.start_time = time.time()
+    grid_points = reference.create_grids(ROOM)
+    grid_points = reference.remove_points(grid_points, INITIAL_STATE)
+    reference.dfs(ROOM, OBJECTS, CONSTRAINTS, grid_points, dict(INITIAL_STATE), 30)
+
+    # every partial and full layout of the search, in the same order
+    assert solver.solutions == reference.solutions
+    assert solution == reference.get_max_solution(reference.solutions)
+    assert list(solution) == ["door-0"] + [name for name, _ in OBJECTS]
+
+
+def check_layout(solution):
+    # inside the room, up to the 4.5 place_edge pushes objects into the wall, and
+    # without overlaps, the door included
+    boxes = {name: Polygon(placement[2][:4]) for name, placement in solution.items()}
+    room = ROOM.buffer(5)
+    assert all(room.contains(obj_box) for obj_box in boxes.values())
+    for name_1, name_2 in itertools.combinations(boxes, 2):
+        assert not boxes[name_1].intersects(boxes[name_2]), (name_1, name_2)
+
+
+@pytest.mark.parametrize("max_duration", [0.1, 0.5, 10])
+def test_beam_search_is_feasible_within_budget(max_duration):
+    solver = DFS_Solver_Floor(
+        grid_size=25, max_duration=max_duration, search="beam", beam_width=8
+    )
+    start_time = time.time()
+    solution = solver.get_solution(ROOM, OBJECTS, CONSTRAINTS, INITIAL_STATE)
+    # a step that started before the deadline still finishes
+    assert time.time() - start_time < max_duration + 1
+
+    # the best layout found so far, at least the first object fits in time
+    assert solver.solutions == [solution]
+    assert list(solution)[:2] == ["door-0", "sofa-0"]
+    assert solution["door-0"] == INITIAL_STATE["door-0"]
+    check_layout(solution)
+    if max_duration == 10:
+        assert list(solution) == ["door-0"] + [name for name, _ in OBJECTS]
+
+
+MILP_CONSTRAINTS = {
+    "sofa-0": [{"type": "global", "constraint": "edge"}],
+    "coffee table-0": [
+        {"type": "global", "constraint": "middle"},
+        {"type": "distance", "constraint": "near", "target": "sofa-0"},
+        {"type": "relative", "constraint": "in front of", "target": "sofa-0"},
+    ],
+    "chair-0": [{"type": "global", "constraint": "edge"}],
+    "chair-1": [{"type": "global", "constraint": "edge"}],
+}
+
+
+def get_milp_room(room_size):
+    # a rectangular room with a door in the middle of the bottom wall
+    room_x, room_y = room_size
+    room_poly = Polygon([(0, 0), (0, room_y), (room_x, room_y), (room_x, 0)])
+    door = [
+        (room_x / 2 - 50, 0),
+        (room_x / 2 + 50, 0),
+        (room_x / 2 + 50, 50),
+        (room_x / 2 - 50, 50),
+    ]
+    return room_poly, {"door-0": ((room_x / 2, 25), 0, door, 1)}
+
+
+def solve_milp_layout(solver, room_poly, objects_list, placed_objects):
+    problem, variables_dict = solver.get_milp_problem(
+        room_poly, objects_list, MILP_CONSTRAINTS, placed_objects
+    )
+    objective = solve_milp(problem)
+    layout = {}
+    for object_name, (x_size, y_size) in objects_list:
+        # like milp_dfs, a rotation the problem doesn't use has no value
+        x, y, rotate_180, rotate_90 = [
+            0 if variable.value is None else round(variable.value.item(), 4)
+            for variable in variables_dict[object_name][:4]
+        ]
+        if round(rotate_90):
+            x_size, y_size = y_size, x_size
+        layout[object_name] = (
+            (x, y, round(rotate_180), round(rotate_90)),
+            Polygon(
+                [
+                    (x - x_size / 2, y - y_size / 2),
+                    (x + x_size / 2, y - y_size / 2),
+                    (x + x_size / 2, y + y_size / 2),
+                    (x - x_size / 2, y + y_size / 2),
+                ]
+            ),
+        )
+    return problem, objective, layout
+
+
+@pytest.mark.parametrize("room_size", [(500, 400), (700, 500)])
+def test_milp_template_matches_a_fresh_problem(room_size):
+    room_poly, placed_objects = get_milp_room(room_size)
+
+    solver = DFS_Solver_Floor(grid_size=25)
+    template = None
+    # other sizes change the parameters of the compiled problem, the big-M included
+    for object_dims in [
+        [(180, 85), (100, 50), (50, 50), (50, 50)],
+        [(160, 80), (90, 45), (60, 55), (60, 55)],
+    ]:
+        objects_list = list(zip(MILP_CONSTRAINTS, object_dims))
+        problem, objective, layout = solve_milp_layout(
+            solver, room_poly, objects_list, placed_objects
+        )
+        if template is None:
+            template = problem
+        assert problem is template
+
+        fresh_problem, fresh_objective, fresh_layout = solve_milp_layout(
+            DFS_Solver_Floor(grid_size=25), room_poly, objects_list, placed_objects
+        )
+        assert fresh_problem is not template
+        assert objective == pytest.approx(fresh_objective)
+        assert [placement for placement, _ in layout.values()] == [
+            placement for placement, _ in fresh_layout.values()
+        ]
+
+        boxes = [obj_box for _, obj_box in layout.values()]
+        boxes.append(Polygon(placed_objects["door-0"][2]))
+        for obj_box in boxes:
+            assert room_poly.buffer(1e-3).contains(obj_box)
+        for box_1, box_2 in itertools.combinations(boxes, 2):
+            assert box_1.intersection(box_2).area < 1e-3
+
+    assert len(solver.milp_templates) == 1
+
+
+@pytest.mark.parametrize("room_size", [(500, 400), (700, 500)])
+def test_milp_big_m_and_symmetry_breaking(room_size):
+    room_poly, placed_objects = get_milp_room(room_size)
+    object_dims = [(180, 85), (100, 50), (50, 50), (50, 50)]
+    objects_list = list(zip(MILP_CONSTRAINTS, object_dims))
+    # only the two chairs are interchangeable, the sofa is a target
+    assert get_identical_object_pairs(objects_list, MILP_CONSTRAINTS) == [
+        ("chair-0", "chair-1")
+    ]
+
+    solver = DFS_Solver_Floor(grid_size=25)
+    problem, objective, layout = solve_milp_layout(
+        solver, room_poly, objects_list, placed_objects
+    )
+    [(_, _, (_, _, big_m))] = solver.milp_templates.values()
+    assert big_m.value == get_big_m(room_poly.bounds, object_dims + [(100, 50)])
+    assert big_m.value < max(room_size) * 4
+    # the copies are ordered along x
+    assert layout["chair-0"][0][0] <= layout["chair-1"][0][0]
+
+    # the per-room big-M cuts off no layout the global one allows
+    big_m.value = M
+    assert solve_milp(problem) == pytest.approx(objective)
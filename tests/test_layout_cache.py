@@ -0,0 +1,138 @@
+import json
+import os
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from shapely.geometry import Polygon
+
+from ai2holodeck.generation.layout_cache import LayoutCache
+
+
+def get_solver_args(size_buffer=10):
+    # the inputs FloorObjectGenerator hashes, built the way it builds them
+    room_poly = Polygon([(0, 0), (0, 400), (600, 400), (600, 0)])
+    objects_list = [
+        ("sofa-0", (np.float64(200.5) + size_buffer, 90.0 + size_buffer)),
+        ("coffee table-0", (120.0 + size_buffer, 60.0 + size_buffer)),
+    ]
+    constraints = {
+        "sofa-0": [{"type": "global", "constraint": "edge"}],
+        "coffee table-0": [
+            {"type": "global", "constraint": "middle"},
+            {"type": "relative", "constraint": "in front of", "target": "sofa-0"},
+        ],
+    }
+    initial_state = {
+        "door-0": ((300, 0), 0, ((250, 0), (350, 0), (350, 50), (250, 50)), 1)
+    }
+    return (25, room_poly, objects_list, constraints, initial_state, True, "dfs")
+
+
+PLACEMENTS = [
+    {
+        "assetId": "asset-0",
+        "id": "sofa-0 (living room)",
+        "kinematic": True,
+        "position": {"x": 1.25, "y": 0.4, "z": 0.5},
+        "rotation": {"x": 0, "y": 180, "z": 0},
+        "material": None,
+        "roomId": "living room",
+        "vertices": [(100, 5), (300, 5), (300, 95), (100, 95)],
+        "object_name": "sofa-0",
+    }
+]
+
+
+def test_round_trip(tmp_path):
+    cache = LayoutCache(str(tmp_path))
+    key = cache.get_key("floor", get_solver_args(), 1, {"sofa-0": "asset-0"})
+    assert cache.get(key) is None
+
+    cache.put(key, PLACEMENTS)
+    # tuples come back as lists, like the placements of a scene json
+    assert cache.get(key) == json.loads(json.dumps(PLACEMENTS))
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+
+
+def test_key_stability():
+    key = LayoutCache.get_key("floor", get_solver_args(), 1, "living room")
+
+    # equal inputs built again, with a different dict order and plain floats
+    solver_args = list(get_solver_args())
+    solver_args[2] = [
+        ("sofa-0", (210.5, 100.0)),
+        ("coffee table-0", (130.0, 70.0)),
+    ]
+    solver_args[3] = dict(reversed(list(solver_args[3].items())))
+    assert LayoutCache.get_key("floor", tuple(solver_args), 1, "living room") == key
+
+    # anything the solver sees changes the key
+    assert LayoutCache.get_key("wall", get_solver_args(), 1, "living room") != key
+    assert LayoutCache.get_key("floor", get_solver_args(), 2, "living room") != key
+    assert LayoutCache.get_key("floor", get_solver_args(11), 1, "living room") != key
+    solver_args = list(get_solver_args())
+    solver_args[1] = Polygon([(0, 0), (0, 400), (601, 400), (601, 0)])
+    assert LayoutCache.get_key("floor", tuple(solver_args), 1, "living room") != key
+
+
+def test_replay_in_a_new_instance(tmp_path):
+    key = LayoutCache.get_key("floor", get_solver_args(), 1, "living room")
+    LayoutCache(str(tmp_path)).put(key, PLACEMENTS)
+
+    # a rerun of the same room reads the layout of the first run
+    cache = LayoutCache(str(tmp_path))
+    key = cache.get_key("floor", get_solver_args(), 1, "living room")
+    assert cache.get(key) == json.loads(json.dumps(PLACEMENTS))
+    assert cache.stats()["hits"] == 1
+
+
+def test_corrupt_file_is_a_miss(tmp_path):
+    cache = LayoutCache(str(tmp_path))
+    key = cache.get_key("floor", get_solver_args())
+    with open(cache.get_path(key), "w") as f:
+        f.write('[{"assetId": ')
+    assert cache.get(key) is None
+    assert cache.stats()["misses"] == 1
+
+    # a value that isn't json is not cached
+    cache.put(key, [object()])
+    assert cache.get(key) is None
+    assert [name for name in os.listdir(str(tmp_path)) if name.endswith(".tmp")] == []
+
+
+def test_least_recently_used_are_evicted(tmp_path):
+    placements = [{"vertices": list(range(100))}]
+    entry_bytes = len(json.dumps(placements))
+    cache = LayoutCache(str(tmp_path), max_bytes=3 * entry_bytes)
+
+    keys = [cache.get_key("floor", i) for i in range(4)]
+    for i, key in enumerate(keys[:3]):
+        cache.put(key, placements)
+        os.utime(cache.get_path(key), (i, i))
+
+    # reading the oldest makes it the most recently used
+    assert cache.get(keys[0]) == placements
+    cache.put(keys[3], placements)
+    assert [cache.get(key) is not None for key in keys] == [True, False, True, True]
+
+
+def test_pickle(tmp_path):
+    cache = LayoutCache(str(tmp_path))
+    key = cache.get_key("wall", get_solver_args())
+    cache.put(key, PLACEMENTS)
+
+    # the generators are pickled for the process pool
+    cache = pickle.loads(pickle.dumps(cache))
+    assert cache.get(key) is not None
+    cache.put(cache.get_key("wall", 1), PLACEMENTS)
+    assert len(os.listdir(str(tmp_path))) == 2
+
+
+def test_counters_from_threads(tmp_path):
+    cache = LayoutCache(str(tmp_path))
+    keys = [cache.get_key("floor", i) for i in range(2)]
+    cache.put(keys[0], PLACEMENTS)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda i: cache.get(keys[i % 2]), range(400)))
+    assert cache.stats() == {"hits": 200, "misses": 200, "hit_rate": 0.5}
@@ -0,0 +1,186 @@
+import asyncio
+import pickle
+
+import pytest
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from ai2holodeck.generation import llm_cache
+from ai2holodeck.generation.async_llm import run_llm_steps
+from ai2holodeck.generation.llm_cache import CachedLLM, LLMReplayMiss, LLMResponseCache
+
+
+class Response:
+    def __init__(self, content):
+        self.content = content
+
+
+class FakeLLM:
+    # counts the prompts it answers, every answer is different
+    def __init__(self, model_name="gpt-4o-2024-05-13", temperature=0.7):
+        self.model_name = model_name
+        self.temperature = temperature
+        self.max_tokens = 2048
+        self.calls = 0
+        self.kwargs = []
+
+    def invoke(self, messages, **kwargs):
+        self.calls += 1
+        self.kwargs.append(kwargs)
+        return Response(f"answer {self.calls} to {CachedLLM.get_prompt(messages)}")
+
+    async def ainvoke(self, messages, **kwargs):
+        return self.invoke(messages, **kwargs)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # the cache reads the time through time.time, moved by hand in the tests
+    now = [1000000.0]
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now[0])
+    return now
+
+
+def test_put_get(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "llm.sqlite"))
+    key = cache.get_key("gpt-4o-2024-05-13", 0.7, "a prompt")
+    assert key != cache.get_key("gpt-4o-2024-05-13", 0.0, "a prompt")
+    assert key != cache.get_key("gpt-4o-mini", 0.7, "a prompt")
+    assert cache.get(key) is None
+
+    cache.put(key, "gpt-4o-2024-05-13", 0.7, "a prompt", "a response")
+    assert cache.get(key) == "a response"
+    cache.put(key, "gpt-4o-2024-05-13", 0.7, "a prompt", "another response")
+    assert cache.get(key) == "another response"
+    assert cache.stats() == {"hits": 2, "misses": 1, "hit_rate": 2 / 3}
+
+
+def test_persistence(tmp_path):
+    cache_path = str(tmp_path / "cache" / "llm.sqlite")
+    cache = LLMResponseCache(cache_path)
+    key = cache.get_key("gpt-4o-2024-05-13", 0.7, "a prompt")
+    cache.put(key, "gpt-4o-2024-05-13", 0.7, "a prompt", "a response")
+
+    assert LLMResponseCache(cache_path).get(key) == "a response"
+    # the generators are pickled for the process pool
+    assert pickle.loads(pickle.dumps(cache)).get(key) == "a response"
+
+
+def test_ttl(tmp_path, clock):
+    cache = LLMResponseCache(str(tmp_path / "llm.sqlite"), ttl=3600)
+    key = cache.get_key("gpt-4o-2024-05-13", 0.7, "a prompt")
+    cache.put(key, "gpt-4o-2024-05-13", 0.7, "a prompt", "a response")
+
+    clock[0] += 3601
+    # replay still serves the expired entry, a normal lookup drops it
+    assert cache.get(key, expire=False) == "a response"
+    assert cache.get(key) is None
+    assert cache.get(key, expire=False) is None
+
+
+def test_max_entries(tmp_path, clock):
+    cache = LLMResponseCache(str(tmp_path / "llm.sqlite"), ttl=0, max_entries=3)
+    keys = [cache.get_key("gpt-4o-2024-05-13", 0.7, f"prompt {i}") for i in range(4)]
+    for i, key in enumerate(keys[:3]):
+        clock[0] += 1
+        cache.put(key, "gpt-4o-2024-05-13", 0.7, f"prompt {i}", f"response {i}")
+
+    # reading the oldest makes it the most recently used
+    clock[0] += 1
+    assert cache.get(keys[0]) == "response 0"
+    clock[0] += 1
+    cache.put(keys[3], "gpt-4o-2024-05-13", 0.7, "prompt 3", "response 3")
+    assert [cache.get(key) for key in keys] == [
+        "response 0",
+        None,
+        "response 2",
+        "response 3",
+    ]
+
+
+def test_cached_llm_sessions(tmp_path):
+    cache_path = str(tmp_path / "llm.sqlite")
+    messages = [SystemMessage(content="You are a designer."), HumanMessage("a room")]
+
+    model = FakeLLM()
+    llm = CachedLLM(model, LLMResponseCache(cache_path))
+    response = llm.invoke(messages).content
+    assert model.calls == 1
+    # attributes of the model are still there
+    assert llm.model_name == model.model_name and llm.max_tokens == 2048
+
+    # a new session gets the cached response
+    model = FakeLLM()
+    llm = CachedLLM(model, LLMResponseCache(cache_path))
+    assert llm.invoke(messages).content == response
+    assert (
+        asyncio.run(llm.ainvoke("another prompt")).content
+        == "answer 1 to another prompt"
+    )
+    assert model.calls == 1
+
+    # the same prompt again in the same session, e.g. a variant of the scene, is
+    # served from the cache as well
+    assert llm.invoke(messages).content == response
+    assert llm.invoke(messages).content == response
+    assert model.calls == 1
+
+    # a retry of an unusable response goes to the model and the new response
+    # replaces the cached one
+    retry_response = llm.invoke(messages, refresh=True).content
+    assert retry_response != response and model.calls == 2
+    assert llm.invoke(messages).content == retry_response
+    model = FakeLLM()
+    assert (
+        CachedLLM(model, LLMResponseCache(cache_path)).invoke(messages).content
+        == retry_response
+    )
+    assert model.calls == 0
+
+    # another temperature is another model
+    model = FakeLLM(temperature=0.0)
+    CachedLLM(model, LLMResponseCache(cache_path)).invoke(messages)
+    assert model.calls == 1
+
+
+def test_cached_llm_replay(tmp_path, clock):
+    cache_path = str(tmp_path / "llm.sqlite")
+    model = FakeLLM()
+    response = CachedLLM(model, LLMResponseCache(cache_path, ttl=3600)).invoke(
+        "a prompt"
+    )
+
+    # replay serves expired entries, retries included, and never calls the model
+    clock[0] += 7200
+    model = FakeLLM()
+    llm = CachedLLM(model, LLMResponseCache(cache_path, ttl=3600), replay=True)
+    assert llm.invoke("a prompt").content == response.content
+    assert llm.invoke("a prompt", refresh=True).content == response.content
+    with pytest.raises(LLMReplayMiss) as error:
+        asyncio.run(llm.ainvoke("another prompt"))
+    assert error.value.prompt == "another prompt"
+    assert model.calls == 0
+
+
+def test_steps_refresh_retries(tmp_path):
+    # the floor baseline steps send their prompt again when the layout can't be
+    # parsed, only that retry skips the cache
+    def steps():
+        responses = []
+        for attempt in range(3):
+            responses.append((yield ("a layout", attempt > 0)))
+        return responses
+
+    model = FakeLLM()
+    llm = CachedLLM(model, LLMResponseCache(str(tmp_path / "llm.sqlite")))
+    assert run_llm_steps(llm, steps()) == [
+        "answer 1 to human: a layout",
+        "answer 2 to human: a layout",
+        "answer 3 to human: a layout",
+    ]
+    assert run_llm_steps(llm, steps())[0] == "answer 3 to human: a layout"
+    assert model.calls == 5
+
+    # without the cache the flag isn't passed on to the model
+    model = FakeLLM()
+    assert len(run_llm_steps(model, steps())) == 3
+    assert model.kwargs == [{}, {}, {}]
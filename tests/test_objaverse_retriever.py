@@ -0,0 +1,193 @@
+import numpy as np
+import pytest
+import torch
+import torch.nn.functional as F
+
+from ai2holodeck.generation import objaverse_retriever
+from ai2holodeck.generation.objaverse_retriever import ObjathorRetriever
+from ai2holodeck.generation.retrieval_index import IVFIndex
+
+# feature sizes of the real store, so the matrix products take the same paths
+NUM_ASSETS = 600
+CLIP_DIM, SBERT_DIM = 768, 768
+QUERIES = ["a sofa", "a lamp", "a red chair", "a painting", "a rug", "a bookshelf"]
+
+
+class FakeClip:
+    # text features per query, the tokenizer passes the queries through
+    def __init__(self, features):
+        self.features = features
+
+    def encode_text(self, queries):
+        return torch.stack([self.features[query] for query in queries])
+
+
+class FakeSbert:
+    def __init__(self, features):
+        self.features = features
+
+    def encode(self, queries, convert_to_tensor=True, show_progress_bar=False):
+        return torch.stack([self.features[query] for query in queries])
+
+
+@pytest.fixture
+def features():
+    generator = torch.Generator().manual_seed(0)
+    # the assets are spread around the query directions, so the clip scores cover
+    # the thresholds
+    query_clip = {
+        query: F.normalize(torch.randn(CLIP_DIM, generator=generator), dim=-1)
+        for query in QUERIES
+    }
+    query_sbert = {
+        query: torch.randn(SBERT_DIM, generator=generator) for query in QUERIES
+    }
+    directions = torch.stack(list(query_clip.values()))
+    weights = torch.rand(NUM_ASSETS, 3, len(QUERIES), generator=generator) ** 4
+    noise = torch.randn(NUM_ASSETS, 3, CLIP_DIM, generator=generator)
+    clip_features = F.normalize(weights @ directions + 0.02 * noise, dim=-1)
+    sbert_features = 0.05 * torch.randn(NUM_ASSETS, SBERT_DIM, generator=generator)
+    # equal assets score equal, some of them on both sides of a chunk boundary
+    for source, copy in [(3, 20), (99, 100), (255, 256), (13, 14), (13, 411)]:
+        clip_features[copy] = clip_features[source]
+        sbert_features[copy] = sbert_features[source]
+
+    uids = [f"asset-{i}" for i in range(NUM_ASSETS)]
+    database = {
+        uid: {
+            "annotations": {
+                "category": "chair",
+                "onFloor": True,
+                "onWall": False,
+                "onCeiling": False,
+                "onObject": False,
+            },
+            "assetMetadata": {"boundingBox": {"x": 1.0, "y": 0.5, "z": 0.25}},
+        }
+        for uid in uids
+    }
+    return {
+        "database": database,
+        "uids": uids,
+        "clip_features": clip_features,
+        "sbert_features": sbert_features,
+        "query_clip": query_clip,
+        "query_sbert": query_sbert,
+    }
+
+
+@pytest.fixture
+def retriever(features, monkeypatch):
+    monkeypatch.setattr(objaverse_retriever, "is_feature_store_fresh", lambda: True)
+    monkeypatch.setattr(objaverse_retriever, "load_feature_store", lambda: features)
+    return ObjathorRetriever(
+        FakeClip(features["query_clip"]),
+        None,
+        lambda queries: queries,
+        FakeSbert(features["query_sbert"]),
+        retrieval_threshold=28,
+    )
+
+
+def retrieve(retriever, queries, threshold=28):
+    # ObjathorRetriever.retrieve before the batched and chunked search
+    query_feature_clip = retriever.clip_model.encode_text(
+        retriever.clip_tokenizer(queries)
+    )
+    query_feature_clip = F.normalize(query_feature_clip, p=2, dim=-1)
+    clip_similarities = 100 * torch.einsum(
+        "ij, lkj -> ilk", query_feature_clip, retriever.clip_features
+    )
+    clip_similarities = torch.max(clip_similarities, dim=-1).values
+    query_feature_sbert = retriever.sbert_model.encode(
+        queries, convert_to_tensor=True, show_progress_bar=False
+    )
+    sbert_similarities = query_feature_sbert @ retriever.sbert_features.T
+    similarities = clip_similarities + sbert_similarities
+
+    threshold_indices = torch.where(clip_similarities > threshold)
+    unsorted_results = []
+    for query_index, asset_index in zip(*threshold_indices):
+        score = similarities[query_index, asset_index].item()
+        unsorted_results.append((retriever.asset_ids[asset_index], score))
+    return sorted(unsorted_results, key=lambda x: x[1], reverse=True)
+
+
+@pytest.mark.parametrize("chunk_size", [100, 256, NUM_ASSETS, 4096])
+def test_batch_matches_per_query_retrieve(retriever, chunk_size):
+    retriever.chunk_size = chunk_size
+    results = retriever.retrieve_batch(QUERIES)
+    for query, query_results in zip(QUERIES, results):
+        expected = retrieve(retriever, [query])
+        assert expected
+        assert query_results == expected
+
+    # and all queries in one list, as retrieve always returned them
+    expected = sum([retrieve(retriever, [query]) for query in QUERIES], [])
+    expected = sorted(expected, key=lambda x: x[1], reverse=True)
+    assert retriever.retrieve(QUERIES) == expected
+
+    # a threshold per query
+    thresholds = [0, 28, 50, -100, 28, 35]
+    results = retriever.retrieve_batch(QUERIES, thresholds)
+    for query, threshold, query_results in zip(QUERIES, thresholds, results):
+        assert query_results == retrieve(retriever, [query], threshold)
+
+
+@pytest.mark.parametrize("chunk_size", [100, 256, 4096])
+@pytest.mark.parametrize("top_k", [1, 3, 10, 100])
+def test_top_k_matches_full_results(retriever, chunk_size, top_k):
+    retriever.chunk_size = chunk_size
+    thresholds = [-100, 28, 0, 28, 10, -100]
+    full_results = retriever.retrieve_rows(QUERIES, thresholds)
+    top_results = retriever.retrieve_rows(QUERIES, thresholds, top_k=top_k)
+    for (rows, scores), (top_rows, top_scores) in zip(full_results, top_results):
+        # the same order, ties included
+        assert top_rows.tolist() == rows[:top_k].tolist()
+        assert top_scores.tolist() == scores[:top_k].tolist()
+
+
+def test_filters(retriever):
+    retriever.chunk_size = 100
+    mask = np.arange(NUM_ASSETS) % 3 != 0
+    results = retriever.retrieve_batch(QUERIES[:2], -100, filters=[mask, None])
+    assert results[0] == [
+        (uid, score)
+        for uid, score in retrieve(retriever, [QUERIES[0]], -100)
+        if int(uid.split("-")[1]) % 3 != 0
+    ]
+    assert results[1] == retrieve(retriever, [QUERIES[1]], -100)
+
+
+def test_ivf_probing_all_lists_is_exact(retriever):
+    retriever.chunk_size = 100
+    index = IVFIndex.build(retriever.clip_features, num_lists=5)
+    index.nprobe = 5
+    expected = retriever.retrieve_batch(QUERIES)
+    retriever.index = index
+    assert retriever.retrieve_batch(QUERIES) == expected
+
+
+def test_ivf_empty_lists(retriever):
+    # the first list is empty, a query next to its centroid probes nothing
+    centroids = F.normalize(torch.eye(CLIP_DIM)[:2], dim=-1)
+    retriever.index = IVFIndex(
+        centroids,
+        torch.tensor([0, 0, NUM_ASSETS]),
+        torch.arange(NUM_ASSETS),
+        NUM_ASSETS,
+        nprobe=1,
+    )
+    retriever.clip_model.features["a probe"] = torch.eye(CLIP_DIM)[0]
+    retriever.sbert_model.features["a probe"] = torch.zeros(SBERT_DIM)
+
+    for top_k in [None, 5]:
+        [(rows, scores)] = retriever.retrieve_rows(["a probe"], -100, top_k=top_k)
+        assert rows.tolist() == [] and scores.tolist() == []
+    assert retriever.retrieve_batch(["a probe"], -100) == [[]]
+
+    # together with a query that probes the other list
+    retriever.clip_model.features["the other"] = torch.eye(CLIP_DIM)[1]
+    retriever.sbert_model.features["the other"] = torch.zeros(SBERT_DIM)
+    results = retriever.retrieve_batch(["a probe", "the other"], -100)
+    assert results[0] == [] and len(results[1]) == NUM_ASSETS
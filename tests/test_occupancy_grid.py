@@ -0,0 +1,88 @@
+import random
+
+import numpy as np
+import pytest
+import shapely
+from shapely.geometry import Polygon, box
+
+from ai2holodeck.generation.floor_objects import DFS_Solver_Floor
+from ai2holodeck.generation.occupancy_grid import OccupancyGrid
+
+ROOMS = [
+    [(0, 0), (0, 400), (600, 400), (600, 0)],
+    [(0, 0), (0, 700), (500, 700), (500, 300), (800, 300), (800, 0)],
+    [(-150.5, 20), (-150.5, 420.25), (310, 420.25), (310, 20)],
+]
+
+
+def random_object(rng, room_poly):
+    min_x, min_z, max_x, max_z = room_poly.bounds
+    x, z = rng.uniform(min_x, max_x), rng.uniform(min_z, max_z)
+    # grid aligned edges happen all the time in the solver
+    width = rng.choice([25, 50, rng.uniform(10, 150)])
+    depth = rng.choice([25, 50, rng.uniform(10, 150)])
+    if rng.random() < 0.3:
+        x, z = round(x / 25) * 25, round(z / 25) * 25
+    return list(box(x, z, x + width, z + depth).exterior.coords)
+
+
+@pytest.mark.parametrize("room_index", range(len(ROOMS)))
+def test_matches_remove_points_and_collisions(room_index):
+    rng = random.Random(room_index)
+    room_poly = Polygon(ROOMS[room_index])
+    solver = DFS_Solver_Floor(grid_size=25)
+    grid_points = solver.create_grids(room_poly)
+    occupancy = OccupancyGrid(room_poly, solver.grid_size, grid_points)
+
+    placed = {}
+    for step in range(60):
+        if placed and rng.random() < 0.3:
+            object_name = rng.choice(list(placed))
+            occupancy.remove(object_name)
+            del placed[object_name]
+        else:
+            object_name = f"object-{step}"
+            obj_coords = random_object(rng, room_poly)
+            occupancy.place(object_name, obj_coords)
+            placed[object_name] = ((0, 0), 0, obj_coords, 1)
+
+        # the free points are the ones the solver would keep
+        assert occupancy.get_free_points() == solver.remove_points(grid_points, placed)
+
+        # boxes that may not collide never intersect a placed object
+        queries = [random_object(rng, room_poly) for _ in range(50)]
+        query_coords = np.array([coords[:4] for coords in queries])
+        may_collide = occupancy.may_collide(
+            query_coords.min(axis=1), query_coords.max(axis=1)
+        )
+        objects = [Polygon(obj_coords) for _, _, obj_coords, _ in placed.values()]
+        for coords, flag in zip(queries, may_collide.tolist()):
+            if not flag:
+                assert not any(
+                    shapely.intersects(Polygon(coords), obj) for obj in objects
+                )
+
+
+def test_filter_collision_is_unchanged():
+    rng = random.Random(0)
+    room_poly = Polygon(ROOMS[1])
+    solver = DFS_Solver_Floor(grid_size=25)
+    grid_points = solver.create_grids(room_poly)
+    occupancy = OccupancyGrid(room_poly, solver.grid_size, grid_points)
+
+    placed = {}
+    for i in range(8):
+        obj_coords = random_object(rng, room_poly)
+        occupancy.place(f"object-{i}", obj_coords)
+        placed[f"object-{i}"] = ((0, 0), 0, obj_coords, 1)
+
+    # the original filter, one intersects test per solution and object
+    solutions = solver.get_all_solutions(room_poly, grid_points, (80, 40))
+    objects = [Polygon(obj_coords) for _, _, obj_coords, _ in placed.values()]
+    expected = [
+        solution
+        for solution in solutions
+        if not any(Polygon(solution[2]).intersects(obj) for obj in objects)
+    ]
+    assert 0 < len(expected) < len(solutions)
+    assert solver.filter_collision(placed, solutions, occupancy) == expected
@@ -0,0 +1,118 @@
+import random
+
+import pytest
+from shapely.geometry import Polygon, box
+
+from ai2holodeck.generation.floor_objects import DFS_Solver_Floor
+from ai2holodeck.generation.placement_oracle import (
+    FloorPlacementOracle,
+    WallPlacementOracle,
+    get_room_grid_size,
+)
+from ai2holodeck.generation.wall_objects import DFS_Solver_Wall
+
+
+def get_room(rng):
+    width = rng.choice([300, 400, 523.7, 610])
+    depth = rng.choice([300, 450, 377.2])
+    if rng.random() < 0.5:
+        return [(0, 0), (0, depth), (width, depth), (width, 0)]
+    # an l-shaped room
+    return [
+        (0, 0),
+        (0, depth),
+        (width / 2, depth),
+        (width / 2, depth / 2),
+        (width, depth / 2),
+        (width, 0),
+    ]
+
+
+def can_place_floor(room_vertices, initial_state, object_dim):
+    # ObjectSelector.check_floor_placement before the oracle
+    solver = DFS_Solver_Floor(grid_size=get_room_grid_size(room_vertices))
+    room_poly = Polygon(room_vertices)
+    grid_points = solver.create_grids(room_poly)
+    grid_points = solver.remove_points(grid_points, initial_state)
+    solutions = solver.get_all_solutions(room_poly, grid_points, object_dim)
+    solutions = solver.filter_collision(initial_state, solutions)
+    solutions = solver.place_edge(room_poly, solutions, object_dim)
+    return solutions != []
+
+
+def can_place_wall(room_vertices, initial_state, object_dim):
+    # ObjectSelector.check_wall_placement before the oracle
+    solver = DFS_Solver_Wall(grid_size=get_room_grid_size(room_vertices))
+    room_poly = Polygon(room_vertices)
+    grid_points = solver.create_grids(room_poly)
+    solutions = solver.get_all_solutions(room_poly, grid_points, object_dim, height=0)
+    solutions = solver.filter_collision(initial_state, solutions)
+    return solutions != []
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_floor_oracle_matches_the_solver(seed):
+    rng = random.Random(seed)
+    placeable = 0
+    for _ in range(10):
+        room_vertices = get_room(rng)
+        max_x = max(x for x, _ in room_vertices)
+        max_y = max(y for _, y in room_vertices)
+
+        # doors along the bottom wall and boxes anywhere in the room
+        initial_state = {}
+        for i in range(rng.randint(0, 4)):
+            x = rng.uniform(0, max_x - 80)
+            y = 0 if rng.random() < 0.5 else rng.uniform(0, max_y)
+            coords = tuple(box(x, y, x + 80, y + 50).exterior.coords[:4])
+            initial_state[f"door-{i}"] = ((x + 40, y + 25), 0, coords, 1)
+
+        oracle = FloorPlacementOracle(room_vertices, initial_state)
+        for _ in range(12):
+            # zero sized boxes too, some objects are flat
+            object_dim = (
+                0 if rng.random() < 0.2 else rng.uniform(10, max_x * 1.1),
+                0 if rng.random() < 0.2 else rng.uniform(10, max_y * 0.8),
+            )
+            expected = can_place_floor(room_vertices, initial_state, object_dim)
+            assert oracle.can_place(object_dim) == expected
+            # the cached answer
+            assert oracle.can_place(object_dim) == expected
+            placeable += expected
+    # both answers are covered
+    assert 0 < placeable < 120
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_wall_oracle_matches_the_solver(seed):
+    rng = random.Random(seed)
+    placeable = 0
+    for _ in range(10):
+        room_vertices = get_room(rng)
+        max_x = max(x for x, _ in room_vertices)
+
+        # doors and windows on the bottom wall, as (x, y, z) boxes
+        initial_state = {}
+        for i in range(rng.randint(0, 3)):
+            x = rng.uniform(0, max_x - 100)
+            initial_state[f"door-{i}"] = (
+                (x, 0, 0),
+                (x + 100, rng.uniform(100, 250), 60),
+                0,
+                [],
+                1,
+            )
+
+        oracle = WallPlacementOracle(room_vertices, initial_state)
+        for _ in range(12):
+            # zero length or depth boxes lie on the wall
+            object_dim = (
+                0 if rng.random() < 0.2 else rng.uniform(20, max_x * 1.05),
+                rng.uniform(20, 300),
+                0 if rng.random() < 0.2 else rng.uniform(2, 80),
+            )
+            expected = can_place_wall(room_vertices, initial_state, object_dim)
+            assert oracle.can_place(object_dim) == expected
+            assert oracle.can_place(object_dim) == expected
+            placeable += expected
+    assert 0 < placeable < 120
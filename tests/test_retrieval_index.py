@@ -0,0 +1,84 @@
+import pytest
+import torch
+import torch.nn.functional as F
+
+from ai2holodeck.generation.feature_store import get_store_fingerprint
+from ai2holodeck.generation.retrieval_index import IVFIndex, exact_clip_top_k
+
+NUM_ASSETS, NUM_VIEWS, DIM = 2000, 3, 64
+
+
+@pytest.fixture
+def clip_features():
+    # assets gathered around a few topics, like the categories of the real assets
+    generator = torch.Generator().manual_seed(0)
+    topics = F.normalize(torch.randn(50, DIM, generator=generator), dim=-1)
+    assets = topics[torch.randint(0, 50, (NUM_ASSETS,), generator=generator)]
+    assets = assets + 0.15 * torch.randn(NUM_ASSETS, DIM, generator=generator)
+    views = assets.unsqueeze(1) + 0.05 * torch.randn(
+        NUM_ASSETS, NUM_VIEWS, DIM, generator=generator
+    )
+    return F.normalize(views, dim=-1)
+
+
+def get_recall(index, clip_features, k=20, num_queries=100):
+    # perturbed asset views as queries, as in the benchmark
+    generator = torch.Generator().manual_seed(1)
+    rows = torch.randint(0, NUM_ASSETS, (num_queries,), generator=generator)
+    views = torch.randint(0, NUM_VIEWS, (num_queries,), generator=generator)
+    queries = clip_features[rows, views]
+    queries = queries + 0.05 * torch.randn(queries.shape, generator=generator)
+    queries = F.normalize(queries, dim=-1)
+
+    exact = exact_clip_top_k(queries, clip_features, k)
+    found = 0
+    for query_index, candidate_rows in enumerate(index.search(queries)):
+        approximate = candidate_rows[
+            exact_clip_top_k(
+                queries[query_index : query_index + 1],
+                clip_features[candidate_rows],
+                k,
+            )[0]
+        ]
+        found += len(set(approximate.tolist()) & set(exact[query_index].tolist()))
+    return found / exact.numel()
+
+
+def test_recall(clip_features):
+    index = IVFIndex.build(clip_features)
+    num_lists = index.centroids.shape[0]
+    assert index.list_offsets[-1] == len(index.list_rows)
+    # every asset is in the list of each of its views
+    assert torch.unique(index.list_rows).tolist() == list(range(NUM_ASSETS))
+
+    index.nprobe = 16
+    assert get_recall(index, clip_features) >= 0.95
+    # a query scores only a part of the assets
+    candidate_rows = index.search(clip_features[:10, 0])
+    assert max(len(rows) for rows in candidate_rows) < NUM_ASSETS / 4
+
+    index.nprobe = num_lists
+    assert get_recall(index, clip_features) == 1.0
+
+
+def test_load_checks_the_store(clip_features, tmp_path):
+    uids = [f"asset-{i}" for i in range(NUM_ASSETS)]
+    sbert_features = torch.zeros(NUM_ASSETS, 8)
+    fingerprint = get_store_fingerprint(uids, clip_features, sbert_features)
+    path = str(tmp_path / "index.pt")
+    index = IVFIndex.build(clip_features, num_lists=20, fingerprint=fingerprint)
+    index.save(path)
+
+    loaded = IVFIndex.load(
+        path, nprobe=4, num_assets=NUM_ASSETS, fingerprint=fingerprint
+    )
+    assert loaded.nprobe == 4
+    assert torch.equal(loaded.list_rows, index.list_rows)
+    assert torch.equal(loaded.list_offsets, index.list_offsets)
+
+    with pytest.raises(ValueError):
+        IVFIndex.load(path, num_assets=NUM_ASSETS - 1, fingerprint=fingerprint)
+    # the same number of assets in another order
+    other_fingerprint = get_store_fingerprint(uids[::-1], clip_features, sbert_features)
+    with pytest.raises(ValueError):
+        IVFIndex.load(path, num_assets=NUM_ASSETS, fingerprint=other_fingerprint)
@@ -0,0 +1,113 @@
+import asyncio
+import time
+
+import pytest
+
+from ai2holodeck.generation.stage_scheduler import Stage, StageScheduler
+
+
+def get_stage(name, inputs=(), outputs=()):
+    return Stage(name, lambda scene: {key: name for key in outputs}, inputs, outputs)
+
+
+def test_dependencies():
+    # the walls are written by three stages, like in the scene pipeline
+    stages = [
+        get_stage("rooms", ["query"], ["rooms"]),
+        get_stage("wall_height", ["query"], ["wall_height"]),
+        get_stage("walls", ["rooms", "wall_height"], ["walls"]),
+        get_stage("wall_plan", ["walls"], ["wall_plan"]),
+        get_stage("doors", ["rooms", "walls"], ["doors", "walls"]),
+        get_stage("windows", ["walls", "doors"], ["windows", "walls"]),
+        get_stage("objects", ["rooms", "walls", "windows"], ["objects"]),
+        get_stage("ceiling", ["rooms"], ["ceiling"]),
+    ]
+    assert StageScheduler.get_dependencies(stages) == {
+        "rooms": set(),
+        "wall_height": set(),
+        "walls": {"rooms", "wall_height"},
+        # reads the walls of the walls stage
+        "wall_plan": {"walls"},
+        # overwrites the walls only after wall_plan has read them
+        "doors": {"rooms", "walls", "wall_plan"},
+        "windows": {"doors"},
+        # reads the walls of the last writer
+        "objects": {"rooms", "windows"},
+        "ceiling": {"rooms"},
+    }
+
+    with pytest.raises(ValueError):
+        StageScheduler([get_stage("rooms"), get_stage("rooms")])
+
+
+def test_run_order():
+    stages = [
+        get_stage("walls", ["rooms"], ["walls"]),
+        get_stage("wall_plan", ["walls"], ["wall_plan"]),
+        get_stage("doors", ["walls"], ["doors", "walls"]),
+    ]
+    seen = []
+
+    def wall_plan(scene):
+        seen.append(scene["walls"])
+        return {"wall_plan": "wall_plan"}
+
+    stages[1].run = wall_plan
+    scene = asyncio.run(StageScheduler(stages).run({"rooms": []}))
+    assert seen == ["walls"]
+    assert scene == {
+        "rooms": [],
+        "walls": "doors",
+        "wall_plan": "wall_plan",
+        "doors": "doors",
+    }
+
+
+def test_missing_and_undeclared_keys():
+    scheduler = StageScheduler(
+        [
+            get_stage("walls", ["rooms"], ["walls"]),
+            get_stage("doors", ["walls", "wall_height"], ["doors"]),
+        ]
+    )
+    with pytest.raises(ValueError, match="wall_height"):
+        scheduler.check_inputs({"rooms": []})
+    with pytest.raises(ValueError, match="wall_height"):
+        asyncio.run(scheduler.run({"rooms": []}))
+    scheduler.check_inputs({"rooms": [], "wall_height": 3})
+
+    # a stage may only return the keys it declares
+    stage = Stage("walls", lambda scene: {"walls": [], "doors": []}, [], ["walls"])
+    with pytest.raises(ValueError, match="doors"):
+        asyncio.run(StageScheduler([stage]).run({}))
+
+
+def test_independent_stages_overlap():
+    async def sleep_async(scene):
+        await asyncio.sleep(0.3)
+
+    def sleep_thread(scene):
+        time.sleep(0.3)
+
+    scheduler = StageScheduler(
+        [
+            Stage("rooms", sleep_async, [], ["rooms"]),
+            Stage("wall_height", sleep_thread, [], ["wall_height"]),
+            Stage("ceiling", sleep_thread, [], ["ceiling"]),
+            Stage("walls", sleep_async, ["rooms", "wall_height"], ["walls"]),
+        ]
+    )
+    start_time = time.perf_counter()
+    asyncio.run(scheduler.run({}))
+    assert time.perf_counter() - start_time < 0.9
+
+    timings = scheduler.timings
+    # the first three start together and run at the same time
+    for name in ["rooms", "wall_height", "ceiling"]:
+        start, duration = timings[name]
+        assert start < 0.1 and duration >= 0.29
+    # the walls wait for both of their inputs
+    walls_start = timings["walls"][0]
+    for name in ["rooms", "wall_height"]:
+        assert walls_start >= sum(timings[name])
+    assert walls_start < 0.45
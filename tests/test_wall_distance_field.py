@@ -0,0 +1,145 @@
+import copy
+import random
+
+import numpy as np
+import pytest
+from shapely.geometry import Point, Polygon
+
+from ai2holodeck.generation.floor_objects import DFS_Solver_Floor
+from ai2holodeck.generation.wall_distance_field import WallDistanceField
+
+ROOMS = [
+    ([(0, 0), (0, 400), (600, 400), (600, 0)], []),
+    ([(0, 0), (0, 700), (500, 700), (500, 300), (800, 300), (800, 0)], []),
+    ([(-150.5, 20), (-150.5, 420.25), (310, 420.25), (310, 20)], []),
+    (
+        [(0, 0), (0, 500), (500, 500), (500, 0)],
+        [[(200, 200), (200, 300.5), (310.25, 300.5), (310.25, 200)]],
+    ),
+]
+
+
+def place_edge(solver, room_poly, solutions, obj_dim):
+    # DFS_Solver_Floor.place_edge before the distance field
+    valid_solutions = []
+    obj_half_width = obj_dim[1] / 2
+    back_center_adjustments = {
+        0: (0, -obj_half_width),
+        90: (-obj_half_width, 0),
+        180: (0, obj_half_width),
+        270: (obj_half_width, 0),
+    }
+    for solution in solutions:
+        center_x, center_y = solution[0]
+        back_center_adjustment = back_center_adjustments[solution[1]]
+        back_center_x, back_center_y = (
+            center_x + back_center_adjustment[0],
+            center_y + back_center_adjustment[1],
+        )
+        back_center_distance = room_poly.boundary.distance(
+            Point(back_center_x, back_center_y)
+        )
+        center_distance = room_poly.boundary.distance(Point(center_x, center_y))
+        if (
+            back_center_distance <= solver.grid_size
+            and back_center_distance < center_distance
+        ):
+            solution[-1] += solver.constraint_bouns
+            center2back_vector = np.array(
+                [back_center_x - center_x, back_center_y - center_y]
+            )
+            center2back_vector /= np.linalg.norm(center2back_vector)
+            offset = center2back_vector * (back_center_distance + 4.5)
+            solution[0] = (center_x + offset[0], center_y + offset[1])
+            solution[2] = tuple(
+                (x + offset[0], y + offset[1]) for x, y in solution[2][:4]
+            )
+            valid_solutions.append(solution)
+    return valid_solutions
+
+
+def place_corner(solver, room_poly, solutions, obj_dim):
+    # DFS_Solver_Floor.place_corner before the distance field
+    obj_half_length = obj_dim[0] / 2
+    rotation_center_adjustments = {
+        0: ((-obj_half_length, 0), (obj_half_length, 0)),
+        90: ((0, obj_half_length), (0, -obj_half_length)),
+        180: ((obj_half_length, 0), (-obj_half_length, 0)),
+        270: ((0, -obj_half_length), (0, obj_half_length)),
+    }
+    valid_solutions = []
+    for solution in place_edge(solver, room_poly, solutions, obj_dim):
+        (center_x, center_y), rotation = solution[:2]
+        (dx_left, dy_left), (dx_right, dy_right) = rotation_center_adjustments[rotation]
+        left_center_distance = room_poly.boundary.distance(
+            Point(center_x + dx_left, center_y + dy_left)
+        )
+        right_center_distance = room_poly.boundary.distance(
+            Point(center_x + dx_right, center_y + dy_right)
+        )
+        if min(left_center_distance, right_center_distance) < solver.grid_size:
+            solution[-1] += solver.constraint_bouns
+            valid_solutions.append(solution)
+    return valid_solutions
+
+
+def filter_facing_wall(room_poly, solutions, obj_dim):
+    # DFS_Solver_Floor.filter_facing_wall before the distance field
+    obj_half_width = obj_dim[1] / 2
+    front_center_adjustments = {
+        0: (0, obj_half_width),
+        90: (obj_half_width, 0),
+        180: (0, -obj_half_width),
+        270: (-obj_half_width, 0),
+    }
+    valid_solutions = []
+    for solution in solutions:
+        center_x, center_y = solution[0]
+        dx, dy = front_center_adjustments[solution[1]]
+        if room_poly.boundary.distance(Point(center_x + dx, center_y + dy)) >= 30:
+            valid_solutions.append(solution)
+    return valid_solutions
+
+
+@pytest.mark.parametrize("room_index", range(len(ROOMS)))
+def test_distance_matches_shapely(room_index):
+    rng = random.Random(room_index)
+    room_poly = Polygon(*ROOMS[room_index])
+    distance_field = WallDistanceField(room_poly)
+
+    min_x, min_y, max_x, max_y = room_poly.bounds
+    points = [
+        (rng.uniform(min_x - 50, max_x + 50), rng.uniform(min_y - 50, max_y + 50))
+        for _ in range(500)
+    ]
+    # points on the grid, the walls and the corners
+    points += [(x, y) for x in range(-200, 850, 25) for y in range(-25, 750, 25)]
+    points += [
+        coord
+        for ring in [room_poly.exterior, *room_poly.interiors]
+        for coord in ring.coords
+    ]
+
+    expected = [room_poly.boundary.distance(Point(x, y)) for x, y in points]
+    assert distance_field.distance(points).tolist() == expected
+    assert distance_field.distance([]).tolist() == []
+
+
+@pytest.mark.parametrize("room_index", range(len(ROOMS)))
+@pytest.mark.parametrize("obj_dim", [(100, 50), (60, 60), (173.5, 41.25)])
+def test_edge_and_corner_placement(room_index, obj_dim):
+    room_poly = Polygon(*ROOMS[room_index])
+    solver = DFS_Solver_Floor(grid_size=25)
+    grid_points = solver.create_grids(room_poly)
+    solutions = solver.get_all_solutions(room_poly, grid_points, obj_dim)
+    assert solutions
+
+    expected = place_edge(solver, room_poly, copy.deepcopy(solutions), obj_dim)
+    assert expected
+    assert solver.place_edge(room_poly, copy.deepcopy(solutions), obj_dim) == expected
+
+    expected = place_corner(solver, room_poly, copy.deepcopy(solutions), obj_dim)
+    assert solver.place_corner(room_poly, copy.deepcopy(solutions), obj_dim) == expected
+
+    expected = filter_facing_wall(room_poly, solutions, obj_dim)
+    assert solver.filter_facing_wall(room_poly, solutions, obj_dim) == expected
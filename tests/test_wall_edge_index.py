@@ -0,0 +1,106 @@
+import random
+
+import pytest
+from shapely.geometry import LineString, Point, Polygon, box
+from shapely.ops import substring
+
+from ai2holodeck.generation.wall_edge_index import WallEdgeIndex
+
+ROOMS = [
+    [(0, 0), (0, 400), (600, 400), (600, 0)],
+    [(0, 0), (600, 0), (600, 400), (0, 400)],
+    [(0, 0), (0, 700), (500, 700), (500, 300), (800, 300), (800, 0)],
+    [(0, 0), (0, 523.7), (377.2, 523.7), (377.2, 0)],
+]
+
+
+def create_grids(room_poly, grid_size):
+    # DFS_Solver_Wall.create_grids before the index
+    poly_coords = list(room_poly.exterior.coords)
+    grid_points = []
+    for i in range(len(poly_coords) - 1):
+        line = LineString([poly_coords[i], poly_coords[i + 1]])
+        for j in range(0, int(line.length), grid_size):
+            point_on_line = substring(line, j, j)
+            if point_on_line:
+                grid_points.append((point_on_line.x, point_on_line.y))
+    return grid_points
+
+
+def get_all_solutions(room_poly, grid_points, object_dim, height):
+    # DFS_Solver_Wall.get_all_solutions before the index
+    obj_length, obj_height, obj_width = object_dim
+    obj_half_length = obj_length / 2
+    rotation_adjustments = {
+        0: ((-obj_half_length, 0), (obj_half_length, obj_width)),
+        90: ((0, -obj_half_length), (obj_width, obj_half_length)),
+        180: ((-obj_half_length, -obj_width), (obj_half_length, 0)),
+        270: ((-obj_width, -obj_half_length), (0, obj_half_length)),
+    }
+
+    solutions = []
+    for rotation in [0, 90, 180, 270]:
+        for center_x, center_y in grid_points:
+            lower_left_adjustment, upper_right_adjustment = rotation_adjustments[
+                rotation
+            ]
+            lower_left = (
+                center_x + lower_left_adjustment[0],
+                center_y + lower_left_adjustment[1],
+            )
+            upper_right = (
+                center_x + upper_right_adjustment[0],
+                center_y + upper_right_adjustment[1],
+            )
+            obj_box = box(*lower_left, *upper_right)
+            if not room_poly.contains(obj_box):
+                continue
+
+            coordinates_on_edge = set(
+                coord
+                for coord in obj_box.exterior.coords[:]
+                if room_poly.boundary.contains(Point(coord))
+            )
+            if len(coordinates_on_edge) >= 2:
+                solutions.append(
+                    [
+                        (lower_left[0], height, lower_left[1]),
+                        (upper_right[0], height + obj_height, upper_right[1]),
+                        rotation,
+                        tuple(obj_box.exterior.coords[:]),
+                        1,
+                    ]
+                )
+    return solutions
+
+
+@pytest.mark.parametrize("room_index", range(len(ROOMS)))
+@pytest.mark.parametrize("grid_size", [25, 50])
+def test_grid_points(room_index, grid_size):
+    index = WallEdgeIndex(Polygon(ROOMS[room_index]), grid_size)
+    assert index.grid_points == create_grids(Polygon(ROOMS[room_index]), grid_size)
+
+
+@pytest.mark.parametrize("room_index", range(len(ROOMS)))
+def test_solutions(room_index):
+    rng = random.Random(room_index)
+    # the reference gets its own polygon, so nothing the index does to its room
+    # can change the reference
+    room_poly = Polygon(ROOMS[room_index])
+    index = WallEdgeIndex(Polygon(ROOMS[room_index]), 25)
+    grid_points = create_grids(room_poly, 25)
+
+    for _ in range(10):
+        object_dim = (
+            rng.choice([0, 50, 100, rng.uniform(20, 300)]),
+            rng.uniform(20, 200),
+            rng.choice([0, 10, rng.uniform(1, 80)]),
+        )
+        height = rng.choice([0, 120.5])
+        expected = get_all_solutions(room_poly, grid_points, object_dim, height)
+        assert index.get_solutions(index.grid_points, object_dim, height) == expected
+
+        # a subset of the points, as the dfs passes them
+        subset = rng.sample(grid_points, len(grid_points) // 2)
+        expected = get_all_solutions(room_poly, subset, object_dim, height)
+        assert index.get_solutions(subset, object_dim, height) == expected